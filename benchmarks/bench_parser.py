@@ -0,0 +1,111 @@
+"""Correctness, fuzz and throughput check for the model response parser
+
+    python benchmarks/bench_parser.py [--iterations 200] [--fuzz 2000]
+
+Runs every response in ``parser_corpus.jsonl`` through the legacy regex extraction
+and ``recommender.parsing.parse_recommendations``, then fuzzes the parser with random
+truncations and corruptions of valid responses. Exits non-zero if the parser
+recovers the wrong number of objects or raises anything other than ``ParseError``.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from recommender.parsing import ParseError, parse_recommendations  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus.jsonl")
+
+
+def legacy_extraction(text):
+    """The original lazy-regex extraction, kept for comparison"""
+    match = re.search(r'(\[\s*{.*?}\s*\])', text, re.DOTALL)
+    return json.loads(match.group()) if match else []
+
+
+def count_objects(parse, text):
+    try:
+        return len(parse(text))
+    except (ParseError, json.JSONDecodeError):
+        return 0
+
+
+def time_per_call(parse, texts, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            try:
+                parse(text)
+            except (ParseError, json.JSONDecodeError):
+                pass
+    return (time.perf_counter() - started) / (iterations * len(texts))
+
+
+def fuzz(cases, rounds, seed=0):
+    """Random truncation and character corruption must never raise unexpected errors"""
+    rng = random.Random(seed)
+    valid = [c["response"] for c in cases if c["expected_objects"]]
+    failures = []
+    for _ in range(rounds):
+        text = rng.choice(valid)
+        if rng.random() < 0.5:
+            text = text[:rng.randrange(len(text))]
+        else:
+            chars = list(text)
+            for _ in range(rng.randint(1, 5)):
+                chars[rng.randrange(len(chars))] = rng.choice('{}[]",:\'\\ ')
+            text = "".join(chars)
+        try:
+            result = parse_recommendations(text)
+            assert all(isinstance(obj, dict) for obj in result)
+        except ParseError:
+            pass
+        except Exception as e:  # noqa: BLE001 - any other exception is a parser bug
+            failures.append((text[:80], repr(e)))
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--fuzz", type=int, default=2000)
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    rows = []
+    mismatches = 0
+    for case in cases:
+        legacy = count_objects(legacy_extraction, case["response"])
+        current = count_objects(parse_recommendations, case["response"])
+        mismatches += current != case["expected_objects"]
+        rows.append({"name": case["name"], "expected": case["expected_objects"], "legacy": legacy, "parser": current})
+
+    texts = [c["response"] for c in cases]
+    # The legacy extraction gives up quickly on malformed responses, so compare speed on the ones it handles too
+    shared = [case["response"] for case, row in zip(cases, rows) if row["legacy"] == row["expected"] == row["parser"]]
+    fuzz_failures = fuzz(cases, args.fuzz)
+    report = {
+        "cases": rows,
+        "legacy_correct": sum(r["legacy"] == r["expected"] for r in rows),
+        "parser_correct": sum(r["parser"] == r["expected"] for r in rows),
+        "total": len(rows),
+        "legacy_us_per_response": round(time_per_call(legacy_extraction, texts, args.iterations) * 1e6, 1),
+        "parser_us_per_response": round(time_per_call(parse_recommendations, texts, args.iterations) * 1e6, 1),
+        "legacy_us_per_shared_response": round(time_per_call(legacy_extraction, shared, args.iterations) * 1e6, 1),
+        "parser_us_per_shared_response": round(time_per_call(parse_recommendations, shared, args.iterations) * 1e6, 1),
+        "fuzz_rounds": args.fuzz,
+        "fuzz_failures": fuzz_failures[:10],
+    }
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if mismatches or fuzz_failures else 0)
+
+
+if __name__ == "__main__":
+    main()
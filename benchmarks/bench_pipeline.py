@@ -0,0 +1,261 @@
+"""Latency, throughput and load benchmarks for the recommendation pipeline
+
+    python benchmarks/bench_pipeline.py [--quick] [--latency 0.8] [--fast-latency 0.25]
+                                        [--failure-rate 0.02] [--users 8] [--output results.json]
+
+Runs entirely locally: Gemini is replaced by ``stubs.StubModel`` (seeded latency,
+jitter and failure injection) and URL extraction hits ``stubs.JobPostingServer``.
+Scenarios:
+
+- ``recommend``: end-to-end ``Recommender.recommend`` latency on cache misses, cache
+  hits and catalog-only mode
+- ``url_extraction``: fetch + extract from the local posting server, then recommend
+- ``parsing``: ``json_extraction`` throughput over ``parser_corpus.jsonl``
+- ``filters``: building ``RecommendationTable`` and filtering it at 10/1k/100k rows,
+  against the list-based ``filter_recommendations``
+- ``load``: concurrent users (one thread each, like Streamlit sessions) and the async
+  path used by the API
+
+Prints one JSON document; ``--output`` also writes it to a file for tracking.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from stubs import SAMPLE_POSTINGS, JobPostingServer, StubModel, install_stubs  # noqa: E402
+
+from recommender.cache import RecommendationCache  # noqa: E402
+from recommender.catalog import load_index  # noqa: E402
+from recommender.engine import (  # noqa: E402
+    DEFAULT_FAST_MODEL,
+    PROMPT_VERSION,
+    Recommender,
+    filter_recommendations,
+    json_extraction,
+)
+from recommender.fetcher import PageFetcher  # noqa: E402
+from recommender.table import RecommendationTable  # noqa: E402
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus.jsonl")
+
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    ordered = sorted(samples)
+    pick = lambda pct: ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]  # noqa: E731
+    return {
+        "n": len(ordered),
+        "p50_ms": round(pick(50) * 1000, 2),
+        "p95_ms": round(pick(95) * 1000, 2),
+        "p99_ms": round(pick(99) * 1000, 2),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    fn(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def build_recommender(args, index, cached=False):
+    """Recommender over the real catalog index with stub model tiers"""
+    # max_items=0 turns the cache off, so every request reaches the (stub) model
+    cache = RecommendationCache(PROMPT_VERSION, max_items=256 if cached else 0)
+    recommender = Recommender(catalog_index=index, cache=cache, fast_model_name=args.fast_model or None)
+    primary = StubModel(latency=args.latency, jitter=args.jitter, failure_rate=args.failure_rate, seed=args.seed)
+    fast = StubModel(
+        latency=args.fast_latency, jitter=args.jitter / 2, failure_rate=args.failure_rate,
+        invalid_rate=args.fast_invalid_rate, seed=args.seed + 1,
+    )
+    return install_stubs(recommender, primary, fast)
+
+
+def queries(n, seed=0):
+    rng = random.Random(seed)
+    return [f"{rng.choice(SAMPLE_POSTINGS)}\nReference {i}" for i in range(n)]
+
+
+def bench_recommend(args, index):
+    recommender = build_recommender(args, index)
+    misses = [timed(recommender.recommend, q) for q in queries(args.requests, args.seed)]
+
+    cached = build_recommender(args, index, cached=True)
+    cached.recommend(SAMPLE_POSTINGS[0])
+    hits = [timed(cached.recommend, SAMPLE_POSTINGS[0]) for _ in range(args.requests)]
+    catalog = [timed(recommender.recommend, q, mode="catalog") for q in queries(args.requests, args.seed)]
+    return {
+        "cache_miss": summarize(misses),
+        "cache_hit": summarize(hits),
+        "catalog_only": summarize(catalog),
+        "routing": recommender.routing.snapshot(),
+    }
+
+
+def bench_url_extraction(args, index):
+    recommender = build_recommender(args, index)
+    fetcher = PageFetcher(cache_dir=None)
+    extract, total = [], []
+    with JobPostingServer() as server:
+        for i in range(args.requests):
+            started = time.perf_counter()
+            text = fetcher.extract(server.url(i))
+            extracted = time.perf_counter()
+            recommender.recommend(text)
+            extract.append(extracted - started)
+            total.append(time.perf_counter() - started)
+    return {"extract": summarize(extract), "extract_and_recommend": summarize(total)}
+
+
+def bench_parsing(iterations):
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        texts = [json.loads(line)["response"] for line in f if line.strip()]
+    size = sum(len(t.encode("utf-8")) for t in texts)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in texts:
+            try:
+                json_extraction(text)
+            except Exception:
+                pass
+    elapsed = time.perf_counter() - started
+    return {
+        "responses": len(texts) * iterations,
+        "responses_per_s": round(len(texts) * iterations / elapsed, 1),
+        "mb_per_s": round(size * iterations / elapsed / 1e6, 2),
+    }
+
+
+def synthetic_recommendations(n, seed=0):
+    rng = random.Random(seed)
+    types = ["Ability & Aptitude", "Knowledge & Skills", "Personality & Behavior", "Simulations", "Competencies"]
+    return [
+        {
+            "Assessment Name": f"Assessment {i}",
+            "URL": f"https://www.shl.com/solutions/products/product-catalog/view/a-{i}/",
+            "Remote Testing Support": rng.choice(["Yes", "No"]),
+            "Adaptive/IRT Support": rng.choice(["Yes", "No"]),
+            "Duration": f"{rng.randint(5, 90)} minutes",
+            "Test Type": rng.sample(types, rng.randint(1, 3)),
+            "Description": "Synthetic row",
+        }
+        for i in range(n)
+    ]
+
+
+def bench_filters(sizes, repeats=5):
+    filters = {
+        "selected_types": ["Knowledge & Skills", "Simulations"],
+        "max_duration": 40,
+        "remote_filter": "Yes",
+        "adaptive_filter": "All",
+    }
+    results = {}
+    for size in sizes:
+        recs = synthetic_recommendations(size)
+        started = time.perf_counter()
+        table = RecommendationTable(recs)
+        build = time.perf_counter() - started
+        table_ms = min(timed(table.rows, **filters) for _ in range(repeats))
+        list_ms = min(timed(filter_recommendations, recs, **filters) for _ in range(max(1, repeats // 2)))
+        results[str(size)] = {
+            "table_build_ms": round(build * 1000, 3),
+            "table_filter_ms": round(table_ms * 1000, 3),
+            "list_filter_ms": round(list_ms * 1000, 3),
+            "matches": int(table.mask(**filters).sum()),
+        }
+    return results
+
+
+def bench_load(args, index):
+    recommender = build_recommender(args, index)
+    per_user = max(1, args.requests // 2)
+    work = queries(args.users * per_user, args.seed)
+    latencies = []
+    errors = []
+
+    def user(offset):
+        for q in work[offset::args.users]:
+            started = time.perf_counter()
+            try:
+                recommender.recommend(q)
+            except Exception as e:
+                errors.append(e)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        list(pool.map(user, range(args.users)))
+    wall = time.perf_counter() - started
+
+    async def run_async():
+        async def one(q):
+            t = time.perf_counter()
+            await recommender.recommend_async(q)
+            return time.perf_counter() - t
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(one(q) for q in work), return_exceptions=True)
+        return [r for r in results if not isinstance(r, Exception)], time.perf_counter() - t0
+
+    async_latencies, async_wall = asyncio.run(run_async())
+    return {
+        "users": args.users,
+        "threaded": {**summarize(latencies), "errors": len(errors), "throughput_per_s": round(len(work) / wall, 2)},
+        "async": {
+            **summarize(async_latencies),
+            "errors": len(work) - len(async_latencies),
+            "throughput_per_s": round(len(work) / async_wall, 2),
+        },
+        "hedged_calls": recommender.async_client.hedged + (recommender.fast_client.hedged if recommender.fast_client else 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.8, help="Primary stub model latency in seconds")
+    parser.add_argument("--fast-latency", type=float, default=0.25, help="Fast-tier stub model latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra uniform random latency in seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of stub calls that fail with a 503")
+    parser.add_argument("--fast-invalid-rate", type=float, default=0.1, help="Fraction of fast answers failing validation")
+    parser.add_argument("--fast-model", default=DEFAULT_FAST_MODEL, help="Empty to disable tiered routing")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per latency scenario")
+    parser.add_argument("--users", type=int, default=8, help="Concurrent users in the load scenario")
+    parser.add_argument("--sizes", default="10,1000,100000", help="Row counts for the filter benchmark")
+    parser.add_argument("--parse-iterations", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="Small, fast run for smoke checks")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+    if args.quick:
+        args.latency, args.fast_latency, args.jitter = args.latency / 10, args.fast_latency / 10, args.jitter / 10
+        args.requests, args.parse_iterations, args.sizes = 6, 20, "10,1000"
+
+    index = load_index()
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "recommend": bench_recommend(args, index),
+        "url_extraction": bench_url_extraction(args, index),
+        "parsing": bench_parsing(args.parse_iterations),
+        "filters": bench_filters([int(s) for s in args.sizes.split(",")]),
+        "load": bench_load(args, index),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Import cost and Streamlit rerun latency of the app
+
+    python benchmarks/bench_startup.py [--repeat 5] [--reruns 10] [--output startup.json]
+
+Measures, each in a fresh interpreter, how long the modules the app touches take to
+import, then (when Streamlit is installed) runs ``main.py`` headlessly with
+``streamlit.testing.v1.AppTest`` to time the cold first run and warm reruns. No
+Gemini request is made: the app only configures the SDK at startup.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = [
+    "streamlit",
+    "pandas",
+    "numpy",
+    "requests",
+    "bs4",
+    "google.generativeai",
+    "recommender.engine",
+    "recommender.catalog",
+    "recommender.table",
+]
+
+_IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def import_ms(module, repeat):
+    """Median import time of a module in a fresh interpreter, or None if it is not installed"""
+    samples = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-c", _IMPORT_SNIPPET.format(module=module)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return None
+        samples.append(float(result.stdout.strip()) * 1000)
+    return round(statistics.median(samples), 1)
+
+
+def rerun_ms(reruns):
+    """Cold first run and warm rerun timings of main.py, or None without Streamlit"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return None
+
+    os.environ.setdefault("GEMINI_API_KEY", "benchmark-placeholder")
+    app = AppTest.from_file(os.path.join(ROOT, "main.py"), default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    cold = (time.perf_counter() - started) * 1000
+
+    warm = []
+    for _ in range(reruns):
+        started = time.perf_counter()
+        app.run()
+        warm.append((time.perf_counter() - started) * 1000)
+    return {
+        "cold_ms": round(cold, 1),
+        "warm_p50_ms": round(statistics.median(warm), 1),
+        "warm_max_ms": round(max(warm), 1),
+        "exceptions": [str(e.value) for e in app.exception],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module")
+    parser.add_argument("--reruns", type=int, default=10, help="Warm reruns of the app")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "python": sys.version.split()[0],
+        "import_ms": {module: import_ms(module, args.repeat) for module in MODULES},
+        "app": rerun_ms(args.reruns),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Offline quality evaluation of pipeline variants against labeled job descriptions
+
+    python benchmarks/eval_quality.py [--variants retrieval,hybrid,cached] [--k 5] [--min-recall 0.6]
+                                      [--concurrency 8] [--live] [--output eval.json]
+
+Every variant runs each query in ``eval_queries.jsonl`` through one configuration
+of the pipeline. A query is a job description plus the catalog URLs judged
+relevant for it. Queries run ``--concurrency`` at a time, and variants run one
+after another so each one's token count is its own. The report gives Recall@k
+and MAP@k next to latency and model tokens per query. The comparison table is
+sorted by p50 latency and marks the fastest variant whose Recall@k meets
+``--min-recall``. Cached variants measure cache hits, so they are listed
+after the cold ones and never recommended.
+
+By default Gemini is replaced by ``stubs.StubModel``, which answers with the
+candidates it was given, in order. That makes the latency and token figures
+meaningful but not the model's quality. Pass ``--live`` (with GEMINI_API_KEY
+set) to score the real models.
+
+Variants:
+
+- ``retrieval``: hybrid catalog match (embeddings + BM25), no model call
+- ``retrieval-semantic``: embedding-only catalog match
+- ``llm``: the model alone, without candidates in the prompt; its answer is grounded in the catalog
+- ``hybrid``: catalog candidates reranked by the model, fast tier first
+- ``hybrid-primary``: the same with the primary model only
+- ``hybrid-truncated``: job descriptions packed into a 128-token budget
+- ``cached``: ``hybrid`` served from a response cache warmed by one pass over the queries; its
+  latency is the cache-hit latency, and the warming pass is reported as ``cold_latency``
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Token counts come from the metrics registry, which only records when enabled at import time
+os.environ["METRICS_ENABLED"] = "1"
+
+from bench_pipeline import summarize  # noqa: E402
+from stubs import StubModel, install_stubs  # noqa: E402
+
+from recommender import metrics  # noqa: E402
+from recommender.cache import RecommendationCache  # noqa: E402
+from recommender.catalog import CatalogIndex, load_index  # noqa: E402
+from recommender.engine import DEFAULT_FAST_MODEL, PROMPT_VERSION, Recommender, configure_gemini  # noqa: E402
+from recommender.grounding import normalize_url  # noqa: E402
+from recommender.preprocess import QUERY_TOKEN_BUDGET  # noqa: E402
+
+QUERIES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "eval_queries.jsonl")
+
+VARIANTS = {
+    "retrieval": {"mode": "catalog"},
+    "retrieval-semantic": {"mode": "catalog", "lexical": False},
+    "llm": {"mode": "llm"},
+    "hybrid": {"mode": "rerank"},
+    "hybrid-primary": {"mode": "rerank", "fast": False},
+    "hybrid-truncated": {"mode": "rerank", "budget": 128},
+    "cached": {"mode": "rerank", "cache": True},
+}
+
+
+def load_queries(path=QUERIES_PATH):
+    """Labeled queries: ``{"id", "job_description", "relevant": [catalog URLs]}`` per line"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def ranked_urls(recommendations):
+    """Normalized, de-duplicated URLs of a recommendation list, in order"""
+    urls = []
+    for rec in recommendations:
+        url = rec.get("URL") if isinstance(rec, dict) else None
+        if isinstance(url, str) and normalize_url(url) not in urls:
+            urls.append(normalize_url(url))
+    return urls
+
+
+def recall_at_k(ranked, relevant, k):
+    """Share of the relevant items found in the top k"""
+    return len(set(ranked[:k]) & relevant) / len(relevant) if relevant else 0.0
+
+
+def average_precision_at_k(ranked, relevant, k):
+    """Precision averaged over the ranks of the relevant items in the top k"""
+    hits = 0
+    total = 0.0
+    for rank, url in enumerate(ranked[:k], start=1):
+        if url in relevant:
+            hits += 1
+            total += hits / rank
+    return total / min(k, len(relevant)) if relevant else 0.0
+
+
+def token_totals():
+    """Model input and output tokens recorded so far, over all models"""
+    totals = {"in": 0, "out": 0}
+    for name, value in metrics.snapshot()["counters"].items():
+        for direction in totals:
+            if name.startswith("model_tokens_total{") and f"direction={direction}," in name:
+                totals[direction] += value
+    return totals
+
+
+def build_recommender(args, index, spec):
+    """Recommender configured for one variant, with stub model tiers unless ``--live``"""
+    if not spec.get("lexical", True):
+        index = CatalogIndex(index.catalog, index.index.vectors, backend=index.backend, version=index.version)
+    # max_items=0 turns the cache off, so every request reaches the model
+    cache = RecommendationCache(PROMPT_VERSION, max_items=256 if spec.get("cache") else 0)
+    recommender = Recommender(
+        args.model,
+        catalog_index=index,
+        cache=cache,
+        query_token_budget=spec.get("budget") or QUERY_TOKEN_BUDGET,
+        fast_model_name=(args.fast_model or None) if spec.get("fast", True) else None,
+    )
+    if args.live:
+        return recommender
+    primary = StubModel(latency=args.latency, seed=args.seed)
+    fast = StubModel(latency=args.fast_latency, seed=args.seed + 1)
+    return install_stubs(recommender, primary, fast)
+
+
+def run_query(recommender, spec, item):
+    """``(recommendations, seconds, error)`` for one labeled query"""
+    started = time.perf_counter()
+    try:
+        if spec["mode"] == "llm":
+            query, _ = recommender.prepare_query(item["job_description"])
+            recommendations = recommender.generate_routed(recommender.build_prompt(query), query=query)
+        else:
+            recommendations = recommender.recommend(item["job_description"], mode=spec["mode"])
+    except Exception as e:
+        return [], time.perf_counter() - started, f"{item['id']}: {e}"
+    return recommendations, time.perf_counter() - started, None
+
+
+def evaluate_variant(args, index, queries, spec):
+    """Quality, latency and token cost of one variant over every query"""
+    recommender = build_recommender(args, index, spec)
+    cold = None
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        if spec.get("cache"):
+            cold = list(pool.map(lambda item: run_query(recommender, spec, item), queries))  # Warm the cache
+        tokens_before = token_totals()
+        results = list(pool.map(lambda item: run_query(recommender, spec, item), queries))
+    tokens_after = token_totals()
+
+    recalls, average_precisions, latencies, errors = [], [], [], []
+    for item, (recommendations, seconds, error) in zip(queries, results):
+        relevant = {normalize_url(url) for url in item["relevant"]}
+        ranked = ranked_urls(recommendations)
+        recalls.append(recall_at_k(ranked, relevant, args.k))
+        average_precisions.append(average_precision_at_k(ranked, relevant, args.k))
+        latencies.append(seconds)
+        if error:
+            errors.append(error)
+    result = {
+        f"recall@{args.k}": round(sum(recalls) / len(recalls), 4),
+        f"map@{args.k}": round(sum(average_precisions) / len(average_precisions), 4),
+        "latency": summarize(latencies),
+        "tokens_in_per_query": round((tokens_after["in"] - tokens_before["in"]) / len(queries), 1),
+        "tokens_out_per_query": round((tokens_after["out"] - tokens_before["out"]) / len(queries), 1),
+        "errors": errors,
+    }
+    if cold is not None:
+        result["cache_hits"] = True
+        result["cold_latency"] = summarize([seconds for _, seconds, _ in cold])
+    return result
+
+
+def comparison_table(report, k, min_recall):
+    """Plain-text table of the variants, fastest first with cached ones last, marking the recommended one"""
+    header = f"{'variant':<20}{f'recall@{k}':>10}{f'map@{k}':>8}{'p50 ms':>10}{'p95 ms':>10}{'tokens/query':>14}{'errors':>8}"
+    lines = [header, "-" * len(header)]
+    variants = sorted(
+        report["variants"].items(), key=lambda pair: (pair[1].get("cache_hits", False), pair[1]["latency"]["p50_ms"])
+    )
+    for name, result in variants:
+        tokens = result["tokens_in_per_query"] + result["tokens_out_per_query"]
+        marker = "  <- fastest meeting the bar" if name == report["recommended"] else ""
+        if result.get("cache_hits"):
+            marker = f"  (cache hits; cold p50 {result['cold_latency']['p50_ms']:.1f} ms, not ranked)"
+        lines.append(
+            f"{name:<20}{result[f'recall@{k}']:>10.3f}{result[f'map@{k}']:>8.3f}{result['latency']['p50_ms']:>10.1f}"
+            f"{result['latency']['p95_ms']:>10.1f}{tokens:>14.0f}{len(result['errors']):>8}{marker}"
+        )
+    if report["recommended"] is None:
+        lines.append(f"No variant reaches recall@{k} >= {min_recall}.")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k and MAP@k of pipeline variants on labeled job descriptions")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="Comma-separated subset of: " + ", ".join(VARIANTS))
+    parser.add_argument("--queries", default=QUERIES_PATH, help="Labeled queries (JSON lines)")
+    parser.add_argument("--k", type=int, default=5, help="Cut-off for Recall@k and MAP@k")
+    parser.add_argument("--min-recall", type=float, default=0.6, help="Quality bar for the recommended variant")
+    parser.add_argument("--concurrency", type=int, default=8, help="Queries in flight per variant")
+    parser.add_argument("--live", action="store_true", help="Call Gemini instead of the stub models")
+    parser.add_argument("--model", default=os.getenv("GEMINI_MODEL", "gemini-1.5-pro"), help="Primary model")
+    parser.add_argument("--fast-model", default=os.getenv("GEMINI_FAST_MODEL", DEFAULT_FAST_MODEL),
+                        help="Fast-tier model; empty disables tiered routing")
+    parser.add_argument("--latency", type=float, default=0.8, help="Primary stub model latency in seconds")
+    parser.add_argument("--fast-latency", type=float, default=0.25, help="Fast-tier stub model latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.variants.split(",") if name.strip()]
+    unknown = [name for name in names if name not in VARIANTS]
+    if unknown:
+        parser.error(f"unknown variants: {', '.join(unknown)}")
+    if args.live:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        configure_gemini()
+
+    index = load_index()
+    queries = load_queries(args.queries)
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key != "output"},
+        "queries": len(queries),
+        "variants": {name: evaluate_variant(args, index, queries, VARIANTS[name]) for name in names},
+    }
+    # Cache hits skip the model, so they would always win on latency; only cold runs are compared
+    meeting = [
+        (result["latency"]["p50_ms"], name)
+        for name, result in report["variants"].items()
+        if result[f"recall@{args.k}"] >= args.min_recall and not result.get("cache_hits")
+    ]
+    report["recommended"] = min(meeting)[1] if meeting else None
+
+    print(comparison_table(report, args.k, args.min_recall))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Local stand-ins for the benchmarks: a deterministic fake Gemini model and a job posting server"""
+import asyncio
+import json
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from recommender.resilience import TokenBucket
+
+CANDIDATES_MARKER = "Candidate assessments:\n"
+
+SAMPLE_POSTINGS = [
+    "Java Developer\nRequirements:\n- 3+ years of Java and Spring Boot experience.\n- Strong SQL and REST API design skills.\n"
+    "- Collaborate with business stakeholders.",
+    "Data Analyst\nResponsibilities:\n- Build dashboards in Power BI and Excel.\n- Analyze data with SQL and Python.\n"
+    "Requirements:\n- Strong numerical reasoning and communication skills.",
+    "Sales Representative\nWhat you'll do:\n- Manage a pipeline of enterprise customers.\n"
+    "Requirements:\n- Excellent verbal communication and negotiation skills.\n- Resilience and a customer focus.",
+    "Customer Service Agent\nRequirements:\n- Strong English comprehension and typing speed.\n"
+    "- Empathy and problem solving with customers on the phone.",
+]
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubServerError(Exception):
+    """Injected transient failure; looks like a 503 to the retry and breaker logic"""
+
+    code = 503
+
+
+class StubModel:
+    """Deterministic replacement for ``genai.GenerativeModel``
+
+    Answers with the first ``items`` candidates found in the prompt after a
+    configurable latency (plus seeded jitter), and fails a seeded fraction of calls.
+    With ``invalid_rate`` some answers point at URLs outside the catalog, which makes
+    the router escalate.
+    """
+
+    def __init__(self, latency=0.05, jitter=0.0, failure_rate=0.0, invalid_rate=0.0, items=5, chunk_size=64, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.items = items
+        self.chunk_size = chunk_size
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _draw(self):
+        with self._lock:
+            self.calls += 1
+            return (
+                self.latency + self._rng.uniform(0, self.jitter),
+                self._rng.random() < self.failure_rate,
+                self._rng.random() < self.invalid_rate,
+            )
+
+    def respond(self, prompt, invalid=False):
+        start = prompt.find(CANDIDATES_MARKER)
+        candidates = []
+        if start >= 0:
+            candidates, _ = json.JSONDecoder().raw_decode(prompt, start + len(CANDIDATES_MARKER))
+        answer = [dict(c) for c in candidates[:self.items]]
+        if invalid:
+            for item in answer:
+                item["URL"] = "https://www.shl.com/not-in-the-catalog/"
+        return json.dumps(answer)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        delay, fail, invalid = self._draw()
+        await asyncio.sleep(delay)
+        if fail:
+            raise StubServerError("503 injected stub failure")
+        text = self.respond(prompt, invalid)
+        if not stream:
+            return StubResponse(text)
+
+        async def chunks():
+            for i in range(0, len(text), self.chunk_size):
+                await asyncio.sleep(0)
+                yield StubResponse(text[i:i + self.chunk_size])
+
+        return chunks()
+
+
+def install_stubs(recommender, primary, fast=None):
+    """Point a Recommender's model tiers at stub models and lift the client-side rate limit"""
+    recommender._models[recommender.model_name] = primary
+    recommender.async_client._model = None
+    unlimited = TokenBucket(0)
+    recommender.async_client.limiter = unlimited
+    if recommender.fast_client is not None:
+        recommender._models[recommender.fast_model_name] = fast or primary
+        recommender.fast_client._model = None
+        recommender.fast_client.limiter = unlimited
+    return recommender
+
+
+class _PostingHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            index = int(self.path.rstrip("/").rsplit("/", 1)[-1])
+        except ValueError:
+            index = 0
+        body = SAMPLE_POSTINGS[index % len(SAMPLE_POSTINGS)].replace("\n", "<br>\n")
+        html = (
+            "<html><head><title>Careers</title><script>var tracking = 1;</script></head><body>"
+            "<nav><a href='/'>Home</a> <a href='/jobs'>Jobs</a> <a href='/login'>Sign in</a></nav>"
+            f"<main><p>{body}</p></main>"
+            "<footer>Privacy policy | Cookie settings | All rights reserved</footer></body></html>"
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(html)))
+        self.end_headers()
+        self.wfile.write(html)
+
+    def log_message(self, *args):
+        pass
+
+
+class JobPostingServer:
+    """Local HTTP server serving synthetic job postings at ``/jobs/<n>``"""
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _PostingHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def url(self, index):
+        return f"http://127.0.0.1:{self.server.server_port}/jobs/{index}"
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
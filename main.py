@@ -1,14 +1,63 @@
+import time
+_RERUN_STARTED = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import json
-import google.generativeai as genai
-from bs4 import BeautifulSoup
-import requests
-import re
-from dotenv import load_dotenv
 import os
-import time
-import threading
+from recommender import metrics, precompute
+from recommender.engine import (
+    RecommendationError,
+    Recommender,
+    configure_gemini,
+    extract_job_description_from_url,
+    normalize_recommendation,
+)
+from recommender.jobqueue import DONE, FAILED, open_queue
+from recommender.results import ResultStore
+from recommender.worker import WorkerPool, submit_recommendation
+
+STYLES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "styles.css")
+JOB_POLL_INTERVAL = 0.5
+PAGE_SIZES = [10, 25, 50, 100]
+# Exports are written to disk rather than cached in memory, and removed once this old (seconds)
+EXPORT_TTL = 600
+
+@st.cache_resource(show_spinner=False)
+def get_process_timings():
+    """Process-wide startup timings; created on the first script run after the server starts"""
+    return {"process_started": _RERUN_STARTED, "cold_start_ms": None}
+
+@st.cache_resource(show_spinner=False)
+def load_environment():
+    """Read .env and configure the Gemini SDK once per process"""
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return configure_gemini()
+
+@st.cache_resource(show_spinner=False)
+def start_metrics_server():
+    """Expose Prometheus metrics on METRICS_PORT, once per process"""
+    port = os.getenv("METRICS_PORT")
+    if metrics.ENABLED and port:
+        return metrics.serve(int(port))
+    return None
+
+@st.cache_resource(show_spinner=False)
+def load_styles():
+    """Custom CSS, read from disk once per process"""
+    with open(STYLES_PATH, encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+def record_rerun_timing():
+    """Record this script run's duration for the performance panel"""
+    elapsed_ms = (time.perf_counter() - _RERUN_STARTED) * 1000
+    process_timings = get_process_timings()
+    if process_timings["cold_start_ms"] is None:
+        process_timings["cold_start_ms"] = elapsed_ms
+    timings = st.session_state.setdefault("rerun_timings", [])
+    timings.append(elapsed_ms)
+    del timings[:-50]
+    return process_timings["cold_start_ms"], timings
 
 # Page configuration
 st.set_page_config(
@@ -23,10 +72,8 @@ if "app_initialized" not in st.session_state:
     st.session_state.app_initialized = False
 if "job_desc" not in st.session_state:
     st.session_state.job_desc = ""
-if "recommendations" not in st.session_state:
-    st.session_state.recommendations = []
-if "raw_json" not in st.session_state:
-    st.session_state.raw_json = ""
+if "result_handle" not in st.session_state:
+    st.session_state.result_handle = None
 if "selected_query" not in st.session_state:
     st.session_state.selected_query = ""
 if "input_type" not in st.session_state:
@@ -39,10 +86,9 @@ if "success_message" not in st.session_state:
     st.session_state.success_message = None
 
 # Load the API key with improved user feedback
+api_key = load_environment()
+start_metrics_server()
 if not st.session_state.app_initialized:
-    load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY")
-    
     with st.sidebar:
         st.image("https://www.shl.com/assets/header-graphics/SHL-logo-colour-update.svg", width=200)
         st.title("SHL Assessment Recommender")
@@ -55,287 +101,159 @@ if not st.session_state.app_initialized:
             st.success("✅ API connection established!")
             
     st.session_state.app_initialized = True
-    genai.configure(api_key=api_key)
-else:
-    load_dotenv()
-    api_key = os.getenv("GEMINI_API_KEY")
-    genai.configure(api_key=api_key)
-
-# Enhanced UI styles
-st.markdown("""
-    <style>
-    /* Main styling */
-    .main {
-        background-color: #f8f9fa;
-    }
-    
-    /* Button styling */
-    .stButton>button {
-        background-color: #005B96;
-        color: white;
-        border-radius: 5px;
-        padding: 8px 16px;
-        font-weight: 600;
-        width: 100%;
-        transition: all 0.3s;
-    }
-    .stButton>button:hover {
-        background-color: #003F6C;
-        transform: translateY(-2px);
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-    }
-    
-    /* Card styling */
-    .css-1r6slb0 {
-        border-radius: 10px !important;
-        box-shadow: 0 4px 6px rgba(0,0,0,0.1) !important;
-    }
-    
-    /* Input fields */
-    .stTextInput>div>div>input, .stTextArea>div>div>textarea {
-        border-radius: 5px;
-        border: 1px solid #E5E7EB;
-    }
-    
-    /* Headers */
-    h1, h2, h3 {
-        color: #005B96;
-        font-weight: 700;
-    }
-    
-    /* Labels */
-    .stTextInput>label, .stSelectbox>label, .stRadio>label {
-        color: #374151;
-        font-weight: 500;
-    }
-    
-    /* DataFrame styling */
-    .stDataFrame {
-        border: none;
-        border-radius: 10px;
-        overflow: hidden;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-    }
-    
-    /* Sidebar */
-    .css-1d391kg {
-        background-color: #f1f5f9;
-    }
-    
-    /* Cards for recommendations */
-    .recommendation-card {
-        background-color: white;
-        border-radius: 10px;
-        padding: 20px;
-        margin-bottom: 15px;
-        box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-        transition: all 0.3s;
-    }
-    .recommendation-card:hover {
-        box-shadow: 0 4px 8px rgba(0,0,0,0.1);
-        transform: translateY(-2px);
-    }
-    .recommendation-title {
-        color: #005B96;
-        font-weight: 600;
-        font-size: 18px;
-        margin-bottom: 10px;
-    }
-    .recommendation-badge {
-        display: inline-block;
-        background-color: #E1F0FF;
-        color: #005B96;
-        padding: 3px 8px;
-        border-radius: 12px;
-        font-size: 12px;
-        margin-right: 5px;
-        margin-bottom: 5px;
-    }
-    .recommendation-detail {
-        margin: 5px 0;
-        color: #4B5563;
-    }
-    .recommendation-link {
-        display: inline-block;
-        background-color: #005B96;
-        color: white;
-        padding: 5px 15px;
-        border-radius: 5px;
-        text-decoration: none;
-        font-weight: 500;
-        margin-top: 10px;
-        transition: all 0.3s;
-    }
-    .recommendation-link:hover {
-        background-color: #003F6C;
-    }
-    
-    /* Progress animation */
-    @keyframes pulse {
-        0% { opacity: 0.6; }
-        50% { opacity: 1; }
-        100% { opacity: 0.6; }
-    }
-    .pulse-animation {
-        animation: pulse 1.5s infinite;
-    }
-    
-    /* Improved tabs */
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 2px;
-    }
-    .stTabs [data-baseweb="tab"] {
-        background-color: #f1f5f9;
-        border-radius: 5px 5px 0 0;
-        padding: 10px 20px;
-        color: #4B5563;
-    }
-    .stTabs [aria-selected="true"] {
-        background-color: white !important;
-        color: #005B96 !important;
-        font-weight: 600;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-def json_extraction(response_text):
-    """Extract JSON array from the model response"""
-    try:
-        if isinstance(response_text, str):
-            match = re.search(r'(\[\s*{.*?}\s*\])', response_text, re.DOTALL)
-            if match:
-                return json.loads(match.group())
-        elif isinstance(response_text, list):
-            return response_text
-        else:
-            st.session_state.error_message = "Unsupported response format received. Expected string or list."
-    except json.JSONDecodeError as e:
-        st.session_state.error_message = f"Could not process model response. Please try again."
-    except Exception as e:
-        st.session_state.error_message = f"Unexpected error during processing. Please try again."
-    return []
-
-def get_assessment_recommendation(query):
-    """Get AI recommendations based on job description"""
-    model = genai.GenerativeModel("gemini-1.5-pro")
-    if len(query) > 1500:
-        query = query[:1500]  # Limit length to avoid token issues
-    
-    prompt = (
-        f"Given the following job description, recommend up to 7 SHL assessments that would be most suitable.\n\n"
-        f"{query.strip()}\n\n"
-        "Respond ONLY as a JSON array with up to 7 objects. Each object must have:\n"
-        "- Assessment Name (string)\n"
-        "- URL (string, MUST be a valid SHL link starting with https://www.shl.com/)\n"
-        "- Remote Testing Support (exactly 'Yes' or 'No')\n"
-        "- Adaptive/IRT Support (exactly 'Yes' or 'No')\n"
-        "- Duration (string with time in minutes, e.g. '25 minutes')\n"
-        "- Test Type (list of strings, e.g. ['Numerical', 'Reasoning'])\n"
-        "- Description (short string with 1-2 sentences describing the assessment)\n\n"
-        "Important: Ensure all URLs begin with 'https://www.shl.com/' and are valid links.\n"
-        "Format Test Type as an actual array of strings, not a single string.\n"
-        "Example of correct format for Test Type: ['Numerical', 'Reasoning'] not 'Numerical, Reasoning'.\n"
-        "Do NOT add explanation or commentary. Only return valid JSON that can be parsed using json.loads()."
-    )
 
-    response_container = {"response": None, "error": None}
+# Enhanced UI styles (read once per process; Streamlit still needs the element on every rerun)
+st.markdown(load_styles(), unsafe_allow_html=True)
 
-    def make_api_call():
-        try:
-            response = model.generate_content(prompt)
-            response_container["response"] = response.text.strip()
-        except Exception as e:
-            response_container["error"] = str(e)
+@st.cache_resource(show_spinner=False)
+def get_recommender():
+    """Process-wide recommender holding the catalog index, response cache and model client"""
+    return Recommender.from_env()
 
-    api_thread = threading.Thread(target=make_api_call)
-    api_thread.start()
-    
-    # Show a dynamic progress bar during processing
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-    
-    for i in range(100):
-        if not api_thread.is_alive():
-            break
-        progress_bar.progress(i + 1)
-        status_text.markdown(f"""
-            <div style="text-align: center">
-                <p class="pulse-animation">Processing your job description...</p>
-                <p style="font-size: 12px; color: #6B7280">Finding the best assessments for your needs</p>
-            </div>
-        """, unsafe_allow_html=True)
-        time.sleep(0.3)
-    
-    # Clean up progress display
-    progress_bar.empty()
-    status_text.empty()
-    
-    # Handle API response
-    if api_thread.is_alive():
-        api_thread.join(timeout=5)  # Give a little more time to finish
-        if api_thread.is_alive():
-            st.session_state.error_message = "Request timed out. Please try again with a shorter job description."
-            return None
-            
-    if response_container["error"]:
-        st.session_state.error_message = f"Error connecting to recommendation service: {response_container['error']}"
-        return None
+@st.cache_resource(show_spinner=False)
+def start_precompute_refresher():
+    """Keep the precomputed sample/template answers current in the background, once per process"""
+    return precompute.start_refresher(get_recommender())
+
+@st.cache_resource(show_spinner=False)
+def load_sample_jobs():
+    """Sample jobs and role templates as ``(label, job description)`` pairs"""
+    return precompute.warm_queries()
+
+@st.cache_resource(show_spinner=False)
+def get_result_store():
+    """Process-wide store of compact results; sessions keep only a handle into it"""
+    index = get_recommender().catalog_index
+    return ResultStore(index.catalog if index is not None else None)
+
+def save_result(recommendations):
+    """Store this session's recommendations server-side and keep only the handle"""
+    store = get_result_store()
+    if st.session_state.result_handle:
+        store.discard(st.session_state.result_handle)
+    handle = store.put(recommendations, st.session_state.job_desc) if recommendations else None
+    st.session_state.result_handle = handle
+    # The handle in the URL lets a reconnecting browser pick the result up again
+    if handle:
+        st.query_params["result"] = handle
     else:
-        return response_container["response"]
-
-def get_assessment_recommendation_with_retries(query, max_retries=2):
-    """Handle retries for the recommendation API"""
-    for attempt in range(max_retries):
-        response = get_assessment_recommendation(query)
-        if response is not None:
-            return response
-        if attempt < max_retries - 1:
-            wait_time = 2 * (attempt + 1)  # Backoff: 2, 4 seconds
-            retry_message = st.empty()
-            retry_message.warning(f"Retrying request... Attempt {attempt + 1}/{max_retries}")
-            time.sleep(wait_time)
-            retry_message.empty()
-    
-    if st.session_state.error_message is None:
-        st.session_state.error_message = "Unable to process your request. Please try again later or with a different job description."
-    return None
+        st.query_params.pop("result", None)
+
+def load_result():
+    """This session's recommendations, or [] when there are none or they expired"""
+    handle = st.session_state.result_handle
+    stored = get_result_store().get(handle) if handle else None
+    if stored is None:
+        st.session_state.result_handle = None
+        return []
+    return stored[0]
+
+@st.cache_resource(show_spinner=False)
+def get_job_queue():
+    """Shared job queue (JOB_QUEUE_URL), or None to run recommendations in the session's script thread
+
+    EMBEDDED_WORKERS starts that many worker threads in this process, for single-box
+    deployments without separate ``python -m recommender.worker`` processes.
+    """
+    queue = open_queue()
+    embedded = int(os.getenv("EMBEDDED_WORKERS", "0"))
+    if queue is not None and embedded > 0:
+        WorkerPool(queue, get_recommender(), embedded).start()
+    return queue
+
+def poll_pending_job():
+    """Collect the result of this session's queued job once a worker has finished it"""
+    job_id = st.session_state.get("pending_job")
+    if not job_id:
+        return
+    job = get_job_queue().get(job_id)
+    if job is not None and job["status"] not in (DONE, FAILED):
+        return
+    st.session_state.pending_job = None
+    if job is not None and job["status"] == DONE and job["result"]:
+        save_result(job["result"])
+        st.session_state.success_message = "✅ Analysis complete! View your recommendations in the Recommendations tab."
+    else:
+        st.session_state.error_message = (job or {}).get("error") or "Unable to generate recommendations. Please try again."
+
+def get_recommendation_cache():
+    """Process-wide recommendation cache shared by all sessions"""
+    return get_recommender().cache
+
+@metrics.traced("stream_recommendations")
+def stream_recommendations(job_desc, mode, live_table, live_status):
+    """Run ``Recommender.recommend_stream``, rendering each assessment as soon as it arrives
+
+    Returns the recommendations; items that arrived before a failure are kept. When
+    nothing arrived, the error is left in ``st.session_state.error_message``.
+    """
+    import pandas as pd
 
-def extract_job_description_from_url(url):
-    """Extract job description from URL"""
+    recommendations = []
+    query_stats = {}
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Try to focus on the main content
-        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=re.compile(r'job|position|description', re.I))
-        
-        if main_content:
-            text = main_content.get_text(separator='\n', strip=True)
-        else:
-            text = soup.get_text(separator='\n', strip=True)
-            
-        # Clean up the text
-        text = re.sub(r'\n+', '\n', text)
-        text = re.sub(r'\s+', ' ', text)
-        
-        return text
+        for rec in get_recommender().recommend_stream(job_desc, mode, query_stats=query_stats):
+            recommendations.append(rec)
+            live_status.info(f"Received {len(recommendations)} assessment(s) so far...")
+            live_table.dataframe(
+                pd.DataFrame([normalize_recommendation(dict(item)) for item in recommendations]),
+                hide_index=True,
+                use_container_width=True
+            )
     except Exception as e:
-        return f"Error fetching URL: {str(e)}"
+        if not recommendations:
+            st.session_state.error_message = str(e) if isinstance(e, RecommendationError) else (
+                f"Error connecting to recommendation service: {e}"
+            )
+    finally:
+        live_status.empty()
+        live_table.empty()
+    st.session_state.query_stats = query_stats
+    return recommendations
+
+@st.cache_resource(show_spinner=False, max_entries=256, ttl=3600)
+def get_recommendation_table(handle, _recommendations):
+    """Normalized recommendation table, built once per stored result and shared process-wide"""
+    from recommender.table import RecommendationTable
+
+    return RecommendationTable(_recommendations)
+
+def write_export(handle, signature, export_format, table, rows):
+    """Path of the export file of the filtered rows, written chunk by chunk once per result, filter set and format"""
+    import hashlib
+    import tempfile
+
+    directory = os.path.join(tempfile.gettempdir(), "shl-exports")
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha1(repr((handle, signature, export_format)).encode("utf-8")).hexdigest()
+    path = os.path.join(directory, f"{digest}.{export_format.lower()}")
+    try:
+        os.utime(path)  # Reused: a fresh mtime keeps it from being cleaned up
+        return path
+    except FileNotFoundError:
+        pass
+    for name in os.listdir(directory):
+        try:
+            if time.time() - os.path.getmtime(os.path.join(directory, name)) > EXPORT_TTL:
+                os.remove(os.path.join(directory, name))
+        except OSError:
+            pass  # Removed by another session meanwhile
+    chunks = table.iter_csv(rows) if export_format == "CSV" else table.iter_json(rows)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        f.writelines(chunks)
+    os.replace(tmp, path)
+    return path
 
+@metrics.traced("display_recommendations")
 def display_recommendations(recommendations):
     """Display recommendations in an interactive card layout"""
     if not recommendations:
         st.warning("No matching assessments found. Try adjusting your search criteria.")
         return
     
-    # Get unique test types for filtering
-    test_types = set()
-    for rec in recommendations:
-        if isinstance(rec.get("Test Type"), list):
-            test_types.update(rec["Test Type"])
-        elif isinstance(rec.get("Test Type"), str):
-            test_types.add(rec["Test Type"])
+    # Parse once per stored result; widget reruns reuse the normalized table
+    table = get_recommendation_table(st.session_state.result_handle, recommendations)
     
     # Create filter sidebar
     with st.sidebar:
@@ -344,7 +262,7 @@ def display_recommendations(recommendations):
         # Test type filter
         selected_types = st.multiselect(
             "Assessment Types:",
-            options=sorted(test_types),
+            options=table.test_types,
             default=[],
             help="Select one or more assessment types to filter"
         )
@@ -377,81 +295,93 @@ def display_recommendations(recommendations):
             horizontal=True
         )
     
-    # Apply filters
-    filtered_recs = recommendations.copy()
-    
-    # Filter by test type
-    if selected_types:
-        filtered_recs = [
-            rec for rec in filtered_recs
-            if any(
-                t in (rec["Test Type"] if isinstance(rec["Test Type"], list) else [rec["Test Type"]])
-                for t in selected_types
-            )
-        ]
-    
-    # Filter by duration
-    filtered_recs = [
-        rec for rec in filtered_recs
-        if (
-            isinstance(rec.get("Duration"), str) and
-            re.search(r'\d+', rec["Duration"]) and
-            int(re.search(r'\d+', rec["Duration"]).group()) <= max_duration
-        )
-    ]
-    
-    # Filter by remote testing support
-    if remote_filter != "All":
-        filtered_recs = [
-            rec for rec in filtered_recs
-            if rec.get("Remote Testing Support") == remote_filter
-        ]
+    from recommender.table import SORT_OPTIONS
+
+    sort_col, size_col, page_col = st.columns([2, 1, 1])
+    sort = sort_col.selectbox("Sort by:", SORT_OPTIONS, key="results_sort")
+    page_size = size_col.selectbox("Per page:", PAGE_SIZES, index=1, key="results_page_size")
+    
+    # Filter and sort as row numbers over the cached table; only the visible page goes to the browser
+    rows = table.rows(
+        sort=sort,
+        selected_types=selected_types,
+        max_duration=max_duration,
+        remote_filter=remote_filter,
+        adaptive_filter=adaptive_filter
+    )
+    filter_signature = (st.session_state.result_handle, tuple(selected_types), max_duration, remote_filter, adaptive_filter, sort)
     
-    # Filter by adaptive testing support
-    if adaptive_filter != "All":
-        filtered_recs = [
-            rec for rec in filtered_recs
-            if rec.get("Adaptive/IRT Support") == adaptive_filter
-        ]
+    # Back to the first page whenever the result set or its order changes
+    pages = max(1, -(-len(rows) // page_size))
+    if st.session_state.get("results_signature") != (filter_signature, page_size):
+        st.session_state.results_signature = (filter_signature, page_size)
+        st.session_state.results_page = 1
+    page = page_col.number_input(f"Page (of {pages}):", min_value=1, max_value=pages, step=1, key="results_page")
     
     # Display count of results
-    st.markdown(f"### Found {len(filtered_recs)} matching assessments")
+    st.markdown(f"### Found {len(rows)} matching assessments")
     
     # Display as enhanced table
-    if filtered_recs:
-        df = pd.DataFrame(filtered_recs)
-        
-        # Ensure all expected columns exist
-        for col in ["Assessment Name", "URL", "Remote Testing Support", "Adaptive/IRT Support", "Duration", "Test Type", "Description"]:
-            if col not in df.columns:
-                df[col] = ["N/A"] * len(df)
-        
-        # Fix and validate URLs
-        for i, url in enumerate(df["URL"]):
-            if not isinstance(url, str) or not url.startswith("http"):
-                df.at[i, "URL"] = "https://www.shl.com/solutions/products/product-catalog/"
-        
-        # Format test types for better display
-        if "Test Type" in df.columns:
-            df["Test Type"] = df["Test Type"].apply(
-                lambda x: x if isinstance(x, list) else [x] if isinstance(x, str) else ["General"]
-            )
-        
+    if len(rows):
+        start = (page - 1) * page_size
+        page_rows = rows[start:start + page_size]
+        st.caption(f"Showing {start + 1}-{start + len(page_rows)} of {len(rows)}")
         # Configure column display with improved formatting
         st.dataframe(
-            df,
+            table.page(rows, page, page_size),
             column_config={
                 "Assessment Name": st.column_config.TextColumn("Assessment Name", width="medium"),
                 "URL": st.column_config.LinkColumn("URL", display_text="View Assessment", width="small"),
                 "Remote Testing Support": st.column_config.TextColumn("Remote", width="small"),
                 "Adaptive/IRT Support": st.column_config.TextColumn("Adaptive", width="small"),
                 "Duration": st.column_config.TextColumn("Duration", width="small"),
-                "Test Type": st.column_config.ListColumn("Test Type", width="medium"),
-                "Description": st.column_config.TextColumn("Description", width="large")
+                "Test Type": st.column_config.ListColumn("Test Type", width="medium")
             },
             hide_index=True,
             use_container_width=True
         )
+        
+        # Descriptions are loaded for the one assessment being looked at, not shipped with every row
+        detail_row = st.selectbox(
+            "Assessment details:",
+            options=[None] + [int(row) for row in page_rows],
+            format_func=lambda row: "Select an assessment on this page..." if row is None else table.df.at[row, "Assessment Name"]
+        )
+        if detail_row is not None:
+            detail = table.record(detail_row)
+            st.markdown(f"**{detail['Assessment Name']}** · [View Assessment]({detail['URL']})")
+            st.write(detail["Description"])
+            st.caption(
+                f"Duration: {detail['Duration']} · Remote: {detail['Remote Testing Support']} · "
+                f"Adaptive: {detail['Adaptive/IRT Support']} · Test types: {', '.join(detail['Test Type'])}"
+            )
+        
+        # Exports cover every filtered row and are only written when asked for
+        format_col, export_col = st.columns([1, 2])
+        export_format = format_col.radio("Export format:", ["CSV", "JSON"], horizontal=True, key="export_format")
+        if export_col.button(f"Prepare {export_format} export ({len(rows)} assessments)", key="prepare_export"):
+            st.session_state.export_signature = (filter_signature, export_format)
+        if st.session_state.get("export_signature") == (filter_signature, export_format):
+            path = write_export(st.session_state.result_handle, filter_signature, export_format, table, rows)
+            with open(path, "rb") as export_file:
+                export_col.download_button(
+                    f"⬇️ Download {export_format}",
+                    export_file,
+                    file_name=f"shl_recommendations.{export_format.lower()}",
+                    mime="text/csv" if export_format == "CSV" else "application/json",
+                    key="download_export"
+                )
+
+# A new session (reconnect, shared link) restores its result from the handle in the URL
+if st.session_state.result_handle is None and st.query_params.get("result"):
+    restored = get_result_store().get(st.query_params["result"])
+    if restored is not None:
+        st.session_state.result_handle = st.query_params["result"]
+        if not st.session_state.job_desc:
+            st.session_state.job_desc = restored[1]
+
+# Regenerate precomputed answers in the background when the prompt, catalog or model changes
+start_precompute_refresher()
 
 # Sidebar content
 with st.sidebar:
@@ -468,6 +398,12 @@ with st.sidebar:
     **Need help?** Contact your SHL representative.
     """)
     
+    cache_stats = get_recommendation_cache().stats()
+    st.caption(
+        f"Recommendation cache: {cache_stats['hits']} hits "
+        f"({cache_stats['near_duplicate_hits']} near-duplicate) / {cache_stats['misses']} misses"
+    )
+    
     st.markdown("---")
     
     # Footer
@@ -482,6 +418,9 @@ with st.sidebar:
 st.title("SHL Assessment Recommender")
 st.markdown("Find the perfect assessments for your hiring needs in seconds. This tool uses AI to analyze job descriptions and recommend the most suitable SHL assessments.")
 
+# Pick up a finished queued job before rendering its messages and results
+poll_pending_job()
+
 # Tab for job description input
 tab1, tab2 = st.tabs(["📝 Job Description", "📊 Recommendations"])
 
@@ -496,22 +435,17 @@ with tab1:
         key="input_method"
     )
     
-    # Sample job descriptions
-    sample_queries = [
-        "Hiring a software engineer skilled in Python, JavaScript, and system design, with experience in cloud architecture and CI/CD pipelines. The candidate should have strong problem-solving skills and be able to work in an agile environment.",
-        "Looking for a product manager with experience in agile methodologies, market research, and team leadership. The ideal candidate will have 3+ years of experience in product development and a track record of successful product launches.",
-        "Recruiting a data analyst with expertise in Excel, SQL, Power BI, and statistics. The role requires strong analytical thinking and the ability to communicate insights to non-technical stakeholders.",
-        "Seeking a customer service representative with excellent communication skills, problem-solving abilities, and experience with CRM systems. The ideal candidate will be patient, empathetic, and able to handle difficult customer situations."
-    ]
+    # Sample jobs and role templates; their recommendations are precomputed
+    sample_jobs = load_sample_jobs()
     
     if input_type == "Sample Job":
         job_selection = st.selectbox(
             "Choose a sample job description:",
-            options=range(len(sample_queries)),
-            format_func=lambda i: f"Sample {i+1}: {sample_queries[i][:50]}...",
+            options=range(len(sample_jobs)),
+            format_func=lambda i: sample_jobs[i][0],
             key="sample_selection"
         )
-        st.session_state.job_desc = sample_queries[job_selection]
+        st.session_state.job_desc = sample_jobs[job_selection][1]
         
         with st.expander("View full sample job description"):
             st.markdown(f"```\n{st.session_state.job_desc}\n```")
@@ -533,8 +467,9 @@ with tab1:
         )
         
         if url_input and st.button("Extract Job Description", key="extract_button"):
-            with st.spinner("Extracting job description from URL..."):
+            with st.spinner("Extracting job description from URL..."), metrics.trace() as spans:
                 extracted_text = extract_job_description_from_url(url_input)
+                st.session_state.last_extract_trace = spans
                 if extracted_text.startswith("Error"):
                     st.error(extracted_text)
                 else:
@@ -543,6 +478,15 @@ with tab1:
                     with st.expander("View extracted job description"):
                         st.markdown(f"```\n{st.session_state.job_desc[:500]}...\n```")
     
+    # Recommendation mode
+    match_mode = st.radio(
+        "Recommendation mode:",
+        ["Catalog + AI rerank", "Catalog match only (instant)"],
+        horizontal=True,
+        key="match_mode",
+        help="Catalog match only skips the Gemini call and returns the closest catalog assessments directly"
+    )
+    
     # Processing controls
     col1, col2 = st.columns([1, 1])
     
@@ -553,40 +497,67 @@ with tab1:
             else:
                 # Clear previous results and errors
                 st.session_state.error_message = None
-                st.session_state.recommendations = []
+                results = []
                 st.session_state.processing = True
                 st.session_state.success_message = None
+                st.session_state.query_stats = None
+                metrics.begin_trace()
+                mode = "catalog" if match_mode == "Catalog match only (instant)" else "rerank"
                 
-                # Process in background
-                with st.spinner("Analyzing job description..."):
-                    raw_json = get_assessment_recommendation_with_retries(st.session_state.job_desc)
-                    
-                if raw_json:
-                    st.session_state.raw_json = raw_json
-                    st.session_state.recommendations = json_extraction(raw_json)
-                    if st.session_state.recommendations:
+                if get_job_queue() is not None:
+                    # Answers that need no model call are served here; the rest go to the worker pool
+                    query_stats = {}
+                    results = get_recommender().instant_recommendations(st.session_state.job_desc, mode, query_stats) or []
+                    if results:
+                        st.session_state.query_stats = query_stats
                         st.session_state.success_message = "✅ Analysis complete! View your recommendations in the Recommendations tab."
-                        st.switch_page = "tab2"  # Trigger tab switch after processing
+                    else:
+                        # This session polls for the worker's result
+                        st.session_state.pending_job = submit_recommendation(get_job_queue(), st.session_state.job_desc, mode)
                 else:
-                    if not st.session_state.error_message:
+                    # Gemini has been failing: the recommender serves the catalog match without waiting on it
+                    circuit_open = get_recommender().async_client.breaker.state == "open"
+                    # Stream results into the Recommendations tab as each assessment completes
+                    with tab2:
+                        live_table = st.empty()
+                    results = stream_recommendations(st.session_state.job_desc, mode, live_table, st.empty())
+                    degraded = circuit_open and mode == "rerank"
+                    
+                    if not results and st.session_state.error_message:
+                        # Gemini failed: degrade to the catalog match rather than an error
+                        try:
+                            results = get_recommender().degraded(st.session_state.job_desc, st.session_state.error_message)
+                            st.session_state.error_message = None
+                            degraded = True
+                        except RecommendationError:
+                            pass
+                    if results:
+                        st.session_state.success_message = (
+                            "⚠️ AI reranking is unavailable right now, so these are the closest catalog matches."
+                            if degraded else "✅ Analysis complete! View your recommendations in the Recommendations tab."
+                        )
+                    elif not st.session_state.error_message:
                         st.session_state.error_message = "Unable to generate recommendations. Please try again."
                         
+                save_result(results)
                 st.session_state.processing = False
+                st.session_state.last_trace = metrics.end_trace()
                 
                 # Automatically switch to recommendations tab if successful
-                if st.session_state.recommendations:
+                if results:
                     st.rerun()
     
     with col2:
         if st.button("🔄 Reset", key="reset_button", use_container_width=True):
             st.session_state.job_desc = ""
-            st.session_state.recommendations = []
-            st.session_state.raw_json = ""
+            save_result([])
             st.session_state.error_message = None
             st.session_state.success_message = None
             st.rerun()
     
     # Show messages
+    if st.session_state.get("pending_job"):
+        st.info("⏳ Your request is being processed. Results will appear in the Recommendations tab shortly.")
     if st.session_state.error_message:
         st.error(st.session_state.error_message)
         st.session_state.error_message = None
@@ -594,6 +565,12 @@ with tab1:
     if st.session_state.success_message:
         st.success(st.session_state.success_message)
         st.session_state.success_message = None
+        query_stats = st.session_state.get("query_stats")
+        if query_stats and query_stats["saved_tokens"]:
+            st.caption(
+                f"Job description packed from {query_stats['original_tokens']} to {query_stats['tokens']} tokens "
+                f"({query_stats['saved_tokens']} saved)"
+            )
         
     # Add tips section
     with st.expander("Tips for better recommendations"):
@@ -606,8 +583,9 @@ with tab1:
         """)
 
 with tab2:
-    if st.session_state.recommendations:
-        display_recommendations(st.session_state.recommendations)
+    recommendations = load_result()
+    if recommendations:
+        display_recommendations(recommendations)
     else:
         st.info("No recommendations yet. Enter a job description and click 'Find Assessments' to get started.")
         
@@ -625,6 +603,8 @@ with tab2:
                     "Assesses key personality traits relevant to workplace performance."
                 ]
             }
+            import pandas as pd
+
             sample_df = pd.DataFrame(sample_data)
             
             st.dataframe(
@@ -641,3 +621,56 @@ with tab2:
                 hide_index=True,
                 use_container_width=True
             )
+
+# Rerun timing, measured up to this point; shown at the bottom of the sidebar
+cold_start_ms, rerun_timings = record_rerun_timing()
+with st.sidebar:
+    with st.expander("⏱️ Performance"):
+        st.caption(f"Cold start (first run in this process): {cold_start_ms:.0f} ms")
+        st.caption(f"This rerun: {rerun_timings[-1]:.0f} ms")
+        if len(rerun_timings) > 1:
+            warm = sorted(rerun_timings[1:])
+            st.caption(f"Warm reruns (median of {len(warm)}): {warm[len(warm) // 2]:.0f} ms")
+        routing = get_recommender().routing.snapshot()
+        if routing["requests"]:
+            st.caption(
+                f"Model routing: {routing['fast_accepted']} fast / {routing['escalated']} escalated "
+                f"({routing['escalation_rate']:.0%}), p50 {routing['p50_ms']:.0f} ms"
+            )
+        context = get_recommender().context
+        if context is not None and context.requests:
+            report = context.report()
+            saved = report.get("latency_saved_ms")
+            st.caption(
+                f"Prompt context ({report['mode']}, ~{report['prefix_tokens']} tokens): "
+                f"{report['cached_input_tokens']} input tokens served from cache"
+                + (f", {saved:.0f} ms faster per call" if saved is not None else "")
+            )
+
+# Per-stage timings for diagnosing slow requests; only rendered when METRICS_ENABLED is set
+if metrics.ENABLED:
+    with st.sidebar:
+        with st.expander("🔬 Debug: stage timings"):
+            import pandas as pd
+
+            for label, key in (("Last URL extraction", "last_extract_trace"), ("Last request", "last_trace")):
+                spans = st.session_state.get(key)
+                if spans:
+                    st.caption(f"{label}: {max(s['start_ms'] + s['duration_ms'] for s in spans):.0f} ms")
+                    st.dataframe(pd.DataFrame(spans).round(1), hide_index=True, use_container_width=True)
+            snapshot = metrics.snapshot()
+            stages = {
+                name[len("stage_duration_seconds"):].strip("{}"): {k: round(v * 1000, 1) if k != "count" else v for k, v in stats.items()}
+                for name, stats in snapshot["histograms"].items()
+                if name.startswith("stage_duration_seconds")
+            }
+            if stages:
+                st.caption("All sessions in this process (ms; p50/p95 over recent calls)")
+                st.dataframe(pd.DataFrame(stages).T, use_container_width=True)
+            if snapshot["counters"]:
+                st.json(snapshot["counters"], expanded=False)
+
+# Keep polling while a queued job is pending; the short sleep bounds the poll rate
+if st.session_state.get("pending_job"):
+    time.sleep(JOB_POLL_INTERVAL)
+    st.rerun()
@@ -0,0 +1,12 @@
+"""Recommendation engine for the SHL Assessment Recommender"""
+
+__all__ = ["CatalogIndex", "VectorIndex", "load_catalog", "load_index"]
+
+
+def __getattr__(name):
+    # The catalog pulls in NumPy; import it on first use so the UI starts faster
+    if name in __all__:
+        from recommender import catalog
+
+        return getattr(catalog, name)
+    raise AttributeError(f"module 'recommender' has no attribute {name!r}")
@@ -0,0 +1,169 @@
+"""HTTP API for the recommender
+
+Run with ``uvicorn recommender.api:app --workers 4``. Each worker keeps one
+long-lived ``Recommender`` (catalog index, response cache and Gemini client).
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+from starlette.concurrency import run_in_threadpool
+
+from recommender import metrics
+from recommender.engine import (
+    RecommendationError,
+    Recommender,
+    extract_job_description_from_url,
+    filter_recommendations,
+    normalize_recommendation,
+)
+from recommender.jobqueue import open_queue
+from recommender.precompute import start_refresher
+from recommender.worker import submit_recommendation
+
+
+class Filters(BaseModel):
+    test_types: List[str] = []
+    max_duration: Optional[int] = None
+    remote: Literal["All", "Yes", "No"] = "All"
+    adaptive: Literal["All", "Yes", "No"] = "All"
+
+
+class RecommendRequest(BaseModel):
+    job_description: Optional[str] = None
+    url: Optional[str] = None
+    mode: Literal["rerank", "catalog"] = "rerank"
+    filters: Optional[Filters] = None
+
+
+class BatchRequest(BaseModel):
+    requests: List[RecommendRequest] = Field(..., max_length=100)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    load_dotenv()
+    app.state.recommender = Recommender.from_env()
+    refresher = start_refresher(app.state.recommender)
+    app.state.queue = open_queue()
+    yield
+    if refresher is not None:
+        refresher.stop()
+
+
+app = FastAPI(title="SHL Assessment Recommender", lifespan=lifespan)
+
+
+async def _resolve_query(request):
+    """Job description text from the request body or its URL"""
+    query = request.job_description
+    if not query and request.url:
+        query = await run_in_threadpool(extract_job_description_from_url, request.url)
+        if query.startswith("Error"):
+            raise RecommendationError(query)
+    if not query or not query.strip():
+        raise RecommendationError("Please provide a job_description or url.")
+    return query
+
+
+async def _recommend(request):
+    """Resolve the job description, get its recommendations and filter them
+
+    URL extraction and query preparation run in threads; the model call is awaited on
+    the event loop, so concurrent requests share it without a thread each.
+    """
+    query = await _resolve_query(request)
+
+    query_stats = {}
+    with metrics.span("recommend", mode=request.mode):
+        recommendations = await app.state.recommender.recommend_async(query, request.mode, query_stats=query_stats)
+    if request.filters:
+        recommendations = filter_recommendations(
+            recommendations,
+            selected_types=request.filters.test_types,
+            max_duration=request.filters.max_duration,
+            remote_filter=request.filters.remote,
+            adaptive_filter=request.filters.adaptive,
+        )
+    return {"recommendations": [normalize_recommendation(rec) for rec in recommendations], "query_tokens": query_stats}
+
+
+@app.post("/recommend")
+async def recommend(request: RecommendRequest):
+    try:
+        return await _recommend(request)
+    except RecommendationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(batch: BatchRequest):
+    results = await asyncio.gather(*(_recommend(r) for r in batch.requests), return_exceptions=True)
+    return {
+        "results": [
+            {"error": str(result)} if isinstance(result, Exception) else result
+            for result in results
+        ]
+    }
+
+
+def _job_queue():
+    if app.state.queue is None:
+        raise HTTPException(status_code=503, detail="The job queue is not configured; set JOB_QUEUE_URL.")
+    return app.state.queue
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: RecommendRequest):
+    """Queue a recommendation for the worker pool and return its job ID immediately"""
+    queue = _job_queue()
+    try:
+        query = await _resolve_query(request)
+    except RecommendationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    job_id = await run_in_threadpool(submit_recommendation, queue, query, request.mode)
+    return {"job_id": job_id}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a queued job, with its recommendations once done"""
+    job = await run_in_threadpool(_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job.")
+    response = {"job_id": job_id, "status": job["status"]}
+    if job["result"] is not None:
+        response["recommendations"] = [normalize_recommendation(rec) for rec in job["result"]]
+    if job["error"] and job["status"] == "failed":
+        response["error"] = job["error"]
+    return response
+
+
+@app.get("/health")
+def health():
+    recommender = app.state.recommender
+    return {
+        "status": "ok",
+        "cache": recommender.cache.stats(),
+        "query_tokens": recommender.token_stats,
+        "routing": recommender.routing.snapshot(),
+        "context": recommender.context.report() if recommender.context is not None else {"mode": "off"},
+        "precomputed": {
+            "entries": len(recommender.precomputed) if recommender.precomputed is not None else 0,
+            "current": recommender.precomputed is not None
+            and recommender.precomputed.version == recommender.precompute_version,
+            "hits": recommender.precomputed.hits if recommender.precomputed is not None else 0,
+        },
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus scrape endpoint for this worker"""
+    if not metrics.ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set METRICS_ENABLED=1.")
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,264 @@
+import asyncio
+import concurrent.futures
+import os
+import queue
+import threading
+import time
+from collections import deque
+
+from recommender import metrics
+from recommender.preprocess import CHARS_PER_TOKEN, estimate_tokens
+from recommender.resilience import CircuitBreaker, CircuitOpenError, RateLimitExceeded, TokenBucket, is_retryable
+
+DEFAULT_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "35"))
+DEFAULT_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "16"))
+DEFAULT_RPM = float(os.getenv("GEMINI_RPM", "120"))
+DEFAULT_BURST = int(os.getenv("GEMINI_BURST", "10"))
+RATE_LIMIT_PATH = os.getenv("GEMINI_RATE_LIMIT_PATH") or None
+BREAKER_THRESHOLD = int(os.getenv("GEMINI_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+# "auto" hedges at the p95 of recent latencies, "0" disables hedging, a number is a fixed delay in seconds
+HEDGE_AFTER = os.getenv("GEMINI_HEDGE_AFTER", "auto")
+_HEDGE_MIN_SAMPLES = 20
+# At most this share of a call's deadline is spent waiting for a rate-limit token, so the call keeps time to run
+_MAX_RATE_WAIT_SHARE = 0.5
+
+_STREAM_END = object()
+_CIRCUIT_OPEN_MESSAGE = "The recommendation service is temporarily unavailable. Please try again shortly."
+
+
+class GenerationTimeout(Exception):
+    """Raised when a Gemini call misses its deadline"""
+
+
+def _record_usage(model, prompt, response, output_chars):
+    """Token counts from the response's usage metadata, estimated when the SDK gives none"""
+    if not metrics.ENABLED:
+        return
+    usage = getattr(response, "usage_metadata", None)
+    tokens_in = getattr(usage, "prompt_token_count", None) or estimate_tokens(prompt)
+    tokens_out = getattr(usage, "candidates_token_count", None) or -(-output_chars // CHARS_PER_TOKEN)
+    metrics.record_tokens(model, tokens_in, tokens_out)
+
+
+class AsyncGeminiClient:
+    """Gemini client running on one background event loop shared by every caller
+
+    Calls use the SDK's async generation API with an ``asyncio.wait_for`` deadline and a
+    bounded semaphore, so a single process can keep many requests in flight without a
+    thread per request. Synchronous callers (Streamlit scripts) block on a future;
+    async callers (the API) await it.
+
+    Every call first passes the circuit breaker and takes a token from the shared
+    rate limiter. Non-streaming calls slower than the hedge delay get one duplicate
+    request, and whichever answers first wins.
+    """
+
+    def __init__(self, model_factory, max_concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT, limiter=None,
+                 breaker=None, hedge_after=HEDGE_AFTER, name="gemini"):
+        self._model_factory = model_factory
+        self.name = name
+        self._model = None
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.limiter = limiter if limiter is not None else TokenBucket(DEFAULT_RPM, DEFAULT_BURST, RATE_LIMIT_PATH)
+        self.breaker = breaker if breaker is not None else CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+        self.hedge_after = None if hedge_after == "auto" else float(hedge_after)
+        self._latencies = deque(maxlen=200)
+        self._loop = None
+        self._semaphore = None
+        self._start_lock = threading.Lock()
+        self.in_flight = 0
+        self.hedged = 0
+
+    def _ensure_loop(self):
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    thread = threading.Thread(target=loop.run_forever, name="gemini-async-loop", daemon=True)
+                    thread.start()
+                    self._semaphore = asyncio.run_coroutine_threadsafe(
+                        self._make_semaphore(), loop
+                    ).result()
+                    self._loop = loop
+        return self._loop
+
+    async def _make_semaphore(self):
+        return asyncio.Semaphore(self.max_concurrency)
+
+    def hedge_delay(self):
+        """Seconds to wait before hedging a call, or None when hedging is off or there is no history yet"""
+        if self.hedge_after is not None:
+            return self.hedge_after or None
+        if len(self._latencies) < _HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _admit(self, max_wait):
+        """Fail fast on an open circuit, then take a token from the shared rate limiter, waiting up to ``max_wait``
+
+        The breaker's half-open probe is only claimed in ``_guarded``, so a caller cancelled here holds nothing.
+        """
+        if self.breaker.state == "open":
+            raise CircuitOpenError(_CIRCUIT_OPEN_MESSAGE)
+        wait = self.limiter.reserve(max_wait=max_wait)
+        if wait is None:
+            raise RateLimitExceeded("Too many requests right now. Please try again in a moment.")
+        if wait:
+            await asyncio.sleep(wait)
+
+    def _ensure_model(self):
+        if self._model is None:
+            self._model = self._model_factory()
+
+    async def _guarded(self, call):
+        """Run one API call under the semaphore, feeding its outcome to the breaker"""
+        async with self._semaphore:
+            # Asked only now, with no await before the call, so a cancelled wait can never strand a half-open probe
+            if not self.breaker.allow():
+                raise CircuitOpenError(_CIRCUIT_OPEN_MESSAGE)
+            self.in_flight += 1
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                if is_retryable(e):
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.release()
+                raise
+            finally:
+                self.in_flight -= 1
+        self.breaker.record_success()
+        return result
+
+    async def _attempt(self, prompt, deadline, timeout, **kwargs):
+        """One API call that must finish by ``deadline`` (loop time); ``timeout`` is the overall budget"""
+        async def call():
+            remaining = max(0.0, deadline - asyncio.get_running_loop().time())
+            try:
+                response = await asyncio.wait_for(self._model.generate_content_async(prompt, **kwargs), remaining)
+            except asyncio.TimeoutError:
+                metrics.inc("timeouts_total", model=self.name)
+                raise GenerationTimeout(f"Gemini call exceeded {timeout:g}s deadline")
+            text = response.text.strip()
+            _record_usage(self.name, prompt, response, len(text))
+            return text
+
+        started = time.monotonic()
+        with metrics.span("model_call", model=self.name):
+            text = await self._guarded(call)
+        self._latencies.append(time.monotonic() - started)
+        return text
+
+    async def _hedge(self, prompt, deadline, timeout, **kwargs):
+        """A duplicate attempt, made only if a rate-limit token is free right now"""
+        await self._admit(0.0)
+        self.hedged += 1
+        return await self._attempt(prompt, deadline, timeout, **kwargs)
+
+    async def _generate(self, prompt, timeout, **kwargs):
+        # One deadline covers the rate-limit wait and the call, so callers never wait longer than ``timeout``
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self._ensure_model()
+        # The rate-limit wait counts against the deadline, so it is capped at a share of ``timeout``
+        await self._admit(timeout * _MAX_RATE_WAIT_SHARE)
+        primary = asyncio.ensure_future(self._attempt(prompt, deadline, timeout, **kwargs))
+        delay = self.hedge_delay()
+        if delay is None or delay >= deadline - loop.time():
+            return await primary
+
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # Hedge only with spare budget and a healthy API, so hedging never adds load during an incident
+            if not done and self.breaker.state == "closed":
+                tasks.add(asyncio.ensure_future(self._hedge(prompt, deadline, timeout, **kwargs)))
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+            return primary.result()  # Every attempt failed; surface the primary's error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _stream(self, prompt, timeout, sink, **kwargs):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        self._ensure_model()
+        await self._admit(timeout * _MAX_RATE_WAIT_SHARE)
+
+        async def consume():
+            response = await self._model.generate_content_async(prompt, stream=True, **kwargs)
+            chunk, size = None, 0
+            async for chunk in response:
+                size += len(chunk.text)
+                sink(chunk.text)
+            # Streamed responses carry usage metadata on the last chunk
+            _record_usage(self.name, prompt, chunk, size)
+
+        async def call():
+            try:
+                await asyncio.wait_for(consume(), max(0.0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                metrics.inc("timeouts_total", model=self.name)
+                raise GenerationTimeout(f"Gemini call exceeded {timeout:g}s deadline")
+
+        with metrics.span("model_stream", model=self.name):
+            await self._guarded(call)
+
+    def stream_sync(self, prompt, timeout=None, **kwargs):
+        """Yield response text chunks as they arrive; closing the generator cancels the call"""
+        timeout = timeout or self.timeout
+        loop = self._ensure_loop()
+        chunks = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            metrics.carry_trace(self._stream(prompt, timeout, chunks.put_nowait, **kwargs)), loop
+        )
+        future.add_done_callback(lambda _: chunks.put_nowait(_STREAM_END))
+        try:
+            while True:
+                try:
+                    chunk = chunks.get(timeout=timeout + 1)
+                except queue.Empty:
+                    raise GenerationTimeout(f"Gemini call exceeded {timeout:g}s deadline")
+                if chunk is _STREAM_END:
+                    break
+                yield chunk
+            future.result()  # Surface errors raised after the last chunk
+        finally:
+            if not future.done():
+                future.cancel()
+
+    def submit(self, prompt, timeout=None, **kwargs):
+        """Schedule a generation on the background loop and return a concurrent future
+
+        The call's ``model_call`` span joins the caller's trace even though it runs on the loop thread.
+        """
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(
+            metrics.carry_trace(self._generate(prompt, timeout or self.timeout, **kwargs)), loop
+        )
+
+    async def generate(self, prompt, timeout=None, **kwargs):
+        """Await a generation from any event loop; cancelling the caller cancels the call"""
+        return await asyncio.wrap_future(self.submit(prompt, timeout, **kwargs))
+
+    def generate_sync(self, prompt, timeout=None, **kwargs):
+        """Blocking generation for synchronous callers"""
+        timeout = timeout or self.timeout
+        future = self.submit(prompt, timeout, **kwargs)
+        try:
+            # The loop enforces one deadline over the rate-limit wait and the call; the grace only covers scheduling
+            return future.result(timeout + 1)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            metrics.inc("timeouts_total", model=self.name)
+            raise GenerationTimeout(f"Gemini call exceeded {timeout:g}s deadline")
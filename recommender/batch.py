@@ -0,0 +1,186 @@
+"""Batch recommendations for bulk requisition files
+
+Reads job descriptions from CSV or JSONL, fans them out to the recommender with
+bounded concurrency and streams one JSONL result line per job as it finishes::
+
+    python -m recommender.batch requisitions.csv -o results.jsonl --concurrency 8
+
+Rows already present in the output file are skipped, so an interrupted run can be
+resumed by re-running the same command.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from recommender.engine import RecommendationError, Recommender
+
+TEXT_FIELDS = ("job_description", "description", "text", "query")
+ID_FIELDS = ("id", "job_id", "requisition_id")
+
+logger = logging.getLogger("recommender.batch")
+
+
+def read_jobs(path, text_field=None, id_field=None):
+    """Yield ``(job_id, text)`` pairs from a CSV or JSONL file"""
+    with open(path, newline="", encoding="utf-8") as handle:
+        if path.endswith(".jsonl") or path.endswith(".ndjson"):
+            rows = (json.loads(line) for line in handle if line.strip())
+        else:
+            rows = csv.DictReader(handle)
+
+        for line_number, row in enumerate(rows, start=1):
+            text = row.get(text_field) if text_field else next((row[f] for f in TEXT_FIELDS if row.get(f)), None)
+            job_id = row.get(id_field) if id_field else next((row[f] for f in ID_FIELDS if row.get(f)), None)
+            yield str(job_id if job_id is not None else line_number), text or ""
+
+
+def completed_ids(output_path):
+    """IDs already written to the output file, used as the resume checkpoint"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Partially written last line from an interrupted run
+            if "recommendations" in record:
+                done.add(record["id"])
+    return done
+
+
+class RateLimiter:
+    """Spaces out request starts to stay under a requests-per-minute quota"""
+
+    def __init__(self, requests_per_minute):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+
+async def run_batch(jobs, output_path, recommender, mode="rerank", concurrency=8, requests_per_minute=0, resume=True):
+    """Recommend for every job, appending results to ``output_path`` as they complete
+
+    Returns a summary with counts, throughput and p50/p95 latency.
+    """
+    done = completed_ids(output_path) if resume else set()
+    limiter = RateLimiter(requests_per_minute)
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    latencies = []
+    counts = {"ok": 0, "failed": 0, "skipped": 0, "saved_tokens": 0}
+
+    async def worker(out):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            job_id, text = item
+            await limiter.wait()
+            started = time.perf_counter()
+            query_stats = {}
+            try:
+                recommendations = await recommender.recommend_async(text, mode=mode, query_stats=query_stats)
+                saved_tokens = query_stats.get("saved_tokens", 0)
+                record = {"id": job_id, "recommendations": recommendations, "saved_tokens": saved_tokens}
+                counts["ok"] += 1
+                counts["saved_tokens"] += saved_tokens
+            except RecommendationError as e:
+                record = {"id": job_id, "error": str(e)}
+                counts["failed"] += 1
+            except Exception as e:
+                # Record it and keep going; a dead worker would stall the bounded queue's producer
+                logger.exception("batch job %s failed", job_id)
+                record = {"id": job_id, "error": f"Unexpected error: {e}"}
+                counts["failed"] += 1
+            elapsed = time.perf_counter() - started
+            latencies.append(elapsed)
+            record["latency_ms"] = round(elapsed * 1000, 1)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+    started = time.perf_counter()
+    with open(output_path, "a" if resume else "w", encoding="utf-8") as out:
+        workers = [asyncio.create_task(worker(out)) for _ in range(concurrency)]
+        # The bounded queue keeps memory flat for very large input files
+        for job_id, text in jobs:
+            if job_id in done:
+                counts["skipped"] += 1
+                continue
+            await queue.put((job_id, text))
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    wall = time.perf_counter() - started
+
+    processed = counts["ok"] + counts["failed"]
+    return {
+        **counts,
+        "wall_seconds": round(wall, 2),
+        "throughput_per_min": round(processed / wall * 60, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+    }
+
+
+def recommend_file(input_path, output_path, recommender=None, **kwargs):
+    """Library entry point: process a CSV/JSONL file and return the run summary"""
+    recommender = recommender or Recommender.from_env()
+    jobs = read_jobs(input_path, kwargs.pop("text_field", None), kwargs.pop("id_field", None))
+    return asyncio.run(run_batch(jobs, output_path, recommender, **kwargs))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recommend SHL assessments for a file of job descriptions")
+    parser.add_argument("input", help="CSV or JSONL file of job descriptions")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--mode", choices=["rerank", "catalog"], default="rerank")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=int, default=0, help="Max requests per minute (0 = unlimited)")
+    parser.add_argument("--text-field", help="Column holding the job description")
+    parser.add_argument("--id-field", help="Column holding a stable job ID")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    summary = recommend_file(
+        args.input,
+        args.output,
+        mode=args.mode,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        resume=not args.no_resume,
+        text_field=args.text_field,
+        id_field=args.id_field,
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
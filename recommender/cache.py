@@ -0,0 +1,178 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from recommender import metrics
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_query(query):
+    """Normalize a job description so trivially different copies share a key"""
+    return _WHITESPACE_RE.sub(" ", query).strip().lower()
+
+
+def cache_key(query, prompt_version, namespace=""):
+    """Content-addressed key for a query under a given prompt version
+
+    The whole text is hashed: descriptions that only differ late (say in their
+    requirements) must not share a key.
+    """
+    payload = f"{prompt_version}\x00{namespace}\x00{normalize_query(query)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SQLiteStore:
+    """On-disk cache tier with TTL and size-based eviction"""
+
+    def __init__(self, path, ttl=7 * 24 * 3600, max_entries=5000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS recommendations ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON recommendations (accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM recommendations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM recommendations WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE recommendations SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO recommendations (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            if self.ttl:
+                self._conn.execute("DELETE FROM recommendations WHERE created < ?", (now - self.ttl,))
+            # Drop the least recently used rows beyond the size limit
+            self._conn.execute(
+                "DELETE FROM recommendations WHERE key IN ("
+                "SELECT key FROM recommendations ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM recommendations")
+            self._conn.commit()
+
+
+class RecommendationCache:
+    """Two-tier (in-memory LRU + optional SQLite) cache of parsed recommendations
+
+    With ``near_threshold`` set, exact misses fall back to a MinHash near-duplicate
+    lookup (``recommender.neardup``) so lightly edited reposts of a job description
+    reuse its recommendations.
+    """
+
+    def __init__(self, prompt_version, max_items=256, path=None, ttl=7 * 24 * 3600, max_disk_entries=5000,
+                 near_threshold=None, max_near_items=1024):
+        self.prompt_version = prompt_version
+        self.max_items = max_items
+        self.ttl = ttl
+        self.disk = SQLiteStore(path, ttl=ttl, max_entries=max_disk_entries) if path else None
+        self.near = None
+        if near_threshold:
+            from recommender.neardup import NearDuplicateCache
+
+            self.near = NearDuplicateCache(
+                prompt_version, threshold=near_threshold, max_items=max_near_items, path=path, ttl=ttl
+            )
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, query, namespace=""):
+        return cache_key(query, self.prompt_version, namespace)
+
+    def get(self, query, namespace=""):
+        """Return cached recommendations for a query, or None on a miss"""
+        key = self.key(query, namespace)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if not self.ttl or now - stored_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    metrics.inc("cache_lookups_total", result="hit", tier="memory")
+                    return value
+                del self._memory[key]
+
+        value = self.disk.get(key) if self.disk else None
+        tier = "disk"
+        if value is None and self.near is not None:
+            value = self.near.get(query, namespace)
+            tier = "near_duplicate"
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                metrics.inc("cache_lookups_total", result="miss")
+                return None
+            metrics.inc("cache_lookups_total", result="hit", tier=tier)
+            self.hits += 1
+            self._remember(key, value, now)
+        return value
+
+    def put(self, query, recommendations, namespace=""):
+        """Store parsed recommendations for a query"""
+        if not recommendations:
+            return
+        key = self.key(query, namespace)
+        with self._lock:
+            self._remember(key, recommendations, time.time())
+        if self.disk:
+            self.disk.put(key, recommendations)
+        if self.near is not None:
+            self.near.put(query, recommendations, namespace)
+
+    def _remember(self, key, value, stored_at):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk:
+            self.disk.clear()
+        if self.near is not None:
+            self.near.clear()
+
+    def stats(self):
+        """Hit/miss counters for display and monitoring"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+            "near_duplicate_hits": self.near.hits if self.near is not None else 0,
+            "near_duplicate_entries": len(self.near) if self.near is not None else 0,
+        }
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from recommender.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+CATALOG_PATH = os.path.join(DATA_DIR, "catalog.json")
+INDEX_PATH = os.path.join(DATA_DIR, "catalog_index.npz")
+BM25_PATH = os.path.join(DATA_DIR, "catalog_bm25.npz")
+SNAPSHOT_DIR = os.getenv("CATALOG_SNAPSHOT_DIR", os.path.join(DATA_DIR, "catalog_snapshot"))
+
+HASH_DIM = 1024
+GEMINI_EMBEDDING_MODEL = "models/text-embedding-004"
+
+
+def load_catalog(path=CATALOG_PATH):
+    """Load the local SHL assessment catalog"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def open_catalog(catalog_path=CATALOG_PATH, snapshot_dir=SNAPSHOT_DIR):
+    """Return ``(catalog, version)``, preferring the memory-mapped crawl snapshot over the JSON seed"""
+    from recommender.snapshot import open_snapshot
+
+    snapshot = open_snapshot(snapshot_dir) if snapshot_dir else None
+    if snapshot is not None and len(snapshot):
+        return snapshot, snapshot.catalog_version
+    catalog = load_catalog(catalog_path)
+    return catalog, catalog_version(catalog)
+
+
+def catalog_version(catalog):
+    """Stable content hash of the catalog, used to invalidate stored embeddings"""
+    payload = json.dumps(catalog, sort_keys=True).encode("utf-8")
+    return hashlib.sha1(payload).hexdigest()[:16]
+
+
+def catalog_text(item):
+    """Text used to embed a catalog entry"""
+    test_types = item.get("Test Type") or []
+    if isinstance(test_types, str):
+        test_types = [test_types]
+    return f"{item.get('Assessment Name', '')}. {', '.join(test_types)}. {item.get('Description', '')}"
+
+
+def hash_embed(texts, dim=HASH_DIM):
+    """Local feature-hashing embedding of unigrams and bigrams (no network call)"""
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = tokenize(text)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.md5(feature.encode("utf-8")).digest()
+            bucket = int.from_bytes(digest[:4], "little") % dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            matrix[row, bucket] += sign
+    return matrix
+
+
+def gemini_embed(texts, task_type="retrieval_document"):
+    """Embed texts with the Gemini embedding model"""
+    import google.generativeai as genai
+
+    result = genai.embed_content(model=GEMINI_EMBEDDING_MODEL, content=list(texts), task_type=task_type)
+    return np.asarray(result["embedding"], dtype=np.float32)
+
+
+def embed_texts(texts, backend="hashing", task_type="retrieval_document"):
+    """Embed texts with the configured backend ('hashing' or 'gemini')"""
+    if backend == "gemini":
+        return gemini_embed(texts, task_type=task_type)
+    return hash_embed(texts)
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorIndex:
+    """In-process cosine-similarity index with optional IVF partitioning"""
+
+    def __init__(self, vectors, n_lists=0, n_probe=2, seed=0):
+        self.vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.n_probe = n_probe
+        self.centroids = None
+        self.lists = None
+        if n_lists and n_lists < len(self.vectors):
+            self._train_ivf(n_lists, seed)
+
+    def _train_ivf(self, n_lists, seed, iterations=10):
+        """Partition the vectors with a few rounds of spherical k-means"""
+        rng = np.random.default_rng(seed)
+        centroids = self.vectors[rng.choice(len(self.vectors), n_lists, replace=False)]
+        for _ in range(iterations):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = self.vectors[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+        assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.lists = [np.flatnonzero(assignment == c) for c in range(n_lists)]
+
+    def search(self, query_vector, k=10):
+        """Return (row, score) pairs for the k most similar vectors"""
+        query = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+
+        if self.centroids is not None:
+            probe = np.argsort(-(self.centroids @ query))[:self.n_probe]
+            rows = np.concatenate([self.lists[c] for c in probe])
+        else:
+            rows = np.arange(len(self.vectors))
+        if not len(rows):
+            return []
+
+        scores = self.vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+class CatalogIndex:
+    """Catalog entries with an embedding index and an optional BM25 index
+
+    With both present, retrieval is hybrid: the semantic and lexical rankings are
+    fused with reciprocal rank fusion, so exact-skill matches ("Power BI", "SQL")
+    surface even when the embedding misses them.
+    """
+
+    def __init__(self, catalog, vectors, backend="hashing", n_lists=0, lexical=None, fusion_depth=50, version=None):
+        self.catalog = catalog
+        self.version = version
+        self.backend = backend
+        self.index = VectorIndex(vectors, n_lists=n_lists)
+        self.lexical = lexical
+        self.fusion_depth = fusion_depth
+        self._query_vectors = OrderedDict()
+        self._query_lock = threading.Lock()
+
+    def query_vector(self, query, memo_size=128):
+        """Normalized embedding of a job description, memoized so retrieval and reranking embed it once"""
+        with self._query_lock:
+            vector = self._query_vectors.get(query)
+            if vector is not None:
+                self._query_vectors.move_to_end(query)
+                return vector
+        vector = _normalize(embed_texts([query], backend=self.backend, task_type="retrieval_query"))[0]
+        with self._query_lock:
+            self._query_vectors[query] = vector
+            while len(self._query_vectors) > memo_size:
+                self._query_vectors.popitem(last=False)
+        return vector
+
+    def semantic_search(self, query, k=10):
+        """(row, cosine similarity) pairs from the embedding index"""
+        return self.index.search(self.query_vector(query), k)
+
+    def similarities(self, query, rows):
+        """Cosine similarity of the stored vectors of catalog ``rows`` to a job description"""
+        return self.index.vectors[list(rows)] @ self.query_vector(query)
+
+    def search(self, query, k=10):
+        """Return (catalog item, score) pairs for the best matches to a job description"""
+        if self.lexical is None:
+            ranked = self.semantic_search(query, k)
+        else:
+            depth = max(k, self.fusion_depth)
+            ranked = reciprocal_rank_fusion([
+                self.semantic_search(query, depth),
+                self.lexical.search(query, depth),
+            ])[:k]
+        return [(self.catalog[row], score) for row, score in ranked]
+
+    def retrieve(self, query, k=10):
+        """Return the top-k catalog items in the recommendation output schema"""
+        return [dict(item) for item, _ in self.search(query, k)]
+
+
+def build_index(catalog=None, backend="hashing", path=INDEX_PATH, version=None):
+    """Embed every catalog entry and store the matrix on disk"""
+    if catalog is None:
+        catalog, version = open_catalog()
+    vectors = embed_texts([catalog_text(item) for item in catalog], backend=backend)
+    np.savez_compressed(path, vectors=vectors, version=version or catalog_version(catalog), backend=backend)
+    return vectors
+
+
+def build_lexical_index(catalog=None, path=BM25_PATH, version=None):
+    """Build the BM25 index over names, descriptions and test types and store it on disk"""
+    if catalog is None:
+        catalog, version = open_catalog()
+    index = BM25Index.build([catalog_text(item) for item in catalog])
+    index.save(path, version or catalog_version(catalog))
+    return index
+
+
+def load_index(catalog_path=CATALOG_PATH, index_path=INDEX_PATH, backend=None, n_lists=0, lexical_path=BM25_PATH,
+               hybrid=True, snapshot_dir=SNAPSHOT_DIR):
+    """Load the catalog with its stored indexes, rebuilding them if stale"""
+    backend = backend or os.getenv("EMBEDDING_BACKEND", "hashing")
+    catalog, version = open_catalog(catalog_path, snapshot_dir)
+    vectors = None
+    if os.path.exists(index_path):
+        stored = np.load(index_path)
+        if str(stored["version"]) == version and str(stored["backend"]) == backend:
+            vectors = stored["vectors"]
+    if vectors is None:
+        vectors = build_index(catalog, backend=backend, path=index_path, version=version)
+
+    lexical = None
+    if hybrid:
+        lexical = BM25Index.load(lexical_path, version) or build_lexical_index(catalog, path=lexical_path, version=version)
+    return CatalogIndex(catalog, vectors, backend=backend, n_lists=n_lists, lexical=lexical, version=version)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute catalog embeddings and the BM25 index")
+    parser.add_argument("--backend", default=os.getenv("EMBEDDING_BACKEND", "hashing"), choices=["hashing", "gemini"])
+    args = parser.parse_args()
+    if args.backend == "gemini":
+        import google.generativeai as genai
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    items, version = open_catalog()
+    build_index(items, backend=args.backend, version=version)
+    build_lexical_index(items, version=version)
+    print(f"Indexed {len(items)} catalog entries with the {args.backend} backend -> {INDEX_PATH}, {BM25_PATH}")
@@ -0,0 +1,314 @@
+"""Static prompt context, built once and referenced by every request
+
+The instruction block is the same on every request, and with a large catalog a
+listing of the whole catalog is the biggest part of a prompt. ``PromptContext``
+builds that static prefix once per prompt and catalog version, and each request
+then only sends the job description and its retrieval candidates.
+
+With ``CONTEXT_CACHE=auto`` (the default) a prefix that includes the catalog
+listing is uploaded once per model with the Gemini context-caching API, with a
+TTL that is extended while the process keeps using it. Requests reference the
+upload and name their candidates by catalog id, so the prefix is neither resent
+nor reprocessed, and its tokens are billed at the cached rate. The API requires a
+minimum prefix size (``CONTEXT_CACHE_MIN_TOKENS``) and a pinned model version
+(e.g. ``gemini-1.5-pro-002``). Below that size, or if an upload fails, the
+catalog stays out of the prefix and the instructions go to the model as a
+system instruction (``CONTEXT_CACHE=local``). That prefix is still built once
+and stays byte-identical across requests, so the service's implicit prefix
+caching can apply. ``CONTEXT_CACHE=off`` sends self-contained prompts.
+
+A new prompt or catalog version builds a new context, which uploads its own
+cache; this process deletes the caches of the context it replaced, and caches
+left by other processes expire with their TTL. ``report()`` gives the prefix
+size, the uploads, the input tokens the service reported as cached, and the
+latency of calls with and without a cache hit.
+"""
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from recommender import metrics
+from recommender.preprocess import estimate_tokens
+
+logger = logging.getLogger("recommender.context_cache")
+
+CONTEXT_CACHE = os.getenv("CONTEXT_CACHE", "auto")
+CONTEXT_CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "3600"))
+# The API rejects smaller caches (32k tokens for Gemini 1.5 models)
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("CONTEXT_CACHE_MIN_TOKENS", "32768"))
+REFRESH_MARGIN = 120
+DISPLAY_PREFIX = "shl-recommender-"
+
+OUTPUT_INSTRUCTIONS = (
+    "Respond ONLY as a JSON array with up to 7 objects. Each object must have:\n"
+    "- Assessment Name (string)\n"
+    "- URL (string, MUST be a valid SHL link starting with https://www.shl.com/)\n"
+    "- Remote Testing Support (exactly 'Yes' or 'No')\n"
+    "- Adaptive/IRT Support (exactly 'Yes' or 'No')\n"
+    "- Duration (string with time in minutes, e.g. '25 minutes')\n"
+    "- Test Type (list of strings, e.g. ['Numerical', 'Reasoning'])\n"
+    "- Description (short string with 1-2 sentences describing the assessment)\n\n"
+    "Important: Ensure all URLs begin with 'https://www.shl.com/' and are valid links.\n"
+    "Format Test Type as an actual array of strings, not a single string.\n"
+    "Example of correct format for Test Type: ['Numerical', 'Reasoning'] not 'Numerical, Reasoning'.\n"
+    "Do NOT add explanation or commentary. Only return valid JSON that can be parsed using json.loads()."
+)
+
+TASK_INSTRUCTIONS = (
+    "You recommend SHL assessments for job descriptions. When a request lists candidate assessments, select "
+    "and rank up to 7 of them that would be most suitable for the job. {candidates} Otherwise recommend up to "
+    "7 SHL assessments that would be most suitable.\n\n"
+)
+CANDIDATES_INLINE = (
+    "Only choose from the candidates and copy their fields exactly, but you may rewrite Description to explain "
+    "why the assessment fits this job."
+)
+CANDIDATES_BY_ID = (
+    "Candidates are given by their id in the catalog below; copy that entry's fields exactly, but you may "
+    "rewrite Description to explain why the assessment fits this job."
+)
+CATALOG_HEADER = "\n\nSHL catalog, one JSON object per line:\n"
+CANDIDATE_IDS_HEADER = "Candidate assessments (catalog ids, best match first):\n"
+
+
+def catalog_listing(catalog):
+    """The catalog as one compact JSON object per line, each with its row as ``id``"""
+    return "\n".join(json.dumps({"id": row, **item}, ensure_ascii=False) for row, item in enumerate(catalog))
+
+
+def request_text(query, candidates=None, by_id=False):
+    """The per-request part of a prompt: the job description and its candidates"""
+    text = f"Job description:\n{query.strip()}\n"
+    if candidates and by_id:
+        text += f"\n{CANDIDATE_IDS_HEADER}{json.dumps(candidates, ensure_ascii=False)}\n"
+    elif candidates:
+        text += f"\nCandidate assessments:\n{json.dumps(candidates, ensure_ascii=False)}\n"
+    return text
+
+
+def _median(values):
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2] if ordered else None
+
+
+class PromptContext:
+    """Static prompt prefix for one prompt and catalog version, and the model handles that carry it"""
+
+    def __init__(self, catalog=None, version="", mode=CONTEXT_CACHE, ttl=CONTEXT_CACHE_TTL,
+                 min_tokens=CONTEXT_CACHE_MIN_TOKENS):
+        started = time.perf_counter()
+        self.catalog = catalog or []
+        self.version = version
+        self.mode = mode
+        self.ttl = ttl
+        self.rows = {item["URL"].rstrip("/"): row for row, item in enumerate(self.catalog)}
+        self.instructions = TASK_INSTRUCTIONS.format(candidates=CANDIDATES_INLINE) + OUTPUT_INSTRUCTIONS
+        self.catalog_prefix = None
+        if self.catalog:
+            self.catalog_prefix = (
+                TASK_INSTRUCTIONS.format(candidates=CANDIDATES_BY_ID) + OUTPUT_INSTRUCTIONS
+                + CATALOG_HEADER + catalog_listing(self.catalog)
+            )
+        self.instruction_tokens = estimate_tokens(self.instructions)
+        self.catalog_prefix_tokens = estimate_tokens(self.catalog_prefix) if self.catalog_prefix else 0
+        self.remote_error = None
+        if mode != "auto":
+            self.remote_error = f"CONTEXT_CACHE={mode}"
+        elif self.catalog_prefix is None:
+            self.remote_error = "no catalog to cache"
+        elif self.catalog_prefix_tokens < min_tokens:
+            self.remote_error = (
+                f"prefix with the catalog is ~{self.catalog_prefix_tokens} tokens, below the {min_tokens}-token minimum"
+            )
+        self.key = hashlib.sha256(f"{version}\n{self.catalog_prefix}".encode("utf-8")).hexdigest()[:16]
+        self.build_ms = (time.perf_counter() - started) * 1000
+        self._remote = {}  # model name -> (cached content, model, expires)
+        self._local = {}  # (model name, with catalog) -> model
+        self._lock = threading.Lock()
+        self._upload_lock = threading.Lock()
+        self.uploads = 0
+        self.renewals = 0
+        self.requests = 0
+        self.cached_tokens = 0
+        self._latencies = {"cached": deque(maxlen=200), "uncached": deque(maxlen=200)}
+
+    @property
+    def remote(self):
+        """Whether requests reference an uploaded cache (and name candidates by catalog id)"""
+        return self.remote_error is None
+
+    @property
+    def prefix_tokens(self):
+        """Estimated size of the prefix new requests are sent with"""
+        return self.catalog_prefix_tokens if self.remote else self.instruction_tokens
+
+    def prompt(self, query, candidates=None):
+        """Per-request prompt; the static prefix travels with the model instead"""
+        if not self.remote:
+            return request_text(query, candidates)
+        refs = []
+        for candidate in candidates or ():
+            row = self.rows.get(candidate["URL"].rstrip("/"))
+            refs.append({"id": row, "Assessment Name": candidate["Assessment Name"]} if row is not None else candidate)
+        return request_text(query, refs, by_id=True)
+
+    def ready_model(self, name, prompt):
+        """The model for a prompt if it needs no network round trip to set up, else None"""
+        if CANDIDATE_IDS_HEADER in prompt and self.remote:
+            handle = self._remote.get(name)
+            if handle is None or handle[2] - REFRESH_MARGIN < time.time():
+                return None
+            return handle[1]
+        return self._local.get((name, CANDIDATE_IDS_HEADER in prompt))
+
+    def model(self, name, prompt):
+        """SDK model carrying this context for a prompt, uploading or renewing the cache as needed
+
+        A prompt that names candidates by id needs the catalog: it gets the uploaded
+        cache, or the full prefix as a system instruction if the upload fails.
+        """
+        with_catalog = CANDIDATE_IDS_HEADER in prompt
+        if with_catalog and self.remote:
+            try:
+                return self._remote_model(name)
+            except Exception as e:
+                # Later prompts go without the catalog; this one still needs it, so send it uncached once
+                self.remote_error = f"upload failed: {e}"
+                logger.warning("context cache for %s unavailable, sending the prefix uncached: %s", name, e)
+        return self._local_model(name, with_catalog)
+
+    def _local_model(self, name, with_catalog):
+        model = self._local.get((name, with_catalog))
+        if model is None:
+            import google.generativeai as genai
+
+            instruction = self.catalog_prefix if with_catalog else self.instructions
+            model = self._local[(name, with_catalog)] = genai.GenerativeModel(name, system_instruction=instruction)
+        return model
+
+    def _remote_model(self, name):
+        with self._upload_lock:
+            handle = self._remote.get(name)
+            now = time.time()
+            if handle is not None and handle[2] - REFRESH_MARGIN >= now:
+                return handle[1]
+
+            import google.generativeai as genai
+            from google.generativeai import caching
+
+            ttl = datetime.timedelta(seconds=self.ttl)
+            if handle is not None:
+                cached = handle[0]
+                cached.update(ttl=ttl)
+                self.renewals += 1
+            else:
+                cached = self._find_upload(caching, name)
+                if cached is not None:
+                    cached.update(ttl=ttl)  # Uploaded by another process with the same version
+                else:
+                    cached = caching.CachedContent.create(
+                        model=name, display_name=f"{DISPLAY_PREFIX}{self.key}",
+                        system_instruction=self.catalog_prefix, ttl=ttl,
+                    )
+                    self.uploads += 1
+                    logger.info("uploaded ~%d-token prompt context for %s (version %s)", self.prefix_tokens, name, self.version)
+            model = genai.GenerativeModel.from_cached_content(cached_content=cached)
+            self._remote[name] = (cached, model, now + self.ttl)
+            return model
+
+    def _find_upload(self, caching, name):
+        display_name = f"{DISPLAY_PREFIX}{self.key}"
+        for cached in caching.CachedContent.list():
+            if cached.display_name == display_name and cached.model.rsplit("/", 1)[-1] == name.rsplit("/", 1)[-1]:
+                return cached
+        return None
+
+    def record(self, model_name, response, seconds):
+        """Account one call: cached input tokens reported by the service, and latency by cache hit"""
+        usage = getattr(response, "usage_metadata", None)
+        cached = getattr(usage, "cached_content_token_count", 0) or 0
+        with self._lock:
+            self.requests += 1
+            self.cached_tokens += cached
+            self._latencies["cached" if cached else "uncached"].append(seconds)
+        if cached:
+            metrics.inc("model_tokens_total", cached, direction="cached", model=model_name)
+
+    def close(self):
+        """Delete this context's uploads; in-flight calls keep their model until they finish"""
+        with self._upload_lock:
+            handles, self._remote = list(self._remote.values()), {}
+        for cached, _, _ in handles:
+            try:
+                cached.delete()
+            except Exception as e:
+                logger.warning("could not delete prompt context cache: %s", e)
+
+    def report(self):
+        """Prefix size, uploads, cached input tokens and latency with and without a cache hit"""
+        with self._lock:
+            cached_ms = _median(self._latencies["cached"])
+            uncached_ms = _median(self._latencies["uncached"])
+            report = {
+                "mode": "remote" if self.remote else ("off" if self.mode == "off" else "local"),
+                "version": self.version,
+                "prefix_tokens": self.prefix_tokens,
+                "prefix_build_ms": round(self.build_ms, 2),
+                "uploads": self.uploads,
+                "renewals": self.renewals,
+                "requests": self.requests,
+                "cached_input_tokens": self.cached_tokens,
+                "remote_unavailable": self.remote_error,
+            }
+        report["p50_cached_ms"] = round(cached_ms * 1000, 1) if cached_ms is not None else None
+        report["p50_uncached_ms"] = round(uncached_ms * 1000, 1) if uncached_ms is not None else None
+        if cached_ms is not None and uncached_ms is not None:
+            report["latency_saved_ms"] = round((uncached_ms - cached_ms) * 1000, 1)
+        return report
+
+
+class ContextModel:
+    """Gemini model facade that sends the current prompt context with every call
+
+    ``context_source`` returns the current ``PromptContext``, so a new prompt or
+    catalog version is picked up by the next call. Cache uploads and renewals run
+    in a worker thread, never on the client's event loop.
+    """
+
+    def __init__(self, context_source, name):
+        self._context_source = context_source
+        self.name = name
+        self._plain = None
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        context = self._context_source()
+        model = context.ready_model(self.name, prompt)
+        if model is None:
+            model = await asyncio.get_running_loop().run_in_executor(None, context.model, self.name, prompt)
+        started = time.monotonic()
+        response = await model.generate_content_async(prompt, stream=stream, **kwargs)
+        if stream:
+            return self._watch(response, context, started)
+        context.record(self.name, response, time.monotonic() - started)
+        return response
+
+    async def _watch(self, chunks, context, started):
+        chunk = None
+        async for chunk in chunks:
+            yield chunk
+        # Streamed responses carry usage metadata on the last chunk
+        context.record(self.name, chunk, time.monotonic() - started)
+
+    def count_tokens(self, text):
+        """Token count of ``text`` alone, without the context"""
+        if self._plain is None:
+            import google.generativeai as genai
+
+            self._plain = genai.GenerativeModel(self.name)
+        return self._plain.count_tokens(text)
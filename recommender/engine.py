@@ -0,0 +1,616 @@
+import asyncio
+import json
+import os
+import re
+import threading
+import time
+
+from recommender import metrics
+from recommender.async_client import AsyncGeminiClient
+from recommender.cache import RecommendationCache
+from recommender.context_cache import CANDIDATES_INLINE, CONTEXT_CACHE, OUTPUT_INSTRUCTIONS, ContextModel, PromptContext
+from recommender.parsing import JSON_GENERATION_CONFIG, IncrementalArrayParser, ParseError, parse_recommendations
+from recommender.preprocess import QUERY_TOKEN_BUDGET, estimate_tokens, prepare_query
+from recommender.resilience import BackpressureError, RetryPolicy
+from recommender.routing import MIN_VALID, RoutingStats, is_confident, validate_recommendations
+
+# Bump whenever the prompt changes so cached recommendations are invalidated
+PROMPT_VERSION = "4"
+MAX_RECOMMENDATIONS = 7
+DEFAULT_MODEL = "gemini-1.5-pro"
+DEFAULT_FAST_MODEL = "gemini-1.5-flash"
+FALLBACK_URL = "https://www.shl.com/solutions/products/product-catalog/"
+
+RESULT_COLUMNS = [
+    "Assessment Name", "URL", "Remote Testing Support", "Adaptive/IRT Support",
+    "Duration", "Test Type", "Description",
+]
+
+_DURATION_RE = re.compile(r'\d+')
+
+_configure_lock = threading.Lock()
+_configured_key = None
+
+
+class RecommendationError(Exception):
+    """Raised when a recommendation cannot be produced; the message is safe to show to users"""
+
+
+def configure_gemini(api_key=None):
+    """Configure the Gemini SDK once per process"""
+    global _configured_key
+    api_key = api_key or os.getenv("GEMINI_API_KEY")
+    with _configure_lock:
+        if api_key and api_key != _configured_key:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+    return api_key
+
+
+def format_candidates(candidates):
+    """Render catalog candidates as a compact JSON list for the prompt"""
+    return json.dumps(candidates, ensure_ascii=False)
+
+
+def build_prompt(query, candidates=None):
+    """Self-contained recommendation prompt for a job description already packed by ``prepare_query``
+
+    Used when context caching is off; otherwise ``Recommender.build_prompt`` sends
+    only the per-request part.
+    """
+    if candidates:
+        # Ground the model on catalog entries so it only has to rerank, not invent URLs
+        task = (
+            f"Given the following job description, select and rank up to 7 of the candidate SHL assessments below "
+            f"that would be most suitable.\n\n"
+            f"{query.strip()}\n\n"
+            f"Candidate assessments:\n{format_candidates(candidates)}\n\n"
+            f"{CANDIDATES_INLINE}\n"
+        )
+    else:
+        task = (
+            f"Given the following job description, recommend up to 7 SHL assessments that would be most suitable.\n\n"
+            f"{query.strip()}\n\n"
+        )
+
+    return task + OUTPUT_INSTRUCTIONS
+
+
+def json_extraction(response_text):
+    """Extract JSON array from the model response"""
+    try:
+        with metrics.span("json_extraction"):
+            return parse_recommendations(response_text)
+    except ParseError as e:
+        raise RecommendationError(str(e))
+
+
+def extract_job_description_from_url(url):
+    """Extract job description from URL"""
+    # Imported here so requests/bs4 load only when a URL is actually fetched
+    from recommender.fetcher import get_fetcher
+
+    try:
+        with metrics.span("extract_job_description_from_url"):
+            return get_fetcher().extract(url)
+    except Exception as e:
+        return f"Error fetching URL: {str(e)}"
+
+
+def as_list(test_type):
+    """Normalize a Test Type value to a list of strings"""
+    if isinstance(test_type, list):
+        return test_type
+    if isinstance(test_type, str):
+        return [test_type]
+    return []
+
+
+def duration_minutes(duration):
+    """First integer in a Duration string, or None"""
+    if not isinstance(duration, str):
+        return None
+    match = _DURATION_RE.search(duration)
+    return int(match.group()) if match else None
+
+
+def filter_recommendations(recommendations, selected_types=(), max_duration=None, remote_filter="All", adaptive_filter="All"):
+    """Apply the sidebar filters to a list of recommendations"""
+    filtered_recs = list(recommendations)
+
+    # Filter by test type
+    if selected_types:
+        filtered_recs = [
+            rec for rec in filtered_recs
+            if any(t in as_list(rec.get("Test Type")) for t in selected_types)
+        ]
+
+    # Filter by duration
+    if max_duration is not None:
+        filtered_recs = [
+            rec for rec in filtered_recs
+            if (minutes := duration_minutes(rec.get("Duration"))) is not None and minutes <= max_duration
+        ]
+
+    # Filter by remote testing support
+    if remote_filter != "All":
+        filtered_recs = [rec for rec in filtered_recs if rec.get("Remote Testing Support") == remote_filter]
+
+    # Filter by adaptive testing support
+    if adaptive_filter != "All":
+        filtered_recs = [rec for rec in filtered_recs if rec.get("Adaptive/IRT Support") == adaptive_filter]
+
+    return filtered_recs
+
+
+def normalize_recommendation(rec):
+    """Fill missing columns and fix URLs and test types for display or export"""
+    rec = {col: rec.get(col, "N/A") for col in RESULT_COLUMNS}
+    if not isinstance(rec["URL"], str) or not rec["URL"].startswith("http"):
+        rec["URL"] = FALLBACK_URL
+    rec["Test Type"] = as_list(rec["Test Type"]) or ["General"]
+    return rec
+
+
+class Recommender:
+    """Long-lived recommendation pipeline: catalog retrieval, response cache and Gemini client"""
+
+    def __init__(self, model_name=DEFAULT_MODEL, catalog_index=None, cache=None, query_token_budget=QUERY_TOKEN_BUDGET,
+                 token_counter="estimate", fast_model_name=None, precomputed=None, context_cache=CONTEXT_CACHE):
+        self.model_name = model_name
+        self.fast_model_name = fast_model_name
+        self.query_token_budget = query_token_budget
+        self.token_counter = token_counter
+        self.token_stats = {"requests": 0, "original_tokens": 0, "tokens": 0, "saved_tokens": 0}
+        self._stats_lock = threading.Lock()
+        self._models = {}
+        self._model_lock = threading.Lock()
+        self.catalog_index = catalog_index
+        self.cache = cache if cache is not None else RecommendationCache(PROMPT_VERSION)
+        self.precomputed = precomputed
+        self.async_client = AsyncGeminiClient(lambda: self.model, name=model_name)
+        # The fast tier shares the rate budget but has its own breaker, so a flash outage doesn't block pro
+        self.fast_client = None
+        if fast_model_name:
+            self.fast_client = AsyncGeminiClient(
+                lambda: self.get_model(fast_model_name), limiter=self.async_client.limiter, name=fast_model_name
+            )
+        self.retry_policy = RetryPolicy()
+        self.routing = RoutingStats()
+        self._grounder = None
+        self.context_cache = context_cache
+        self._context = None
+
+    @classmethod
+    def from_env(cls):
+        """Build a recommender from environment configuration"""
+        from recommender.catalog import load_index
+        from recommender.precompute import PRECOMPUTED_PATH, PrecomputedStore
+
+        configure_gemini()
+        try:
+            catalog_index = load_index()
+        except (OSError, ValueError):
+            catalog_index = None
+        cache = RecommendationCache(
+            PROMPT_VERSION,
+            max_items=int(os.getenv("RECOMMENDATION_CACHE_SIZE", "256")),
+            path=os.getenv("RECOMMENDATION_CACHE_PATH") or None,
+            ttl=int(os.getenv("RECOMMENDATION_CACHE_TTL", str(7 * 24 * 3600))),
+            near_threshold=float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.85")),
+            max_near_items=int(os.getenv("NEAR_DUPLICATE_CACHE_SIZE", "1024")),
+        )
+        return cls(
+            os.getenv("GEMINI_MODEL", DEFAULT_MODEL),
+            catalog_index=catalog_index,
+            cache=cache,
+            query_token_budget=int(os.getenv("QUERY_TOKEN_BUDGET", str(QUERY_TOKEN_BUDGET))),
+            token_counter=os.getenv("TOKEN_COUNTER", "estimate"),
+            # An empty GEMINI_FAST_MODEL disables tiered routing
+            fast_model_name=os.getenv("GEMINI_FAST_MODEL", DEFAULT_FAST_MODEL) or None,
+            # An empty PRECOMPUTED_PATH disables precomputed recommendations
+            precomputed=PrecomputedStore(PRECOMPUTED_PATH) if PRECOMPUTED_PATH else None,
+        )
+
+    def get_model(self, name):
+        """Lazily constructed, shared Gemini model client for a model name"""
+        model = self._models.get(name)
+        if model is None:
+            with self._model_lock:
+                model = self._models.get(name)
+                if model is None:
+                    if self.context_cache != "off":
+                        model = self._models[name] = ContextModel(lambda: self.context, name)
+                    else:
+                        import google.generativeai as genai
+
+                        model = self._models[name] = genai.GenerativeModel(name)
+        return model
+
+    @property
+    def context(self):
+        """Static prompt context for the current prompt and catalog version; None when context caching is off"""
+        if self.context_cache == "off":
+            return None
+        version = f"{PROMPT_VERSION}:{getattr(self.catalog_index, 'version', None) or 'no-catalog'}"
+        context = self._context
+        if context is None or context.version != version:
+            with self._model_lock:
+                context = self._context
+                if context is None or context.version != version:
+                    catalog = self.catalog_index.catalog if self.catalog_index is not None else None
+                    self._context = PromptContext(catalog, version, mode=self.context_cache)
+                    if context is not None:
+                        context.close()
+                    context = self._context
+        return context
+
+    def build_prompt(self, query, candidates=None):
+        """Per-request prompt for the current prompt context, or a self-contained one when caching is off"""
+        context = self.context
+        if context is None:
+            return build_prompt(query, candidates)
+        return context.prompt(query, candidates)
+
+    @property
+    def precompute_version(self):
+        """Stamp for precomputed answers: they are stale once the prompt, catalog or model changes"""
+        catalog = getattr(self.catalog_index, "version", None) or "no-catalog"
+        return f"{PROMPT_VERSION}:{catalog}:{self.model_name}"
+
+    def cache_namespace(self, kind):
+        """Response cache namespace for a prompt kind, so cached answers die with their catalog snapshot and models
+
+        The prompt version is part of every cache key already.
+        """
+        catalog = getattr(self.catalog_index, "version", None) or "no-catalog"
+        return f"{kind}:{catalog}:{self.model_name}:{self.fast_model_name or '-'}"
+
+    def precomputed_recommendations(self, query):
+        """Recommendations generated ahead of time for a known job description, or None"""
+        if self.precomputed is None:
+            return None
+        return self.precomputed.get(query, self.precompute_version)
+
+    @property
+    def model(self):
+        """The primary (escalation) model"""
+        return self.get_model(self.model_name)
+
+    @property
+    def grounder(self):
+        """Catalog grounding index, built on first use; None without a catalog"""
+        if self._grounder is None and self.catalog_index is not None:
+            from recommender.grounding import CatalogGrounder
+
+            self._grounder = CatalogGrounder(self.catalog_index)
+        return self._grounder
+
+    def ground_item(self, rec, allowed=None):
+        """The catalog entry a streamed item refers to, or None if it would be rejected
+
+        Without a catalog the item itself is returned when it passes validation.
+        """
+        if self.grounder is not None:
+            return self.grounder.item(rec)
+        return rec if validate_recommendations([rec], allowed)[0] else None
+
+    def ground(self, recommendations, query=None, candidates=None):
+        """Parsed model output mapped onto catalog entries, topped up from ``candidates`` and reranked"""
+        if self.grounder is None:
+            return recommendations
+        rows, _ = self.grounder.ground(recommendations)
+        minimum = min(MIN_VALID, len(candidates)) if candidates else 0
+        return self.grounder.finish(rows, query, candidates, minimum, MAX_RECOMMENDATIONS)
+
+    def count_tokens(self, text):
+        """Token count from the configured counter: ``"gemini"`` (the model's tokenizer) or ``"estimate"``"""
+        if self.token_counter == "gemini":
+            try:
+                return self.model.count_tokens(text).total_tokens
+            except Exception:
+                pass  # Counting is best effort; never fail a request over it
+        return estimate_tokens(text)
+
+    def prepare_query(self, query):
+        """Clean and pack a job description into the token budget; returns ``(text, stats)``"""
+        with metrics.span("prepare_query"):
+            text, stats = prepare_query(query, budget=self.query_token_budget, count_tokens=self.count_tokens)
+        with self._stats_lock:
+            self.token_stats["requests"] += 1
+            for key in ("original_tokens", "tokens", "saved_tokens"):
+                self.token_stats[key] += stats[key]
+        return text, stats
+
+    def retrieve_candidates(self, query, k=15):
+        """Match a job description against the local catalog"""
+        if self.catalog_index is None:
+            return []
+        with metrics.span("retrieve_candidates"):
+            return self.catalog_index.retrieve(query, k=k)
+
+    def generate(self, prompt, timeout=None):
+        """Blocking Gemini call returning the response text"""
+        return self.async_client.generate_sync(prompt, timeout=timeout, generation_config=JSON_GENERATION_CONFIG)
+
+    async def generate_async(self, prompt, timeout=None):
+        """Awaitable Gemini call returning the response text"""
+        return await self.async_client.generate(prompt, timeout=timeout, generation_config=JSON_GENERATION_CONFIG)
+
+    def generate_with_retries(self, prompt, max_retries=2):
+        """Call Gemini, retrying transient failures with jittered exponential backoff
+
+        Client-side refusals (``BackpressureError``: open circuit, exhausted rate
+        budget) are raised immediately so the caller can degrade.
+        """
+        for attempt in range(max_retries):
+            try:
+                return self.generate(prompt)
+            except BackpressureError:
+                raise
+            except Exception as e:
+                if not self.retry_policy.should_retry(attempt, e, max_retries):
+                    raise RecommendationError(f"Error connecting to recommendation service: {e}")
+                metrics.inc("retries_total", model=self.model_name)
+                time.sleep(self.retry_policy.delay(attempt, e))
+
+    async def generate_with_retries_async(self, prompt, max_retries=2):
+        """Async variant of ``generate_with_retries`` that never blocks the event loop"""
+        for attempt in range(max_retries):
+            try:
+                return await self.generate_async(prompt)
+            except BackpressureError:
+                raise
+            except Exception as e:
+                if not self.retry_policy.should_retry(attempt, e, max_retries):
+                    raise RecommendationError(f"Error connecting to recommendation service: {e}")
+                metrics.inc("retries_total", model=self.model_name)
+                await asyncio.sleep(self.retry_policy.delay(attempt, e))
+
+    def accept(self, recommendations, candidates, tier, model_name, seconds, query=None):
+        """Check a tier's answer against the catalog; return the grounded items, or None to escalate
+
+        With a catalog, items are matched to catalog entries (by URL, slug or name)
+        rather than required to be verbatim, and only the unmatched ones count
+        against the answer. Without one, items are validated against the schema.
+        """
+        expected = min(MAX_RECOMMENDATIONS, len(candidates)) if candidates else MAX_RECOMMENDATIONS
+        if self.grounder is not None:
+            valid, reasons = self.grounder.ground(recommendations)
+        else:
+            allowed = {c["URL"].rstrip("/") for c in candidates} if candidates else None
+            valid, reasons = validate_recommendations(recommendations, allowed)
+        accepted = is_confident(valid, len(recommendations), expected)
+        self.routing.record_call(tier, model_name, seconds, accepted, reasons or [f"{len(valid)} valid items"])
+        if not accepted:
+            return None
+        if self.grounder is not None:
+            return self.grounder.finish(valid, query, limit=MAX_RECOMMENDATIONS)
+        return valid
+
+    def _fast_attempt_result(self, text, candidates, started, query=None):
+        try:
+            recommendations = json_extraction(text)
+        except RecommendationError as e:
+            self.routing.record_call("fast", self.fast_model_name, time.perf_counter() - started, False, [str(e)])
+            return None
+        return self.accept(recommendations, candidates, "fast", self.fast_model_name, time.perf_counter() - started, query)
+
+    def _fast_failed(self, error, started):
+        self.routing.record_call("fast", self.fast_model_name, time.perf_counter() - started, False, [f"error: {error}"])
+
+    def _primary_result(self, text, started, candidates=None, query=None):
+        recommendations = json_extraction(text)
+        self.routing.record_call("primary", self.model_name, time.perf_counter() - started, True)
+        return self.ground(recommendations, query, candidates)
+
+    def generate_routed(self, prompt, candidates=None, max_retries=2, query=None):
+        """Grounded recommendations from the fast model, escalating to the primary model when too few match the catalog
+
+        ``query`` is the job description the grounded items are reranked against.
+        """
+        request_started = time.perf_counter()
+        try:
+            if self.fast_client is not None:
+                started = time.perf_counter()
+                try:
+                    text = self.fast_client.generate_sync(prompt, generation_config=JSON_GENERATION_CONFIG)
+                except Exception as e:
+                    self._fast_failed(e, started)
+                else:
+                    accepted = self._fast_attempt_result(text, candidates, started, query)
+                    if accepted is not None:
+                        return accepted
+            started = time.perf_counter()
+            text = self.generate_with_retries(prompt, max_retries=max_retries)
+            return self._primary_result(text, started, candidates, query)
+        finally:
+            self.routing.record_request(time.perf_counter() - request_started)
+
+    async def generate_routed_async(self, prompt, candidates=None, max_retries=2, query=None):
+        """Async variant of ``generate_routed``"""
+        request_started = time.perf_counter()
+        try:
+            if self.fast_client is not None:
+                started = time.perf_counter()
+                try:
+                    text = await self.fast_client.generate(prompt, generation_config=JSON_GENERATION_CONFIG)
+                except Exception as e:
+                    self._fast_failed(e, started)
+                else:
+                    accepted = self._fast_attempt_result(text, candidates, started, query)
+                    if accepted is not None:
+                        return accepted
+            started = time.perf_counter()
+            text = await self.generate_with_retries_async(prompt, max_retries=max_retries)
+            return self._primary_result(text, started, candidates, query)
+        finally:
+            self.routing.record_request(time.perf_counter() - request_started)
+
+    def degraded(self, query, error):
+        """Catalog-only fallback used when Gemini is refused client-side"""
+        candidates = self.retrieve_candidates(query)
+        if not candidates:
+            raise RecommendationError(str(error))
+        return candidates[:MAX_RECOMMENDATIONS]
+
+    def _prepare(self, query, mode, query_stats=None):
+        """Shared front half of ``recommend``: validation, preprocessing, retrieval and cache lookup
+
+        Returns ``(recommendations, candidates, query, namespace)``; ``recommendations`` is
+        set when no LLM call is needed. ``query`` is the preprocessed text, which is also the
+        cache key, so postings that differ only in boilerplate share an entry. If
+        ``query_stats`` is a dict it receives the token report from ``prepare_query``.
+        """
+        if not query or not query.strip():
+            raise RecommendationError("Please enter a job description first.")
+        if mode == "rerank":
+            precomputed = self.precomputed_recommendations(query)
+            if precomputed is not None:
+                if query_stats is not None:
+                    # No prompt is sent, so nothing is packed or saved
+                    tokens = estimate_tokens(query)
+                    query_stats.update({"original_tokens": tokens, "tokens": tokens, "saved_tokens": 0,
+                                        "sentences_kept": None, "sentences_total": None})
+                return precomputed, [], query, None
+
+        query, stats = self.prepare_query(query)
+        if query_stats is not None:
+            query_stats.update(stats)
+        candidates = self.retrieve_candidates(query)
+        if candidates and mode == "catalog":
+            return candidates[:MAX_RECOMMENDATIONS], candidates, query, None
+
+        namespace = self.cache_namespace("rerank" if candidates else "open")
+        cached = self.cache.get(query, namespace=namespace)
+        if cached is not None:
+            return cached, candidates, query, namespace
+        return None, candidates, query, namespace
+
+    def instant_recommendations(self, query, mode="rerank", query_stats=None):
+        """Precomputed, cached or catalog-only recommendations that need no model call, or None"""
+        return self._prepare(query, mode, query_stats)[0]
+
+    def recommend(self, query, mode="rerank", max_retries=2, query_stats=None):
+        """Recommend assessments for a job description
+
+        ``mode`` is ``"rerank"`` (catalog candidates reranked by Gemini) or ``"catalog"``
+        (catalog match only, no LLM call).
+        """
+        recommendations, candidates, query, namespace = self._prepare(query, mode, query_stats)
+        if recommendations is not None:
+            return recommendations
+
+        try:
+            with metrics.span("generate_routed"):
+                recommendations = self.generate_routed(self.build_prompt(query, candidates), candidates, max_retries, query)
+        except BackpressureError as e:
+            return self.degraded(query, e)
+        self.cache.put(query, recommendations, namespace=namespace)
+        return recommendations
+
+    async def recommend_async(self, query, mode="rerank", max_retries=2, query_stats=None):
+        """Async variant of ``recommend`` for event-loop callers
+
+        Query preparation, retrieval and the cache block (embedding, SQLite), so they
+        run in worker threads (in this context, so their spans join the request's trace);
+        only the model call is awaited.
+        """
+        recommendations, candidates, query, namespace = await asyncio.to_thread(self._prepare, query, mode, query_stats)
+        if recommendations is not None:
+            return recommendations
+
+        try:
+            with metrics.span("generate_routed"):
+                recommendations = await self.generate_routed_async(
+                    self.build_prompt(query, candidates), candidates, max_retries, query
+                )
+        except BackpressureError as e:
+            return await asyncio.to_thread(self.degraded, query, e)
+        await asyncio.to_thread(self.cache.put, query, recommendations, namespace=namespace)
+        return recommendations
+
+    def _stream_objects(self, client, prompt):
+        """Objects parsed from a streamed generation, with whole-response extraction as a fallback"""
+        parser = IncrementalArrayParser()
+        produced = False
+        for chunk in client.stream_sync(prompt, generation_config=JSON_GENERATION_CONFIG):
+            for obj in parser.feed(chunk):
+                produced = True
+                yield obj
+        if not produced:
+            yield from json_extraction(parser.text)
+
+    def recommend_stream(self, query, mode="rerank", max_retries=2, query_stats=None):
+        """Yield recommendations one at a time as the model produces them
+
+        Cached and catalog-only results are yielded immediately, as is the catalog match
+        when the circuit breaker or rate limiter refuses the call. With tiered routing
+        the fast model streams first and only items that match a catalog entry are
+        yielded, as that entry; if its answer as a whole is not confident, the primary
+        model's items follow, with the primary call retried like ``recommend`` while it
+        has produced nothing. The answer is cached once the model finishes, in its
+        reranked order.
+        """
+        recommendations, candidates, query, namespace = self._prepare(query, mode, query_stats)
+        if recommendations is not None:
+            yield from recommendations
+            return
+
+        prompt = self.build_prompt(query, candidates)
+        allowed = {c["URL"].rstrip("/") for c in candidates} if candidates else None
+        streamed = []
+        seen = set()
+        request_started = time.perf_counter()
+        try:
+            if self.fast_client is not None:
+                started = time.perf_counter()
+                parsed = []
+                try:
+                    for obj in self._stream_objects(self.fast_client, prompt):
+                        parsed.append(obj)
+                        # Yield only items that would survive grounding, so escalation never retracts output
+                        item = self.ground_item(obj, allowed)
+                        if item is not None and item["URL"] not in seen:
+                            seen.add(item["URL"])
+                            streamed.append(item)
+                            yield item
+                except Exception as e:
+                    self._fast_failed(e, started)
+                else:
+                    accepted = self.accept(parsed, candidates, "fast", self.fast_model_name,
+                                           time.perf_counter() - started, query)
+                    if accepted:
+                        self.cache.put(query, accepted, namespace=namespace)
+                        return
+
+            started = time.perf_counter()
+            for attempt in range(max_retries):
+                before = len(streamed)
+                try:
+                    for obj in self._stream_objects(self.async_client, prompt):
+                        if len(streamed) >= MAX_RECOMMENDATIONS:
+                            break
+                        item = self.ground_item(obj) if self.grounder is not None else obj
+                        if isinstance(item, dict) and item.get("URL") not in seen:
+                            seen.add(item.get("URL"))
+                            streamed.append(item)
+                            yield item
+                    break
+                except BackpressureError as e:
+                    # Refused before the first chunk; serve the catalog match instead
+                    if not streamed:
+                        yield from self.degraded(query, e)
+                    return
+                except Exception as e:
+                    # Only a call that produced nothing is retried, so the output never restarts
+                    if len(streamed) > before or not self.retry_policy.should_retry(attempt, e, max_retries):
+                        raise RecommendationError(f"Error connecting to recommendation service: {e}")
+                    metrics.inc("retries_total", model=self.model_name)
+                    time.sleep(self.retry_policy.delay(attempt, e))
+            self.routing.record_call("primary", self.model_name, time.perf_counter() - started, True)
+        finally:
+            self.routing.record_request(time.perf_counter() - request_started)
+        self.cache.put(query, self.ground(streamed, query), namespace=namespace)
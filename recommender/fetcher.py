@@ -0,0 +1,279 @@
+import hashlib
+import ipaddress
+import json
+import os
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from recommender import metrics
+
+MAX_PAGE_BYTES = int(os.getenv("MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+# Scraped pages can be megabytes; the query packer only ever uses the most relevant part
+MAX_JOB_DESCRIPTION_CHARS = int(os.getenv("MAX_JOB_DESCRIPTION_CHARS", "20000"))
+USER_AGENT = "Mozilla/5.0 (compatible; SHLAssessmentRecommender/1.0)"
+
+_CONTENT_CLASS_RE = re.compile(r'job|position|description', re.I)
+# Joins the page's text nodes; every run of whitespace inside them is source formatting
+_NODE_SEPARATOR = "\x1f"
+_WHITESPACE_RE = re.compile(r'[^\S\x1f]+')
+_SEPARATORS_RE = re.compile(r' ?\x1f[\x1f ]*')
+
+
+class FetchError(Exception):
+    """Raised when a page cannot be downloaded"""
+
+
+def check_public_url(url):
+    """Raise ``FetchError`` unless ``url`` is http(s) and its host resolves only to public addresses
+
+    Keeps caller-supplied URLs away from localhost, private networks and link-local
+    hosts such as cloud metadata endpoints.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise FetchError(f"Only http(s) URLs can be fetched: {url}")
+    try:
+        infos = socket.getaddrinfo(parts.hostname, parts.port or parts.scheme, proto=socket.IPPROTO_TCP)
+    except (OSError, UnicodeError, ValueError) as e:
+        raise FetchError(f"Cannot resolve {parts.hostname}: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise FetchError(f"Refusing to fetch {parts.hostname}: it resolves to a non-public address")
+
+
+def _parser_backend():
+    """Fastest available HTML backend: selectolax, then lxml, then html.parser"""
+    try:
+        import selectolax.parser  # noqa: F401
+        return "selectolax"
+    except ImportError:
+        pass
+    try:
+        import lxml  # noqa: F401
+        return "lxml"
+    except ImportError:
+        return "html.parser"
+
+
+def _extract_with_selectolax(html):
+    from selectolax.parser import HTMLParser
+
+    tree = HTMLParser(html)
+    for tag in ("script", "style", "noscript"):
+        for node in tree.css(tag):
+            node.decompose()
+    main_content = tree.css_first("main") or tree.css_first("article")
+    if main_content is None:
+        main_content = next(
+            (node for node in tree.css("div") if _CONTENT_CLASS_RE.search(node.attributes.get("class") or "")),
+            None,
+        )
+    root = main_content or tree.body or tree.root
+    return root.text(separator=_NODE_SEPARATOR, strip=True) if root is not None else ""
+
+
+def _extract_with_bs4(html, backend):
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, backend)
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', class_=_CONTENT_CLASS_RE)
+    if main_content:
+        return main_content.get_text(separator=_NODE_SEPARATOR, strip=True)
+    return soup.get_text(separator=_NODE_SEPARATOR, strip=True)
+
+
+def html_to_text(html, backend=None):
+    """Extract the main job-description text from an HTML page"""
+    backend = backend or _parser_backend()
+    if backend == "selectolax":
+        text = _extract_with_selectolax(html)
+    else:
+        text = _extract_with_bs4(html, backend)
+
+    # One text node per line, so query cleanup can drop boilerplate and repeated lines
+    text = _WHITESPACE_RE.sub(' ', text)
+    return _SEPARATORS_RE.sub('\n', text).strip()
+
+
+class PageCache:
+    """On-disk page cache keyed by URL, storing validators for conditional requests"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return base + ".json", base + ".html"
+
+    def get(self, url):
+        """Return ``(meta, body)`` for a cached URL, or ``(None, None)``"""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, f.read()
+        except (OSError, ValueError):
+            return None, None
+
+    def put(self, url, body, etag=None, last_modified=None, encoding=None):
+        meta_path, body_path = self._paths(url)
+        meta = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "encoding": encoding,
+            "fetched_at": time.time(),
+        }
+        # Write the body first so a reader never sees metadata without its body
+        tmp = body_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, body_path)
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def touch(self, url):
+        """Mark a cached page as revalidated now"""
+        meta, body = self.get(url)
+        if meta is not None:
+            self.put(url, body, meta.get("etag"), meta.get("last_modified"), meta.get("encoding"))
+
+
+class PageFetcher:
+    """Pooled, cached job-posting fetcher
+
+    One ``requests.Session`` (keep-alive connection pool) is shared by all callers.
+    With a cache directory, pages are revalidated with ``If-None-Match`` /
+    ``If-Modified-Since`` and served from disk on ``304 Not Modified``; pages younger
+    than ``max_age`` seconds are served without any request. With ``public_only`` every
+    URL and redirect target must pass ``check_public_url``.
+    """
+
+    def __init__(self, cache_dir=None, max_age=3600, timeout=10, max_bytes=MAX_PAGE_BYTES, pool_size=16,
+                 public_only=False):
+        self.cache = PageCache(cache_dir) if cache_dir else None
+        self.public_only = public_only
+        self.max_age = max_age
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.pool_size = pool_size
+        self.backend = _parser_backend()
+        self.session = requests.Session()
+        self.session.headers["User-Agent"] = USER_AGENT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if public_only:
+            self.session.hooks["response"].append(self._check_redirect)
+
+    def _check_redirect(self, response, *args, **kwargs):
+        """Session hook vetting each redirect target before requests follows it"""
+        if response.is_redirect:
+            try:
+                check_public_url(urljoin(response.url, response.headers["Location"]))
+            except FetchError:
+                response.close()
+                raise
+
+    def _download(self, response):
+        """Stream the body, stopping at ``max_bytes``"""
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= self.max_bytes:
+                break  # Job text is near the top of the page; ignore the rest of huge pages
+        return b"".join(chunks)[:self.max_bytes]
+
+    def fetch(self, url):
+        """Return ``(html_bytes, encoding)`` for a URL, using the cache when possible"""
+        meta, body = self.cache.get(url) if self.cache else (None, None)
+        if meta is not None and time.time() - meta["fetched_at"] < self.max_age:
+            return body, meta.get("encoding")
+
+        headers = {}
+        if meta is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        if self.public_only:
+            check_public_url(url)
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304 and meta is not None:
+                    self.cache.touch(url)
+                    return body, meta.get("encoding")
+                response.raise_for_status()
+                content = self._download(response)
+                encoding = response.encoding
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+        except requests.RequestException as e:
+            raise FetchError(str(e))
+
+        if self.cache and (etag or last_modified or self.max_age):
+            self.cache.put(url, content, etag, last_modified, encoding)
+        return content, encoding
+
+    def extract(self, url):
+        """Fetch a job posting and return its main text, capped at ``MAX_JOB_DESCRIPTION_CHARS``"""
+        with metrics.span("url_fetch"):
+            content, encoding = self.fetch(url)
+        with metrics.span("html_parse", backend=self.backend):
+            if self.backend == "selectolax":
+                html = content.decode(encoding or "utf-8", errors="replace")
+            else:
+                html = content  # BeautifulSoup sniffs the encoding from bytes
+            return html_to_text(html, self.backend)[:MAX_JOB_DESCRIPTION_CHARS]
+
+    def extract_many(self, urls, max_workers=None):
+        """Extract several postings in parallel; failures come back as ``FetchError`` instances"""
+        def safe_extract(url):
+            try:
+                return self.extract(url)
+            except Exception as e:
+                return e if isinstance(e, FetchError) else FetchError(str(e))
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as pool:
+            return list(pool.map(safe_extract, urls))
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Process-wide fetcher configured from the environment"""
+    global _default_fetcher
+    if _default_fetcher is None:
+        with _default_lock:
+            if _default_fetcher is None:
+                _default_fetcher = PageFetcher(
+                    cache_dir=os.getenv("PAGE_CACHE_DIR") or None,
+                    max_age=int(os.getenv("PAGE_CACHE_MAX_AGE", "3600")),
+                    public_only=True,  # Its URLs come from users and API callers
+                )
+    return _default_fetcher
+
+
+def extract_many(urls, max_workers=None):
+    """Extract job descriptions from several URLs in parallel"""
+    return get_fetcher().extract_many(urls, max_workers=max_workers)
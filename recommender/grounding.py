@@ -0,0 +1,169 @@
+"""Grounding model output in the catalog
+
+The model is asked to pick from the retrieved candidates, but it still returns
+near misses: a URL without its trailing slash or under another path, a product
+name with different punctuation, or an assessment that does not exist. Instead
+of rejecting those answers and asking again, ``CatalogGrounder`` maps every
+returned item to the catalog entry it refers to and returns that entry, so the
+result only ever contains real assessments with catalog metadata.
+
+Matching tries, in order: the normalized URL and the URL's last path segment
+(hash lookups), the normalized name (hash lookup), then a trigram index over the
+names, which only scores the entries that share a trigram with the returned name.
+Unmatched items are dropped, a short answer is topped up from the retrieval
+candidates, and the survivors are reranked by fusing the model's order with the
+similarity of their stored catalog vectors to the job description.
+"""
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+from recommender import metrics
+from recommender.lexical import reciprocal_rank_fusion
+
+# Minimum Dice coefficient over name trigrams for a fuzzy match
+NAME_THRESHOLD = float(os.getenv("GROUNDING_NAME_THRESHOLD", "0.6"))
+RERANK = os.getenv("GROUNDING_RERANK", "1").lower() in ("1", "true", "yes", "on")
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_url(url):
+    """Lowercase URL without scheme, ``www.``, query, fragment or trailing slash"""
+    url = url.strip().lower().split("#", 1)[0].split("?", 1)[0]
+    url = url.split("://", 1)[-1]
+    if url.startswith("www."):
+        url = url[4:]
+    return url.rstrip("/")
+
+
+def url_slug(url):
+    """Last path segment of a normalized URL (the product's catalog slug)"""
+    path = url.split("/", 1)[1] if "/" in url else ""
+    return path.rsplit("/", 1)[-1]
+
+
+def normalize_name(name):
+    """Lowercase name with punctuation and repeated whitespace collapsed"""
+    return _NON_ALNUM_RE.sub(" ", name.lower()).strip()
+
+
+def trigrams(text):
+    """Character trigrams of a normalized name, padded so short words still match"""
+    text = f"  {text} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class CatalogGrounder:
+    """Maps model output onto catalog entries and reranks it by embedding similarity"""
+
+    def __init__(self, catalog_index, name_threshold=NAME_THRESHOLD, rerank=RERANK):
+        self.catalog_index = catalog_index
+        self.catalog = catalog_index.catalog
+        self.name_threshold = name_threshold
+        self.rerank_enabled = rerank
+        self.urls = {}
+        self.slugs = {}
+        self.names = {}
+        self.grams = {}
+        self.gram_counts = []
+        ambiguous = set()
+        for row, item in enumerate(self.catalog):
+            url = normalize_url(item["URL"])
+            self.urls.setdefault(url, row)
+            slug = url_slug(url)
+            if slug in self.slugs and self.slugs[slug] != row:
+                ambiguous.add(slug)
+            self.slugs.setdefault(slug, row)
+            name = normalize_name(item["Assessment Name"])
+            self.names.setdefault(name, row)
+            grams = trigrams(name)
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.grams.setdefault(gram, []).append(row)
+        # A slug shared by several entries says nothing about which one was meant
+        for slug in ambiguous:
+            del self.slugs[slug]
+
+    def match_name(self, name):
+        """Row of the catalog entry whose name is closest to ``name``, or None below the threshold"""
+        name = normalize_name(name)
+        row = self.names.get(name)
+        if row is not None or not name:
+            return row
+        grams = trigrams(name)
+        shared = Counter(row for gram in grams for row in self.grams.get(gram, ()))
+        if not shared:
+            return None
+        row, score = max(
+            ((row, 2.0 * count / (len(grams) + self.gram_counts[row])) for row, count in shared.items()),
+            key=lambda pair: pair[1],
+        )
+        return row if score >= self.name_threshold else None
+
+    def match(self, rec):
+        """``(row, how)`` for the catalog entry a returned item refers to; row is None when unmatched"""
+        if not isinstance(rec, dict):
+            return None, "unmatched"
+        url = rec.get("URL")
+        if isinstance(url, str) and url.strip():
+            url = normalize_url(url)
+            row = self.urls.get(url)
+            if row is not None:
+                return row, "url"
+            row = self.slugs.get(url_slug(url))
+            if row is not None:
+                return row, "slug"
+        name = rec.get("Assessment Name")
+        if isinstance(name, str):
+            row = self.match_name(name)
+            if row is not None:
+                return row, "name"
+        return None, "unmatched"
+
+    def item(self, rec):
+        """The catalog entry for one returned item, or None"""
+        row, how = self.match(rec)
+        metrics.inc("grounding_items_total", match=how)
+        return dict(self.catalog[row]) if row is not None else None
+
+    def ground(self, recommendations):
+        """Distinct catalog rows for a parsed answer, in the model's order, and the rejection reasons"""
+        rows = []
+        reasons = []
+        for rec in recommendations:
+            row, how = self.match(rec)
+            metrics.inc("grounding_items_total", match=how)
+            if row is None:
+                name = rec.get("Assessment Name") if isinstance(rec, dict) else rec
+                reasons.append(f"no catalog match for {name!r}")
+            elif row not in rows:
+                rows.append(row)
+        return rows, reasons
+
+    def fill(self, rows, candidates, minimum):
+        """Top ``rows`` up to ``minimum`` with the best retrieval candidates not already present"""
+        for candidate in candidates or ():
+            if len(rows) >= minimum:
+                break
+            row, _ = self.match(candidate)
+            if row is not None and row not in rows:
+                rows.append(row)
+        return rows
+
+    def rerank(self, rows, query):
+        """Fuse the model's order with the stored vectors' similarity to the job description"""
+        if not self.rerank_enabled or not query or len(rows) < 2:
+            return rows
+        scores = self.catalog_index.similarities(query, rows)
+        by_similarity = [(rows[i], float(scores[i])) for i in np.argsort(-scores, kind="stable")]
+        model_order = [(row, 0.0) for row in rows]
+        # Ties keep the model's order: it is the first ranking fused
+        return [row for row, _ in reciprocal_rank_fusion([model_order, by_similarity])]
+
+    def finish(self, rows, query, candidates=None, minimum=0, limit=None):
+        """Catalog entries for ``rows`` after filling, reranking and truncating"""
+        rows = self.rerank(self.fill(list(rows), candidates, minimum), query)
+        return [dict(self.catalog[row]) for row in rows[:limit]]
@@ -0,0 +1,255 @@
+"""Offline crawler that builds the local catalog snapshot
+
+    python -m recommender.ingest --out data/catalog_snapshot --concurrency 4 --delay 1.0
+
+Crawls the SHL product catalog listing pages, then every product detail page, and
+writes a new snapshot version (see ``recommender.snapshot``). Re-crawls are
+incremental: pages are revalidated with ETag/Last-Modified through the page cache,
+and detail pages whose content hash is unchanged reuse their previously parsed
+record.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib import robotparser
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup
+
+from recommender.catalog import SNAPSHOT_DIR
+from recommender.fetcher import USER_AGENT, PageFetcher
+from recommender.snapshot import write_snapshot
+
+CATALOG_START_URL = "https://www.shl.com/solutions/products/product-catalog/"
+STATE_FILE = "crawl_state.json"
+
+# Keys used in the catalog listing's "Test Type" column
+TEST_TYPE_KEYS = {
+    "A": "Ability & Aptitude",
+    "B": "Biodata & Situational Judgement",
+    "C": "Competencies",
+    "D": "Development & 360",
+    "E": "Assessment Exercises",
+    "K": "Knowledge & Skills",
+    "P": "Personality & Behavior",
+    "S": "Simulations",
+}
+
+_DETAIL_PATH_RE = re.compile(r'/product-catalog/view/')
+_DURATION_RE = re.compile(r'(?:completion time|duration)[^\d]{0,40}(\d+)', re.I)
+
+
+class PolitenessPolicy:
+    """Per-host minimum delay between requests, plus robots.txt checks"""
+
+    def __init__(self, delay=1.0, respect_robots=True):
+        self.delay = delay
+        self.respect_robots = respect_robots
+        self._next = {}
+        self._robots = {}
+        self._lock = threading.Lock()
+
+    def allowed(self, url):
+        if not self.respect_robots:
+            return True
+        parts = urlparse(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            parser = self._robots.get(host)
+            if parser is None:
+                parser = robotparser.RobotFileParser(host + "/robots.txt")
+                try:
+                    parser.read()
+                except OSError:
+                    parser.allow_all = True
+                self._robots[host] = parser
+        return parser.can_fetch(USER_AGENT, url)
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, 0.0))
+            self._next[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+
+def _soup(content):
+    return BeautifulSoup(content, "html.parser")
+
+
+def _flag(cell):
+    """Catalog listing cells mark support with a filled circle element"""
+    if cell is None:
+        return "No"
+    return "Yes" if cell.find(class_=re.compile(r'-yes|yes$')) else "No"
+
+
+def parse_listing(content, base_url):
+    """Parse a catalog listing page into partial records and the next page URL"""
+    soup = _soup(content)
+    records = []
+    for row in soup.find_all("tr"):
+        link = row.find("a", href=_DETAIL_PATH_RE)
+        if link is None:
+            continue
+        cells = row.find_all("td")
+        # One element per key (class "...__key"); the cell around them is "...__keys"
+        keys = [span.get_text(strip=True) for span in row.find_all(class_=re.compile(r'key$'))]
+        records.append({
+            "Assessment Name": link.get_text(strip=True),
+            "URL": urljoin(base_url, link["href"]),
+            "Remote Testing Support": _flag(cells[1] if len(cells) > 1 else None),
+            "Adaptive/IRT Support": _flag(cells[2] if len(cells) > 2 else None),
+            "Test Type": [TEST_TYPE_KEYS.get(k, k) for k in keys if k],
+        })
+
+    next_link = soup.find("a", string=re.compile(r'^\s*Next\s*$', re.I))
+    next_url = urljoin(base_url, next_link["href"]) if next_link and next_link.get("href") else None
+    return records, next_url
+
+
+def parse_detail(content):
+    """Parse duration and description from a product detail page"""
+    soup = _soup(content)
+    text = soup.get_text("\n", strip=True)
+
+    description = ""
+    heading = soup.find(["h2", "h3", "h4"], string=re.compile(r'^\s*Description\s*$', re.I))
+    if heading is not None:
+        paragraph = heading.find_next("p")
+        description = paragraph.get_text(" ", strip=True) if paragraph else ""
+    if not description:
+        meta = soup.find("meta", attrs={"name": "description"})
+        description = meta.get("content", "").strip() if meta else ""
+
+    match = _DURATION_RE.search(text)
+    return {
+        "Duration": f"{match.group(1)} minutes" if match else "N/A",
+        "Description": description,
+    }
+
+
+class CatalogCrawler:
+    """Concurrent, polite, incremental catalog crawler"""
+
+    def __init__(self, out_dir=SNAPSHOT_DIR, concurrency=4, delay=1.0, respect_robots=True, max_pages=200):
+        self.out_dir = out_dir
+        self.concurrency = concurrency
+        self.max_pages = max_pages
+        self.policy = PolitenessPolicy(delay=delay, respect_robots=respect_robots)
+        # max_age=0: always revalidate, but let 304s skip the download
+        self.fetcher = PageFetcher(cache_dir=os.path.join(out_dir, "pages"), max_age=0, pool_size=concurrency)
+        self.state_path = os.path.join(out_dir, STATE_FILE)
+        self.stats = {"listing_pages": 0, "detail_fetched": 0, "detail_changed": 0, "detail_reused": 0, "errors": 0}
+        self._stats_lock = threading.Lock()  # Detail pages are counted from the pool's threads
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def _get(self, url):
+        if not self.policy.allowed(url):
+            raise PermissionError(f"Disallowed by robots.txt: {url}")
+        self.policy.wait(url)
+        content, _ = self.fetcher.fetch(url)
+        return content
+
+    def _load_state(self):
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def crawl_listing(self, start_url):
+        """Follow listing pagination and return partial records, de-duplicated by URL"""
+        records = {}
+        url = start_url
+        seen = set()
+        while url and url not in seen and len(seen) < self.max_pages:
+            seen.add(url)
+            records_on_page, url = parse_listing(self._get(url), url)
+            self._count("listing_pages")
+            for record in records_on_page:
+                records.setdefault(record["URL"], record)
+        return list(records.values())
+
+    def _detail(self, record, previous):
+        url = record["URL"]
+        try:
+            content = self._get(url)
+        except Exception:
+            self._count("errors")
+            # Keep the last good version of this product if the page is temporarily unavailable
+            return previous.get("record") if previous else None
+        self._count("detail_fetched")
+
+        digest = hashlib.sha1(content).hexdigest()
+        if previous and previous.get("hash") == digest:
+            self._count("detail_reused")
+            return {**record, "Duration": previous["record"]["Duration"], "Description": previous["record"]["Description"]}
+        self._count("detail_changed")
+        return {**record, **parse_detail(content), "_hash": digest}
+
+    def crawl(self, start_url=CATALOG_START_URL):
+        """Crawl the catalog and write a new snapshot; returns the snapshot path"""
+        os.makedirs(self.out_dir, exist_ok=True)
+        state = self._load_state()
+        listing = self.crawl_listing(start_url)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            details = list(pool.map(lambda r: self._detail(r, state.get(r["URL"])), listing))
+
+        records = []
+        new_state = {}
+        for record in details:
+            if record is None:
+                continue
+            digest = record.pop("_hash", None) or state.get(record["URL"], {}).get("hash")
+            new_state[record["URL"]] = {"hash": digest, "record": record}
+            records.append(record)
+
+        path = write_snapshot(records, self.out_dir)
+        with open(self.state_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(new_state, f)
+        os.replace(self.state_path + ".tmp", self.state_path)
+        return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Crawl the SHL catalog into a local snapshot")
+    parser.add_argument("--start-url", default=CATALOG_START_URL)
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--delay", type=float, default=1.0, help="Minimum seconds between requests to one host")
+    parser.add_argument("--max-pages", type=int, default=200, help="Maximum listing pages to follow")
+    parser.add_argument("--ignore-robots", action="store_true")
+    parser.add_argument("--from-json", help="Build the snapshot from a catalog JSON file instead of crawling")
+    args = parser.parse_args(argv)
+
+    if args.from_json:
+        with open(args.from_json, encoding="utf-8") as f:
+            path = write_snapshot(json.load(f), args.out)
+        print(f"Wrote snapshot {path}")
+        return
+
+    crawler = CatalogCrawler(
+        out_dir=args.out,
+        concurrency=args.concurrency,
+        delay=args.delay,
+        respect_robots=not args.ignore_robots,
+        max_pages=args.max_pages,
+    )
+    path = crawler.crawl(args.start_url)
+    print(json.dumps({"snapshot": path, **crawler.stats}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
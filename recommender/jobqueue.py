@@ -0,0 +1,415 @@
+"""Shared job queue between the UI/API and recommendation workers
+
+Front ends submit a job and get its ID back immediately; any number of worker
+processes (``python -m recommender.worker``) claim jobs, run the pipeline and
+store the result, which the submitter polls for. Jobs are deduplicated by key, so
+users who submit the same job description while it is queued, running or recently
+done share one model call.
+
+Two backends share one interface, picked by ``open_queue(url)``:
+
+- ``sqlite:///path/jobs.db`` (or a bare path): a single-host queue in one SQLite
+  file, safe across processes
+- ``redis://host:6379/0``: Redis or a Redis-compatible server (Valkey, KeyDB,
+  Dragonfly), for workers on several machines; needs the ``redis`` package
+
+A claimed job holds a lease that its worker renews while the job runs; if the
+worker dies, the job goes back to the queue once the lease expires and is retried
+up to ``max_attempts`` times. A worker that lost its lease can no longer record
+an outcome, so a job re-claimed by another worker is never overwritten.
+"""
+import abc
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+JOB_QUEUE_URL = os.getenv("JOB_QUEUE_URL", "")
+JOB_LEASE = float(os.getenv("JOB_LEASE", "120"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueue(abc.ABC):
+    """Interface shared by the queue backends"""
+
+    lease = JOB_LEASE
+    result_ttl = JOB_RESULT_TTL
+    max_attempts = 3
+
+    @abc.abstractmethod
+    def submit(self, payload, dedup_key=None):
+        """Queue a job and return its ID, or the ID of a live job with the same ``dedup_key``"""
+
+    @abc.abstractmethod
+    def claim(self, worker, timeout=1.0):
+        """Take the oldest queued job for ``worker``, waiting up to ``timeout`` seconds; None if there is none"""
+
+    @abc.abstractmethod
+    def renew(self, job_id, worker):
+        """Extend the lease of a job ``worker`` is running; False once the job is no longer its to run"""
+
+    @abc.abstractmethod
+    def complete(self, job_id, result, worker=None):
+        """Store a job's result and release its lease; False if ``worker`` no longer holds the job"""
+
+    @abc.abstractmethod
+    def fail(self, job_id, error, retry=False, worker=None):
+        """Record a failure; with ``retry`` the job is queued again while it has attempts left
+
+        Returns False, changing nothing, if ``worker`` no longer holds the job.
+        """
+
+    @abc.abstractmethod
+    def get(self, job_id):
+        """Job as a dict (``id``, ``status``, ``payload``, ``result``, ``error``, ``attempts``), or None"""
+
+    def wait(self, job_id, timeout=None, poll=0.2):
+        """Block until a job is done or failed and return it; returns the pending job on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in (DONE, FAILED):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            time.sleep(poll)
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue in one SQLite file, shared by every process on the host"""
+
+    def __init__(self, path, lease=JOB_LEASE, result_ttl=JOB_RESULT_TTL, max_attempts=3):
+        self.lease = lease
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, dedup_key TEXT, payload TEXT NOT NULL, status TEXT NOT NULL, "
+            "result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT, "
+            "lease_until REAL, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedup ON jobs (dedup_key, updated)")
+
+    def _transaction(self, fn):
+        """Run ``fn(conn)`` inside BEGIN IMMEDIATE, which serializes writers across processes"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def submit(self, payload, dedup_key=None):
+        def insert(conn):
+            now = time.time()
+            if dedup_key:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE dedup_key = ? AND (status IN (?, ?) OR (status = ? AND updated > ?)) "
+                    "ORDER BY created DESC LIMIT 1",
+                    (dedup_key, QUEUED, RUNNING, DONE, now - self.result_ttl),
+                ).fetchone()
+                if row is not None:
+                    return row[0]
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, dedup_key, payload, status, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, dedup_key, json.dumps(payload), QUEUED, now, now),
+            )
+            return job_id
+        return self._transaction(insert)
+
+    def _claim_once(self, worker):
+        def take(conn):
+            now = time.time()
+            # Running jobs whose lease ran out belong to a dead worker and are claimable again
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE status = ? OR (status = ? AND lease_until < ?) ORDER BY created LIMIT 1",
+                (QUEUED, RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated = ? "
+                "WHERE id = ?",
+                (RUNNING, worker, now + self.lease, now, row[0]),
+            )
+            return row[0]
+        job_id = self._transaction(take)
+        return self.get(job_id) if job_id else None
+
+    def claim(self, worker, timeout=1.0):
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self._claim_once(worker)
+            if job is not None:
+                if job["attempts"] > self.max_attempts:
+                    self.fail(job["id"], "Job abandoned by its workers too many times", worker=worker)
+                    continue
+                return job
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+
+    def renew(self, job_id, worker):
+        def extend(conn):
+            now = time.time()
+            return conn.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND status = ? AND worker = ?",
+                (now + self.lease, now, job_id, RUNNING, worker),
+            ).rowcount
+        return self._transaction(extend) > 0
+
+    @staticmethod
+    def _held_by(job_id, worker):
+        """WHERE clause and parameters matching the job, and only while ``worker`` runs it when given"""
+        if worker is None:
+            return "id = ?", (job_id,)
+        return "id = ? AND status = ? AND worker = ?", (job_id, RUNNING, worker)
+
+    def complete(self, job_id, result, worker=None):
+        where, params = self._held_by(job_id, worker)
+        return self._transaction(lambda conn: conn.execute(
+            f"UPDATE jobs SET status = ?, result = ?, lease_until = NULL, updated = ? WHERE {where}",
+            (DONE, json.dumps(result), time.time()) + params,
+        ).rowcount) > 0
+
+    def fail(self, job_id, error, retry=False, worker=None):
+        where, params = self._held_by(job_id, worker)
+
+        def update(conn):
+            row = conn.execute(f"SELECT attempts FROM jobs WHERE {where}", params).fetchone()
+            if row is None:
+                return False
+            status = QUEUED if retry and row[0] < self.max_attempts else FAILED
+            conn.execute(
+                f"UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated = ? WHERE {where}",
+                (status, str(error), time.time()) + params,
+            )
+            return True
+        return self._transaction(update)
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, payload, result, error, attempts FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "payload": json.loads(row[2]),
+            "result": json.loads(row[3]) if row[3] is not None else None,
+            "error": row[4],
+            "attempts": row[5],
+        }
+
+    def purge(self, older_than=None):
+        """Delete finished jobs last updated more than ``older_than`` seconds ago (default: the result TTL)"""
+        cutoff = time.time() - (self.result_ttl if older_than is None else older_than)
+        return self._transaction(lambda conn: conn.execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (DONE, FAILED, cutoff)
+        ).rowcount)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+# Moves the oldest queued ID to the running list and leases it in one step, so no
+# job is ever running without a lease. KEYS: queued, running; ARGV: job key prefix, worker, now, lease_until
+_CLAIM_SCRIPT = """
+local job_id = redis.call('RPOPLPUSH', KEYS[1], KEYS[2])
+if not job_id then
+    return false
+end
+local job_key = ARGV[1] .. job_id
+redis.call('HSET', job_key, 'status', 'running', 'worker', ARGV[2], 'lease_until', ARGV[4], 'updated', ARGV[3])
+redis.call('HINCRBY', job_key, 'attempts', 1)
+return job_id
+"""
+
+# Requeues running jobs whose lease ran out; checking and moving in one step means
+# a lease renewed meanwhile is never lost. KEYS: queued, running; ARGV: job key prefix, now
+_REQUEUE_SCRIPT = """
+local requeued = 0
+for _, job_id in ipairs(redis.call('LRANGE', KEYS[2], 0, -1)) do
+    local job_key = ARGV[1] .. job_id
+    local lease_until = redis.call('HGET', job_key, 'lease_until')
+    if lease_until and tonumber(lease_until) < tonumber(ARGV[2]) then
+        redis.call('LREM', KEYS[2], 1, job_id)
+        redis.call('HSET', job_key, 'status', 'queued', 'updated', ARGV[2])
+        redis.call('HDEL', job_key, 'lease_until')
+        redis.call('RPUSH', KEYS[1], job_id)
+        requeued = requeued + 1
+    end
+end
+return requeued
+"""
+
+# Extends a lease only while the job is still running for the same worker. KEYS: job key; ARGV: worker, now, lease_until
+_RENEW_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'status') == 'running' and redis.call('HGET', KEYS[1], 'worker') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'lease_until', ARGV[3], 'updated', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+# Records a job's outcome, only while ``worker`` (when not empty) still runs it; a retried job goes back
+# to the queue, a finished one expires. KEYS: job key, running, queued;
+# ARGV: worker, job ID, now, result TTL, requeue ("1" or "0"), then field/value pairs
+_FINISH_SCRIPT = """
+if ARGV[1] ~= '' and (redis.call('HGET', KEYS[1], 'status') ~= 'running'
+        or redis.call('HGET', KEYS[1], 'worker') ~= ARGV[1]) then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'updated', ARGV[3], unpack(ARGV, 6))
+redis.call('HDEL', KEYS[1], 'lease_until')
+redis.call('LREM', KEYS[2], 1, ARGV[2])
+if ARGV[5] == '1' then
+    redis.call('LPUSH', KEYS[3], ARGV[2])
+else
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+end
+return 1
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Job queue on Redis or a Redis-compatible server
+
+    Queued IDs sit in a list that workers move atomically into a running list,
+    setting the lease in the same Lua script; each job is a hash and expires
+    ``result_ttl`` seconds after it finishes.
+    """
+
+    def __init__(self, url, prefix="shl:jobs", lease=JOB_LEASE, result_ttl=JOB_RESULT_TTL, max_attempts=3):
+        import redis
+
+        self.redis = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.lease = lease
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self._queued = f"{prefix}:queued"
+        self._running = f"{prefix}:running"
+        self._claim_script = self.redis.register_script(_CLAIM_SCRIPT)
+        self._requeue_script = self.redis.register_script(_REQUEUE_SCRIPT)
+        self._renew_script = self.redis.register_script(_RENEW_SCRIPT)
+        self._finish_script = self.redis.register_script(_FINISH_SCRIPT)
+
+    def _job_key(self, job_id=""):
+        return f"{self.prefix}:job:{job_id}"
+
+    def _dedup_key(self, key):
+        return f"{self.prefix}:dedup:{key}"
+
+    def submit(self, payload, dedup_key=None):
+        job_id = uuid.uuid4().hex
+        if dedup_key:
+            # SET NX claims the key for this job; otherwise reuse the job it points at unless that one failed
+            if not self.redis.set(self._dedup_key(dedup_key), job_id, nx=True, ex=int(self.lease * self.max_attempts + self.result_ttl)):
+                existing = self.redis.get(self._dedup_key(dedup_key))
+                if existing and self.redis.hget(self._job_key(existing), "status") in (QUEUED, RUNNING, DONE):
+                    return existing
+                self.redis.set(self._dedup_key(dedup_key), job_id, ex=int(self.lease * self.max_attempts + self.result_ttl))
+        now = time.time()
+        pipe = self.redis.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            "payload": json.dumps(payload), "status": QUEUED, "attempts": 0,
+            "dedup_key": dedup_key or "", "created": now, "updated": now,
+        })
+        pipe.lpush(self._queued, job_id)
+        pipe.execute()
+        return job_id
+
+    def requeue_expired(self):
+        """Put running jobs whose lease expired back at the head of the queue; returns how many"""
+        return self._requeue_script(keys=[self._queued, self._running], args=[self._job_key(), time.time()])
+
+    def _claim_once(self, worker):
+        now = time.time()
+        return self._claim_script(
+            keys=[self._queued, self._running], args=[self._job_key(), worker, now, now + self.lease]
+        )
+
+    def claim(self, worker, timeout=1.0):
+        # Scripts cannot block, so an empty queue is polled like the SQLite backend does
+        self.requeue_expired()
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = self._claim_once(worker)
+            if job_id:
+                job = self.get(job_id)
+                if job is not None and job["attempts"] > self.max_attempts:
+                    self.fail(job_id, "Job abandoned by its workers too many times", worker=worker)
+                    continue
+                return job
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(min(0.1, max(0.0, deadline - time.monotonic())))
+
+    def renew(self, job_id, worker):
+        now = time.time()
+        return bool(self._renew_script(keys=[self._job_key(job_id)], args=[worker, now, now + self.lease]))
+
+    def _finish(self, job_id, worker, fields, requeue=False):
+        args = [worker or "", job_id, time.time(), int(self.result_ttl), "1" if requeue else "0"]
+        for field, value in fields.items():
+            args += [field, value]
+        return bool(self._finish_script(keys=[self._job_key(job_id), self._running, self._queued], args=args))
+
+    def complete(self, job_id, result, worker=None):
+        return self._finish(job_id, worker, {"status": DONE, "result": json.dumps(result)})
+
+    def fail(self, job_id, error, retry=False, worker=None):
+        attempts = int(self.redis.hget(self._job_key(job_id), "attempts") or 0)
+        if retry and attempts < self.max_attempts:
+            return self._finish(job_id, worker, {"status": QUEUED, "error": str(error)}, requeue=True)
+        if not self._finish(job_id, worker, {"status": FAILED, "error": str(error)}):
+            return False
+        dedup_key = self.redis.hget(self._job_key(job_id), "dedup_key")
+        if dedup_key:
+            self.redis.delete(self._dedup_key(dedup_key))
+        return True
+
+    def get(self, job_id):
+        data = self.redis.hgetall(self._job_key(job_id))
+        if not data:
+            return None
+        return {
+            "id": job_id,
+            "status": data["status"],
+            "payload": json.loads(data["payload"]),
+            "result": json.loads(data["result"]) if data.get("result") else None,
+            "error": data.get("error"),
+            "attempts": int(data.get("attempts", 0)),
+        }
+
+    def stats(self):
+        return {QUEUED: self.redis.llen(self._queued), RUNNING: self.redis.llen(self._running)}
+
+
+def open_queue(url=None):
+    """Queue for a ``sqlite:///path`` / ``redis://`` URL or a bare SQLite path; None when no URL is configured"""
+    url = url if url is not None else JOB_QUEUE_URL
+    if not url:
+        return None
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisJobQueue(url)
+    if url.startswith("sqlite:///"):
+        url = url[len("sqlite:///"):]
+    return SQLiteJobQueue(url)
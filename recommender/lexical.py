@@ -0,0 +1,133 @@
+import os
+import re
+
+import numpy as np
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or our that the their this to "
+    "we will with you your who can able ability experience skills skill strong looking seeking "
+    "hiring candidate role team work".split()
+)
+
+_FORMAT_VERSION = 1
+_TOKEN_RE = re.compile(r"[a-z0-9+#]+")
+
+
+def tokenize(text):
+    """Lowercase word tokens, keeping tech terms like c++ and c#"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def lexical_tokens(text):
+    """Tokens used by the BM25 index"""
+    return [t for t in tokenize(text) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over an inverted index stored in compact CSR-style arrays
+
+    ``offsets[t]:offsets[t + 1]`` slices ``doc_ids`` and ``weights`` for term ``t``.
+    Weights are the full per-posting BM25 contribution (idf and length
+    normalization included), so scoring a query is a handful of NumPy
+    scatter-adds.
+    """
+
+    def __init__(self, vocabulary, offsets, doc_ids, weights, n_docs):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.n_docs = n_docs
+
+    @classmethod
+    def build(cls, texts, k1=1.2, b=0.75):
+        docs = [lexical_tokens(text) for text in texts]
+        n_docs = len(docs)
+        doc_len = np.array([len(d) for d in docs], dtype=np.float32)
+        avg_len = float(doc_len.mean()) if n_docs else 0.0
+
+        postings = {}
+        for doc_id, tokens in enumerate(docs):
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append((doc_id, tf))
+
+        vocabulary = {term: i for i, term in enumerate(sorted(postings))}
+        offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        doc_ids = []
+        weights = []
+        for term, term_id in vocabulary.items():
+            plist = postings[term]
+            df = len(plist)
+            idf = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in plist:
+                norm = k1 * (1.0 - b + b * doc_len[doc_id] / avg_len) if avg_len else k1
+                doc_ids.append(doc_id)
+                weights.append(idf * tf * (k1 + 1.0) / (tf + norm))
+            offsets[term_id + 1] = len(doc_ids)
+
+        return cls(
+            vocabulary,
+            offsets,
+            np.asarray(doc_ids, dtype=np.int32),
+            np.asarray(weights, dtype=np.float32),
+            n_docs,
+        )
+
+    def scores(self, query):
+        """BM25 score of every document for a query"""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        for term in set(lexical_tokens(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            # A term posts each document at most once, so plain fancy-index addition is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query, k=10):
+        """Return (row, score) pairs for the k best-matching documents with a non-zero score"""
+        scores = self.scores(query)
+        matched = np.flatnonzero(scores)
+        if not len(matched):
+            return []
+        k = min(k, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
+    def save(self, path, version):
+        terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=object)
+        np.savez_compressed(
+            path,
+            terms=terms.astype(str),
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            n_docs=self.n_docs,
+            version=version,
+            format_version=_FORMAT_VERSION,
+        )
+
+    @classmethod
+    def load(cls, path, version):
+        """Load a saved index, or return None if it is missing or stale"""
+        if not os.path.exists(path):
+            return None
+        stored = np.load(path)
+        if str(stored["version"]) != version or int(stored["format_version"]) != _FORMAT_VERSION:
+            return None
+        vocabulary = {str(term): i for i, term in enumerate(stored["terms"])}
+        return cls(vocabulary, stored["offsets"], stored["doc_ids"], stored["weights"], int(stored["n_docs"]))
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fuse several ranked lists of (row, score) pairs into one, by 1 / (k + rank)"""
+    fused = {}
+    for ranking in rankings:
+        for rank, (row, _) in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
@@ -0,0 +1,292 @@
+"""Lightweight per-stage tracing and Prometheus metrics
+
+``span("stage")`` times one stage of the hot path (URL fetch, HTML parsing, the
+Gemini call, JSON extraction, rendering) into a latency histogram; ``inc`` and
+``observe`` feed counters and histograms for tokens, cache lookups, retries and
+timeouts. ``trace()`` additionally collects the spans one request runs, so the UI
+can show where it spent its time. The trace lives in a context variable; work
+handed to other threads or event loops joins it when it runs in a copy of the
+caller's context (``asyncio.to_thread``, ``carry_trace``).
+
+Everything is off unless ``METRICS_ENABLED`` is set. When off, ``span`` returns a
+shared no-op context manager, ``traced`` leaves functions undecorated and the
+counter helpers return on their first line.
+
+``render_prometheus`` produces the text exposition format; the API serves it at
+``/metrics`` and ``serve`` exposes it from any process (e.g. Streamlit) on a port.
+Each process keeps its own registry, so scrape every worker.
+"""
+import contextlib
+import contextvars
+import functools
+import os
+import threading
+import time
+from collections import deque
+
+ENABLED = os.getenv("METRICS_ENABLED", "").lower() in ("1", "true", "yes", "on")
+PREFIX = "shl_recommender_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000)
+
+# name -> (type, help, histogram buckets)
+METRICS = {
+    "stage_duration_seconds": ("histogram", "Time spent in each pipeline stage", LATENCY_BUCKETS),
+    "stage_errors_total": ("counter", "Pipeline stages that raised", None),
+    "model_tokens": ("histogram", "Tokens per model call, by direction", TOKEN_BUCKETS),
+    "model_tokens_total": ("counter", "Tokens sent to and received from the model", None),
+    "cache_lookups_total": ("counter", "Recommendation cache lookups by result", None),
+    "retries_total": ("counter", "Model calls retried after a transient failure", None),
+    "timeouts_total": ("counter", "Model calls that missed their deadline", None),
+    "grounding_items_total": ("counter", "Model output items by how they matched the catalog", None),
+}
+
+_NOOP = contextlib.nullcontext()
+# (spans list, perf_counter start) of the trace being collected, or None
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+
+
+class Registry:
+    """Thread-safe counters and cumulative histograms keyed by (name, labels)"""
+
+    def __init__(self, recent=200):
+        self._counters = {}
+        self._histograms = {}
+        self._recent = {}
+        self._recent_size = recent
+        self._lock = threading.Lock()
+
+    def inc(self, name, value=1, labels=()):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=()):
+        buckets = METRICS[name][2]
+        with self._lock:
+            key = (name, labels)
+            state = self._histograms.get(key)
+            if state is None:
+                state = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+            self._recent.setdefault(key, deque(maxlen=self._recent_size)).append(value)
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(s[0]), s[1], s[2]) for key, s in self._histograms.items()}
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            series = counters if kind == "counter" else histograms
+            keys = sorted(key for key in series if key[0] == name)
+            if not keys:
+                continue
+            lines.append(f"# HELP {PREFIX}{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for key in keys:
+                labels = key[1]
+                if kind == "counter":
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(series[key])}")
+                    continue
+                counts, total, count = series[key]
+                cumulative = 0
+                for bound, n in zip(buckets, counts):
+                    cumulative += n
+                    lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(total)}")
+                lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """Counters plus count/mean/p50/p95 of the recent observations of each histogram series"""
+        with self._lock:
+            counters = {_series_name(name, labels): value for (name, labels), value in self._counters.items()}
+            histograms = {}
+            for (name, labels), (_, total, count) in self._histograms.items():
+                recent = sorted(self._recent[(name, labels)])
+                histograms[_series_name(name, labels)] = {
+                    "count": count,
+                    "mean": total / count,
+                    "p50": recent[int(0.5 * (len(recent) - 1))],
+                    "p95": recent[int(0.95 * (len(recent) - 1))],
+                }
+        return {"counters": counters, "histograms": histograms}
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._recent.clear()
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _series_name(name, labels):
+    return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+
+
+registry = Registry()
+
+
+def inc(name, value=1, **labels):
+    """Add to a counter"""
+    if not ENABLED:
+        return
+    registry.inc(name, value, tuple(sorted(labels.items())))
+
+
+def observe(name, value, **labels):
+    """Record one histogram observation"""
+    if not ENABLED:
+        return
+    registry.observe(name, value, tuple(sorted(labels.items())))
+
+
+def record_tokens(model, tokens_in, tokens_out):
+    """Record prompt and response token counts of one model call"""
+    if not ENABLED:
+        return
+    for direction, tokens in (("in", tokens_in), ("out", tokens_out)):
+        if tokens:
+            observe("model_tokens", tokens, direction=direction, model=model)
+            inc("model_tokens_total", tokens, direction=direction, model=model)
+
+
+class _Span:
+    __slots__ = ("stage", "labels", "started")
+
+    def __init__(self, stage, labels):
+        self.stage = stage
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        labels = tuple(sorted(self.labels.items())) + (("stage", self.stage),)
+        registry.observe("stage_duration_seconds", elapsed, labels)
+        if exc_type is not None:
+            registry.inc("stage_errors_total", 1, labels)
+        current = _trace.get()
+        if current is not None:
+            spans, started = current
+            spans.append({
+                "stage": self.stage,
+                "start_ms": (self.started - started) * 1000,
+                "duration_ms": elapsed * 1000,
+                "error": exc_type.__name__ if exc_type is not None else None,
+                **self.labels,
+            })
+        return False
+
+
+def span(stage, **labels):
+    """Context manager timing one stage into ``stage_duration_seconds``"""
+    if not ENABLED:
+        return _NOOP
+    return _Span(stage, labels)
+
+
+def traced(stage):
+    """Decorator form of ``span``; a no-op (the function itself) when metrics are disabled"""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(stage, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin_trace():
+    """Start collecting the current context's spans; returns the list they are appended to"""
+    if not ENABLED:
+        return []
+    spans = []
+    _trace.set((spans, time.perf_counter()))
+    return spans
+
+
+def end_trace():
+    """Stop collecting spans in the current context and return them"""
+    current = _trace.get()
+    _trace.set(None)
+    return current[0] if current is not None else []
+
+
+def carry_trace(coro):
+    """Wrap a coroutine bound for another thread's event loop so its spans join the caller's trace"""
+    current = _trace.get()
+    if current is None:
+        return coro
+
+    async def in_trace():
+        _trace.set(current)  # Only this task's context: the loop thread's own context is untouched
+        return await coro
+    return in_trace()
+
+
+@contextlib.contextmanager
+def trace():
+    """Collect the spans run inside the block (and work carried over in its context) into the yielded list"""
+    if not ENABLED:
+        yield []
+        return
+    try:
+        yield begin_trace()
+    finally:
+        end_trace()
+
+
+def render_prometheus():
+    return registry.render()
+
+
+def snapshot():
+    return registry.snapshot()
+
+
+def serve(port, host="0.0.0.0"):
+    """Serve ``/metrics`` from a daemon thread; returns the HTTP server"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    return server
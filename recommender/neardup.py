@@ -0,0 +1,250 @@
+"""Near-duplicate job description lookup with MinHash + LSH
+
+Recruiters often repost a job description with small edits (salary, location,
+closing date). An exact cache key misses those; this tier fingerprints each
+query's word shingles with MinHash, finds earlier queries that share an LSH band,
+and returns the stored recommendations of one whose estimated Jaccard similarity
+is above the threshold.
+"""
+import json
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from recommender.lexical import tokenize
+
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+# Reposting edits that should not make a job description look new
+_VOLATILE_RE = re.compile(
+    r"(?:^|[.;\n])[^.;\n]*\b(?:salary|compensation|pay range|location|posted|closing date|deadline|apply by|"
+    r"start date|reference|req(?:uisition)? id|job id)\b[^.;\n]*",
+    re.I,
+)
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def fingerprint_text(text):
+    """Job description with salary/location/date clauses removed and numbers collapsed"""
+    return _DIGITS_RE.sub("0", _VOLATILE_RE.sub(" ", text))
+
+
+def shingles(text, size=3):
+    """Set of word n-grams of the fingerprint text; short texts fall back to single words"""
+    tokens = tokenize(fingerprint_text(text))
+    if len(tokens) < size:
+        return set(tokens)
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+class MinHasher:
+    """MinHash signatures from ``num_perm`` universal hash functions over 32-bit shingle hashes"""
+
+    def __init__(self, num_perm=128, seed=1):
+        rng = np.random.default_rng(seed)
+        # a, b < 2**32 and x < 2**32 keep a * x + b below 2**64, so uint64 math never wraps
+        self.a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, text):
+        features = shingles(text)
+        if not features:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        x = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint64, count=len(features))
+        hashed = (np.outer(self.a, x) + self.b[:, None]) % _PRIME
+        return (hashed & _MAX_HASH).min(axis=1)
+
+
+def jaccard(sig_a, sig_b):
+    """Estimated Jaccard similarity of two MinHash signatures"""
+    return float(np.mean(sig_a == sig_b))
+
+
+class NearDuplicateCache:
+    """Bounded LRU of (MinHash signature, recommendations) with an LSH band index and SQLite persistence
+
+    With ``bands`` bands of ``num_perm / bands`` rows, pairs at the default threshold
+    of 0.85 collide in at least one band with probability above 0.99; candidates are
+    then checked against the full signature. Entries older than ``ttl`` seconds are
+    never returned and are evicted when a lookup or load meets them.
+    """
+
+    def __init__(self, prompt_version, threshold=0.85, max_items=1024, path=None, num_perm=128, bands=32, ttl=None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.prompt_version = prompt_version
+        self.threshold = threshold
+        self.max_items = max_items
+        self.ttl = ttl
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (namespace, signature, value, stored_at)
+        self._buckets = {}  # (namespace, band, band hash) -> set of keys
+        self._next_key = 0  # Only without SQLite; a shared file assigns the keys, so processes never collide
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            schema = self._conn.execute("SELECT sql FROM sqlite_master WHERE name = 'near_duplicates'").fetchone()
+            if schema is not None and "AUTOINCREMENT" not in schema[0]:
+                # Older tables took keys from each process's counter; rebuild rather than trust them
+                self._conn.execute("DROP TABLE near_duplicates")
+            # AUTOINCREMENT never reuses a key, so an entry another process still holds can't be overwritten
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS near_duplicates ("
+                "key INTEGER PRIMARY KEY AUTOINCREMENT, prompt_version TEXT NOT NULL, namespace TEXT NOT NULL, "
+                "signature BLOB NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.commit()
+            self._load()
+
+    def _band_keys(self, namespace, signature):
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _load(self):
+        oldest = time.time() - self.ttl if self.ttl else 0.0
+        rows = self._conn.execute(
+            "SELECT key, namespace, signature, value, created FROM near_duplicates "
+            "WHERE prompt_version = ? AND created >= ? ORDER BY accessed DESC LIMIT ?",
+            (self.prompt_version, oldest, self.max_items),
+        ).fetchall()
+        for key, namespace, blob, value, created in reversed(rows):
+            self._index(key, namespace, np.frombuffer(blob, dtype=np.uint64), json.loads(value), created)
+        # Rows from older prompt versions, past the TTL or beyond the size limit are never loaded again
+        self._conn.execute(
+            "DELETE FROM near_duplicates WHERE prompt_version != ? OR created < ? OR key NOT IN ("
+            "SELECT key FROM near_duplicates ORDER BY accessed DESC LIMIT ?)",
+            (self.prompt_version, oldest, self.max_items),
+        )
+        self._conn.commit()
+
+    def _index(self, key, namespace, signature, value, stored_at):
+        self._entries[key] = (namespace, signature, value, stored_at)
+        for band_key in self._band_keys(namespace, signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def _remove(self, key):
+        namespace, signature, _, _ = self._entries.pop(key)
+        for band_key in self._band_keys(namespace, signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def _evict(self):
+        evicted = []
+        while len(self._entries) > self.max_items:
+            key = next(iter(self._entries))
+            self._remove(key)
+            evicted.append(key)
+        return evicted
+
+    def _delete_rows(self, keys):
+        if self._conn is not None and keys:
+            self._conn.executemany("DELETE FROM near_duplicates WHERE key = ?", [(k,) for k in keys])
+            self._conn.commit()
+
+    def _closest(self, namespace, signature, threshold, now):
+        """Key and similarity of the most similar live query at or above threshold (lock held)
+
+        Expired candidates are evicted on the way.
+        """
+        candidates = set()
+        for band_key in self._band_keys(namespace, signature):
+            candidates |= self._buckets.get(band_key, set())
+        best_key, best = None, threshold
+        expired = []
+        for key in candidates:
+            _, stored, _, stored_at = self._entries[key]
+            if self.ttl and now - stored_at > self.ttl:
+                expired.append(key)
+                continue
+            similarity = jaccard(signature, stored)
+            if similarity >= best:
+                best_key, best = key, similarity
+        for key in expired:
+            self._remove(key)
+        self._delete_rows(expired)
+        return best_key, best
+
+    def lookup(self, query, namespace=""):
+        """Return ``(recommendations, similarity)`` for the closest stored query above the threshold, or None"""
+        signature = self.hasher.signature(query)
+        now = time.time()
+        with self._lock:
+            key, similarity = self._closest(namespace, signature, self.threshold, now)
+            if key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            value = self._entries[key][2]
+            if self._conn is not None:
+                self._conn.execute("UPDATE near_duplicates SET accessed = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+        return value, similarity
+
+    def get(self, query, namespace=""):
+        """Recommendations stored for a near-duplicate of the query, or None"""
+        found = self.lookup(query, namespace)
+        return found[0] if found else None
+
+    def put(self, query, recommendations, namespace=""):
+        """Fingerprint a query and remember its recommendations"""
+        if not recommendations:
+            return
+        signature = self.hasher.signature(query)
+        now = time.time()
+        with self._lock:
+            key, _ = self._closest(namespace, signature, 1.0, now)
+            row = (self.prompt_version, namespace, signature.tobytes(), json.dumps(recommendations), now, now)
+            if key is not None:
+                # Same fingerprint as an existing entry: replace it rather than storing a twin
+                self._entries[key] = (namespace, signature, recommendations, now)
+                self._entries.move_to_end(key)
+                if self._conn is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO near_duplicates "
+                        "(key, prompt_version, namespace, signature, value, created, accessed) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (key,) + row,
+                    )
+            else:
+                if self._conn is not None:
+                    key = self._conn.execute(
+                        "INSERT INTO near_duplicates (prompt_version, namespace, signature, value, created, accessed) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        row,
+                    ).lastrowid
+                else:
+                    key = self._next_key
+                    self._next_key += 1
+                self._index(key, namespace, signature, recommendations, now)
+            if self._conn is not None:
+                self._conn.commit()
+            self._delete_rows(self._evict())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM near_duplicates")
+                self._conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
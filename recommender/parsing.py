@@ -0,0 +1,261 @@
+import json
+import re
+
+
+class IncrementalArrayParser:
+    """Yields each object of a streamed top-level JSON array as soon as it is complete
+
+    Text can arrive in arbitrary chunks (including prose or a ```json fence before the
+    array). The array starts at the first "[" followed by "{" or "]", so bracketed prose
+    such as "[7] picks" is skipped. Each character is scanned once, tracking
+    string/escape state and nesting depth, so the cost is linear in the response length.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self._opened = False
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._object = []
+
+    def feed(self, chunk):
+        """Consume a chunk of model output and return the objects it completed"""
+        completed = []
+        if self._done:
+            return completed
+        self.buffer.append(chunk)
+        for ch in chunk:
+            if not self._in_array:
+                if ch == "[":
+                    self._opened = True
+                elif self._opened and not ch.isspace():
+                    # Only "[{" or "[]" starts the array; anything else was a bracket in prose
+                    self._opened = False
+                    if ch in "{]":
+                        self._in_array = True
+                    else:
+                        continue
+                else:
+                    continue
+
+            if self._depth == 0:
+                # Between objects: skip commas and whitespace, stop at the closing bracket
+                if ch == "{":
+                    self._depth = 1
+                    self._object = [ch]
+                elif ch == "]":
+                    self._done = True
+                    break
+                continue
+
+            self._object.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode("".join(self._object))
+                    if obj is not None:
+                        completed.append(obj)
+                    self._object = []
+        return completed
+
+    @staticmethod
+    def _decode(text):
+        try:
+            obj = json.loads(text)
+        except json.JSONDecodeError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+    @property
+    def text(self):
+        """Everything fed so far"""
+        return "".join(self.buffer)
+
+
+# Structured-output request for Gemini JSON mode: the model returns a bare JSON array
+RECOMMENDATION_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "Assessment Name": {"type": "STRING"},
+            "URL": {"type": "STRING"},
+            "Remote Testing Support": {"type": "STRING", "enum": ["Yes", "No"]},
+            "Adaptive/IRT Support": {"type": "STRING", "enum": ["Yes", "No"]},
+            "Duration": {"type": "STRING"},
+            "Test Type": {"type": "ARRAY", "items": {"type": "STRING"}},
+            "Description": {"type": "STRING"},
+        },
+        "required": ["Assessment Name", "URL"],
+    },
+}
+
+JSON_GENERATION_CONFIG = {
+    "response_mime_type": "application/json",
+    "response_schema": RECOMMENDATION_SCHEMA,
+}
+
+
+_DECODER = json.JSONDecoder()
+
+
+class ParseError(ValueError):
+    """Raised when a response contains an array but no object could be recovered from it"""
+
+
+# An array of objects starts at "[" followed by "{"; a bare "[" may be prose, e.g. "[7] picks"
+_ARRAY_START_RE = re.compile(r"\[\s*\{")
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+# Strings (skipped whole, so brackets inside them never count) and structural characters
+_STRUCTURE_RE = re.compile(_STRING + r"|[\[\]{}]")
+_TRAILING_COMMA = r",\s*(?=[}\]])"
+# Runs of text that need no repair are matched whole, which keeps the Python callback to one
+# call per fix rather than per string. A run can't fail once it has started, so it never backtracks
+_REPAIR_RE = re.compile(
+    rf"((?:[^\"',]+|{_STRING}|,(?!\s*[}}\]]))+)|'[^'\\]*(?:\\.[^'\\]*)*'|{_TRAILING_COMMA}"
+)
+_NEEDS_REPAIR_RE = re.compile(rf"'|{_TRAILING_COMMA}")
+
+
+def _repair_token(match):
+    if match.group(1) is not None:
+        return match.group(1)
+    token = match.group()
+    if token[0] == "'":
+        body = token[1:-1].replace("\\'", "'").replace('"', '\\"')
+        return f'"{body}"'
+    return ""  # Trailing comma
+
+
+def repair_json(text):
+    """Best-effort repair of common model JSON mistakes
+
+    Converts single-quoted strings (``['Numerical', 'Reasoning']``) to double-quoted
+    ones and drops trailing commas. Truncated output is left open so that only
+    complete objects are salvaged from it.
+    """
+    if not _NEEDS_REPAIR_RE.search(text):
+        return text
+    return _REPAIR_RE.sub(_repair_token, text)
+
+
+def salvage_objects(array):
+    """Every complete object of a truncated or partly malformed array that starts at index 0
+
+    Each object is decoded by the C decoder; only an object that fails to decode is
+    scanned to find where it ends. Stops at the array's closing bracket.
+    """
+    objects = []
+    pos = 1
+    while True:
+        pos = _next_object(array, pos)
+        if pos is None:
+            break
+        try:
+            obj, pos = _DECODER.raw_decode(array, pos)
+        except json.JSONDecodeError:
+            pos = _object_end(array, pos)
+            if pos is None:
+                break  # Truncated inside this object
+        else:
+            if isinstance(obj, dict):
+                objects.append(obj)
+    return objects
+
+
+def _next_object(text, pos):
+    """Index of the next top-level object in an array, or None at its end"""
+    end = text.find("]", pos)
+    start = text.find("{", pos)
+    if start == -1 or (end != -1 and end < start):
+        return None
+    return start
+
+
+def _object_end(text, start):
+    """Index just past the balanced ``{...}`` starting at ``start``, or None if it never closes"""
+    depth = 0
+    for match in _STRUCTURE_RE.finditer(text, start):
+        token = match.group()
+        if token in "{[":
+            depth += 1
+        elif token in "}]":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+
+def _as_objects(value):
+    if isinstance(value, dict):
+        # Some responses wrap the array, e.g. {"recommendations": [...]}
+        for item in value.values():
+            if isinstance(item, list):
+                return [obj for obj in item if isinstance(obj, dict)]
+        return [value]
+    if isinstance(value, list):
+        return [obj for obj in value if isinstance(obj, dict)]
+    return []
+
+
+def parse_recommendations(text):
+    """Parse a model response into a list of recommendation dicts without another LLM call
+
+    Tries, in order: the whole response as JSON (JSON mode), the first array of objects
+    (a "[" followed by "{", so bracketed prose such as "[7] picks" before it is skipped),
+    the repaired array, and finally salvaging every complete object from a truncated or
+    partly malformed array. Every decode runs in the C decoder; the text is decoded at
+    most once per step.
+    Returns an empty list when the response contains no array at all.
+    """
+    if isinstance(text, list):
+        return text
+    if not isinstance(text, str):
+        raise ParseError("Unsupported response format received. Expected string or list.")
+
+    match = _ARRAY_START_RE.search(text)
+    stripped = text.strip()
+    # A response that starts with its array is decoded by the fast path below
+    starts_with_array = match is not None and match.start() == len(text) - len(text.lstrip())
+    if stripped.startswith(("[", "{")) and not starts_with_array:
+        try:
+            return _as_objects(json.loads(stripped))
+        except json.JSONDecodeError:
+            pass
+
+    # Fast path: decode straight from the array start (fences and prose around it are ignored)
+    if match is None:
+        return []
+    start = match.start()
+    try:
+        return _as_objects(_DECODER.raw_decode(text, start)[0])
+    except json.JSONDecodeError:
+        pass
+
+    # Repair from the array start on; the decoder stops at the array's end, so text after it is ignored
+    array = text[start:]
+    repaired = repair_json(array)
+    if repaired != array:
+        try:
+            return _as_objects(_DECODER.raw_decode(repaired)[0])
+        except json.JSONDecodeError:
+            pass
+
+    salvaged = salvage_objects(repaired)
+    if not salvaged:
+        raise ParseError("Could not process model response. Please try again.")
+    return salvaged
@@ -0,0 +1,287 @@
+"""Precomputed recommendations for the sample jobs and common role templates
+
+The answers for the app's sample job descriptions and the role template library
+(``data/role_templates.json``) only change when the prompt, the catalog or the
+model does, so they are generated ahead of time and served without a model call::
+
+    python -m recommender.precompute                 # at build or deploy time
+
+``PrecomputedStore`` keeps them in one JSON file stamped with a version built
+from ``PROMPT_VERSION``, the catalog content hash and the model name; entries
+under any other version are ignored. ``PrecomputedRefresher`` runs in the
+background of long-lived processes and regenerates the file whenever that
+version changes, so a new catalog or prompt never serves stale answers. Only the
+process holding the file's ``RefreshLease`` generates; the others just reload
+what it writes, so adding workers does not multiply model calls.
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from recommender.cache import cache_key
+
+logger = logging.getLogger("recommender.precompute")
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+TEMPLATES_PATH = os.getenv("ROLE_TEMPLATES_PATH", os.path.join(DATA_DIR, "role_templates.json"))
+PRECOMPUTED_PATH = os.getenv("PRECOMPUTED_PATH", os.path.join(DATA_DIR, "precomputed.json"))
+REFRESH_INTERVAL = float(os.getenv("PRECOMPUTE_REFRESH_INTERVAL", "3600"))
+
+SAMPLE_QUERIES = [
+    "Hiring a software engineer skilled in Python, JavaScript, and system design, with experience in cloud architecture and CI/CD pipelines. The candidate should have strong problem-solving skills and be able to work in an agile environment.",
+    "Looking for a product manager with experience in agile methodologies, market research, and team leadership. The ideal candidate will have 3+ years of experience in product development and a track record of successful product launches.",
+    "Recruiting a data analyst with expertise in Excel, SQL, Power BI, and statistics. The role requires strong analytical thinking and the ability to communicate insights to non-technical stakeholders.",
+    "Seeking a customer service representative with excellent communication skills, problem-solving abilities, and experience with CRM systems. The ideal candidate will be patient, empathetic, and able to handle difficult customer situations."
+]
+
+
+def load_templates(path=TEMPLATES_PATH):
+    """Role templates as ``(name, job description)`` pairs; a missing file means no templates"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [(t["name"], t["job_description"]) for t in json.load(f)]
+    except FileNotFoundError:
+        return []
+
+
+def warm_queries(templates_path=TEMPLATES_PATH):
+    """Every job description to precompute: the sample jobs, then the role templates"""
+    samples = [(f"Sample {i + 1}: {text[:50]}...", text) for i, text in enumerate(SAMPLE_QUERIES)]
+    return samples + load_templates(templates_path)
+
+
+def store_key(query):
+    """Whitespace- and case-insensitive key over the full job description"""
+    return cache_key(query, "precomputed")
+
+
+class PrecomputedStore:
+    """Version-stamped recommendations for known job descriptions, persisted as one JSON file"""
+
+    def __init__(self, path=PRECOMPUTED_PATH):
+        self.path = path
+        self.version = None
+        self.generated_at = None
+        self._entries = {}
+        self._mtime = None
+        self.hits = 0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        """Re-read the file if it changed on disk (e.g. rebuilt by a deploy or another worker)"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        with self._lock:
+            self.version = data.get("version")
+            self.generated_at = data.get("generated_at")
+            self._entries = data.get("entries", {})
+            self._mtime = mtime
+        return True
+
+    def get(self, query, version):
+        """Stored recommendations for a job description under ``version``, or None"""
+        if version != self.version:
+            return None
+        entry = self._entries.get(store_key(query))
+        if entry is None:
+            return None
+        self.hits += 1
+        return entry["recommendations"]
+
+    def entries(self, version):
+        """Copy of the stored entries (key -> entry) if they are under ``version``, else {}"""
+        with self._lock:
+            return dict(self._entries) if version == self.version else {}
+
+    def missing(self, queries, version):
+        """The ``(name, text)`` pairs without an entry under ``version``"""
+        if version != self.version:
+            return list(queries)
+        return [(name, text) for name, text in queries if store_key(text) not in self._entries]
+
+    def save(self, version, entries):
+        """Atomically replace the file with ``entries`` (key -> entry) under ``version``"""
+        data = {"version": version, "generated_at": time.time(), "entries": entries}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self.version = version
+            self.generated_at = data["generated_at"]
+            self._entries = entries
+            self._mtime = os.path.getmtime(self.path)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def generate(recommender, text):
+    """Fresh recommendations for one job description, bypassing every cache
+
+    Raises instead of degrading to catalog-only results, so a refused or failed
+    call is retried on the next refresh rather than stored.
+    """
+    query, _ = recommender.prepare_query(text)
+    candidates = recommender.retrieve_candidates(query)
+    return recommender.generate_routed(recommender.build_prompt(query, candidates), candidates, query=query)
+
+
+def refresh(recommender, store, queries):
+    """Generate every missing or stale entry and save; returns ``(generated, failed)``"""
+    version = recommender.precompute_version
+    todo = store.missing(queries, version)
+    if not todo:
+        return 0, 0
+    # Keep entries that are still current; a version change starts from scratch
+    entries = store.entries(version)
+    failed = 0
+    for name, text in todo:
+        try:
+            recommendations = generate(recommender, text)
+        except Exception as e:
+            failed += 1
+            logger.warning("precompute failed for %r: %s", name, e)
+            continue
+        entries[store_key(text)] = {"name": name, "recommendations": recommendations, "generated_at": time.time()}
+    if len(todo) > failed:
+        store.save(version, entries)
+    logger.info("precomputed %d of %d job descriptions (version %s)", len(todo) - failed, len(todo), version)
+    return len(todo) - failed, failed
+
+
+class RefreshLease:
+    """Time-limited lease, kept in SQLite next to the store, naming the one process that refreshes it
+
+    ``acquire`` takes the lease when it is free or expired and renews it for its
+    holder; the read-modify-write runs under ``BEGIN IMMEDIATE``, so processes
+    sharing the file agree on a single owner.
+    """
+
+    def __init__(self, path, ttl):
+        self.ttl = ttl
+        self.owner = uuid.uuid4().hex
+        self._lock = threading.Lock()  # The refresher thread and stop() share the connection
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS refresh_lease (id INTEGER PRIMARY KEY, owner TEXT, expires REAL)")
+
+    def acquire(self):
+        """Whether this process holds the lease for the next ``ttl`` seconds"""
+        with self._lock:
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT owner, expires FROM refresh_lease WHERE id = 1").fetchone()
+                held = row is None or row[0] == self.owner or row[1] < now
+                if held:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO refresh_lease (id, owner, expires) VALUES (1, ?, ?)",
+                        (self.owner, now + self.ttl),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return held
+
+    def release(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM refresh_lease WHERE id = 1 AND owner = ?", (self.owner,))
+
+
+class PrecomputedRefresher:
+    """Background thread keeping a ``PrecomputedStore`` current for a recommender
+
+    Every ``interval`` seconds it picks up a file rebuilt elsewhere and, if it holds
+    the lease, regenerates entries that are missing or were built for another
+    prompt, catalog or model. Failed entries are retried ``retry_after`` seconds
+    later. A lease outlives two intervals, so another process takes over only once
+    the owner has stopped renewing it.
+    """
+
+    def __init__(self, recommender, store, queries, interval=REFRESH_INTERVAL, retry_after=300, lease=None):
+        self.recommender = recommender
+        self.store = store
+        self.queries = queries
+        self.interval = interval
+        self.retry_after = retry_after
+        self.lease = lease if lease is not None else RefreshLease(f"{store.path}.lease", 2 * interval)
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        self.store.reload()
+        generated, failed = 0, 0
+        if self.lease.acquire():
+            generated, failed = refresh(self.recommender, self.store, self.queries)
+        self.last_run = time.time()
+        return generated, failed
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                _, failed = self.run_once()
+            except Exception:
+                logger.exception("precompute refresh failed")
+                failed = 1
+            self._stop.wait(min(self.interval, self.retry_after) if failed else self.interval)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="precompute-refresher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.lease.release()  # Let another process take over without waiting for the lease to expire
+
+
+def start_refresher(recommender, templates_path=TEMPLATES_PATH, interval=REFRESH_INTERVAL):
+    """Start refreshing the recommender's precomputed store; returns None when disabled"""
+    if recommender.precomputed is None or interval <= 0:
+        return None
+    return PrecomputedRefresher(recommender, recommender.precomputed, warm_queries(templates_path), interval).start()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompute recommendations for the sample jobs and role templates")
+    parser.add_argument("--templates", default=TEMPLATES_PATH, help="JSON list of {name, job_description}")
+    parser.add_argument("-o", "--output", default=PRECOMPUTED_PATH)
+    parser.add_argument("--force", action="store_true", help="Regenerate entries that are already current")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    from recommender.engine import Recommender
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    load_dotenv()
+    recommender = Recommender.from_env()
+    store = PrecomputedStore(args.output)
+    if args.force:
+        store.version = None
+    generated, failed = refresh(recommender, store, warm_queries(args.templates))
+    print(json.dumps({"output": args.output, "version": store.version, "entries": len(store),
+                      "generated": generated, "failed": failed}, indent=2))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
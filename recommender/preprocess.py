@@ -0,0 +1,176 @@
+"""Job description cleanup and token-budgeted packing
+
+Scraped postings carry navigation, cookie banners and footers, and long postings
+bury the requirements under company boilerplate. ``prepare_query`` drops the
+boilerplate, removes repeated lines, scores every sentence by section and
+requirement keywords, and keeps the best sentences (in their original order) that
+fit the token budget.
+"""
+import math
+import os
+import re
+
+QUERY_TOKEN_BUDGET = int(os.getenv("QUERY_TOKEN_BUDGET", "400"))
+CHARS_PER_TOKEN = 4.0
+
+# Navigation, banner and footer lines, matched against the whole line so requirement bullets that mention
+# "JavaScript", "browser APIs" or "sign-up flows" are never mistaken for page chrome
+_BOILERPLATE_RE = re.compile(
+    r"[^\w©]*(?:skip to (?:main )?content|sign in|sign out|log ?in|log ?out|sign up|register|"
+    r"create (?:an )?account|my account|menu|cookie (?:settings|preferences|policy)|accept(?: all)?(?: cookies)?|"
+    r"reject all|manage cookies|privacy (?:policy|notice|statement)|terms (?:of use|of service|and conditions|"
+    r"& conditions)|subscribe|newsletter|follow us|share(?: this(?: job)?| on \w+)?|apply(?: now| for this job)?|"
+    r"save(?: this)? job|back to (?:search|jobs|results)|similar jobs|job alerts?|contact us|sitemap)[^\w]*",
+    re.I,
+)
+_FOOTER_RE = re.compile(
+    r"(?:©|copyright\b|(?:we|this (?:web)?site) uses? cookies\b)|.*\b(?:all rights reserved|"
+    r"is an equal opportunity employer)\W*$",
+    re.I,
+)
+_HEADING_RE = re.compile(r"^[#*\s]*([A-Za-z][A-Za-z &/'-]{2,60}?)[\s:*]*$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?;])\s+(?=[A-Z0-9•\-*])")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•·▪◦]|\d+[.)])\s+")
+_WHITESPACE_RE = re.compile(r"[ \t ]+")
+
+# Section headings and how much their sentences matter for choosing assessments
+_SECTION_WEIGHTS = [
+    (re.compile(r"requirement|qualification|skill|competenc|must have|what you('ll)? (need|bring)|profile|"
+                r"experience|knowledge|you have|about you|ideal candidate", re.I), 3.0),
+    (re.compile(r"responsibilit|duties|what you('ll)? do|the role|role overview|day to day|key tasks", re.I), 2.0),
+    (re.compile(r"nice to have|preferred|bonus|plus", re.I), 1.0),
+    (re.compile(r"about (us|the company)|who we are|our (mission|culture|values)|benefits|perks|we offer|"
+                r"compensation|salary|location|how to apply", re.I), -2.0),
+]
+
+_REQUIREMENT_RE = re.compile(
+    r"\b(?:experience|proficien\w*|knowledge|familiar\w*|skills?|abilit\w+|able to|degree|bachelor\w*|master\w*|"
+    r"certif\w*|required|requirements?|must|strong|expert\w*|understanding|years?|communicat\w*|analy\w+|"
+    r"develop\w*|design\w*|manag\w+|lead\w*|collaborat\w*|problem[- ]solving|stakeholder\w*|customer\w*)\b",
+    re.I,
+)
+_ROLE_RE = re.compile(
+    r"\b(?:analyst|developer|engineer|manager|designer|architect|consultant|specialist|administrator|scientist|"
+    r"assistant|associate|officer|coordinator|director|lead|executive|representative|agent|technician|"
+    r"accountant|clerk|intern|programmer|tester|writer|editor|supervisor|head of)\b",
+    re.I,
+)
+_TECH_RE = re.compile(r"\b(?:[A-Z][A-Za-z0-9]*[A-Z0-9][A-Za-z0-9]*|[a-z]+\+\+|[A-Za-z]#|\.NET|\d+\+? years?)\b")
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (about four characters per token for English text)"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def clean_lines(text):
+    """Non-empty lines with boilerplate and repeated lines removed"""
+    lines = []
+    seen = set()
+    for line in text.splitlines():
+        line = _WHITESPACE_RE.sub(" ", line).strip()
+        if not line:
+            continue
+        key = line.lower()
+        if key in seen:
+            continue  # Repeated nav items, headers and footers
+        seen.add(key)
+        if _BOILERPLATE_RE.fullmatch(line):
+            continue
+        # Copyright and cookie banners are dropped unless they name a skill; long lines are always content
+        if len(line) < 120 and _FOOTER_RE.match(line) and not _TECH_RE.search(line):
+            continue
+        lines.append(line)
+    return lines
+
+
+def _section_weight(heading):
+    for pattern, weight in _SECTION_WEIGHTS:
+        if pattern.search(heading):
+            return weight
+    return 0.0
+
+
+def score_sentences(lines):
+    """Split cleaned lines into sentences and score each for requirement content
+
+    Returns ``(sentence, score)`` pairs in document order.
+    """
+    scored = []
+    seen = set()
+    section = 0.0
+    for line in lines:
+        heading = _HEADING_RE.match(line)
+        if heading and len(line.split()) <= 6 and not line.endswith("."):
+            weight = _section_weight(heading.group(1))
+            if weight or line.endswith(":"):
+                section = weight
+                continue
+
+        for sentence in _SENTENCE_RE.split(line):
+            sentence = sentence.strip()
+            if not sentence or sentence.lower() in seen:
+                continue
+            seen.add(sentence.lower())
+            score = section
+            score += min(len(_REQUIREMENT_RE.findall(sentence)), 4)
+            score += min(len(_TECH_RE.findall(sentence)), 4) * 0.75
+            if _BULLET_RE.match(sentence):
+                score += 0.5
+            if len(sentence.split()) <= 8 and _ROLE_RE.search(sentence):
+                score += 4.0  # Short lines naming a role are usually the job title
+            scored.append((sentence, score))
+    return scored
+
+
+def pack(scored, budget, count_tokens=estimate_tokens):
+    """Keep the highest-scoring sentences that fit the budget, in their original order
+
+    Sentences scoring zero or less (navigation, company blurbs) are only used when
+    nothing scores higher.
+    """
+    order = [i for i in sorted(range(len(scored)), key=lambda i: -scored[i][1]) if scored[i][1] > 0]
+    order = order or list(range(len(scored)))
+    kept = set()
+    used = 0
+    for i in order:
+        cost = count_tokens(scored[i][0]) + 1  # +1 for the joining newline
+        if used + cost > budget:
+            continue
+        kept.add(i)
+        used += cost
+    return "\n".join(scored[i][0] for i in sorted(kept))
+
+
+def prepare_query(text, budget=None, count_tokens=None):
+    """Clean a job description and pack it into a token budget
+
+    ``count_tokens`` measures the original and final text (e.g. the model's token
+    counter); sentences are packed with the cheap estimate, rescaled to agree with
+    it. Returns ``(text, stats)`` where stats reports original, final and saved tokens.
+    """
+    budget = budget or QUERY_TOKEN_BUDGET
+    count_tokens = count_tokens or estimate_tokens
+    original_tokens = count_tokens(text) if text else 0
+
+    # Keep everything if cleanup would leave nothing (e.g. a one-line "Apply now" posting)
+    lines = clean_lines(text or "") or [line.strip() for line in (text or "").splitlines() if line.strip()]
+    cleaned = "\n".join(lines)
+    cleaned_tokens = original_tokens if cleaned == text else count_tokens(cleaned)
+    scored = []
+    if cleaned_tokens <= budget:
+        prepared, tokens = cleaned, cleaned_tokens
+    else:
+        # Pack in estimate units, scaled so the estimate tracks the real counter on this text
+        scale = estimate_tokens(cleaned) / cleaned_tokens
+        scored = score_sentences(lines)
+        prepared = pack(scored, int(budget * scale))
+        tokens = count_tokens(prepared) if prepared else 0
+
+    return prepared, {
+        "original_tokens": original_tokens,
+        "tokens": tokens,
+        "saved_tokens": max(0, original_tokens - tokens),
+        "sentences_kept": prepared.count("\n") + 1 if scored and prepared else None,
+        "sentences_total": len(scored) or None,
+    }
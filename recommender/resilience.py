@@ -0,0 +1,199 @@
+"""Client-side protection for Gemini calls: rate limiting, retries and a circuit breaker
+
+The token bucket is shared by every session in a process and, with a SQLite file,
+by every worker process on the host. ``RetryPolicy`` backs off exponentially with
+full jitter and honours server retry hints. ``CircuitBreaker`` stops calling a
+failing API for a cool-down so callers can fail fast or degrade to catalog-only
+results.
+"""
+import random
+import re
+import sqlite3
+import threading
+import time
+
+_RETRY_HINT_RES = [
+    re.compile(r"retry[ _-]?after\D{0,5}(\d+(?:\.\d+)?)", re.I),
+    re.compile(r"retry in (\d+(?:\.\d+)?)\s*s", re.I),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.I),
+]
+# HTTP statuses worth retrying: rate limited, or a transient server-side failure
+RETRYABLE_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+_RETRYABLE_NAMES = frozenset({
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+    "GatewayTimeout", "GenerationTimeout", "ConnectionError", "TimeoutError",
+})
+
+
+class BackpressureError(Exception):
+    """A call was refused client-side; callers should fail fast or degrade, not retry"""
+
+
+class RateLimitExceeded(BackpressureError):
+    """Raised when the shared request budget cannot admit a call before its deadline"""
+
+
+class CircuitOpenError(BackpressureError):
+    """Raised instead of calling the API while the circuit breaker is open"""
+
+
+def status_code(error):
+    """HTTP status of an API error, if it carries one"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        return code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error):
+    """Whether an error is transient (timeouts, 429, 5xx) rather than a bad request"""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS
+    return any(cls.__name__ in _RETRYABLE_NAMES for cls in type(error).__mro__)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait before retrying, or None"""
+    value = getattr(error, "retry_after", None)
+    if value is not None:
+        return float(value)
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    if headers.get("Retry-After", "").replace(".", "", 1).isdigit():
+        return float(headers["Retry-After"])
+    text = str(error)
+    for pattern in _RETRY_HINT_RES:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, capped, preferring the server's retry-after hint"""
+
+    def __init__(self, base=0.5, cap=20.0, max_attempts=3):
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+
+    def delay(self, attempt, error=None):
+        """Seconds to wait before retry number ``attempt`` (0-based)"""
+        hint = retry_after(error) if error is not None else None
+        if hint is not None:
+            return min(hint, self.cap)
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    def should_retry(self, attempt, error, max_attempts=None):
+        """Whether to retry after attempt number ``attempt`` (0-based) failed with ``error``"""
+        return attempt + 1 < (max_attempts or self.max_attempts) and is_retryable(error)
+
+
+class TokenBucket:
+    """Token bucket admitting ``rate_per_minute`` calls with bursts of up to ``burst``
+
+    ``reserve`` never blocks: it takes a token (possibly going into debt) and returns
+    how long the caller must wait, so sync and async callers can sleep their own way.
+    With ``path`` the bucket state lives in SQLite and is shared between processes.
+    """
+
+    def __init__(self, rate_per_minute, burst=10, path=None):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = None
+        if path and self.rate:
+            self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+            self._conn.execute("CREATE TABLE IF NOT EXISTS token_bucket (id INTEGER PRIMARY KEY, tokens REAL, updated REAL)")
+            self._conn.execute("INSERT OR IGNORE INTO token_bucket VALUES (1, ?, ?)", (float(burst), time.time()))
+
+    def _take(self, tokens, updated, now, max_wait):
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = max(0.0, (1.0 - tokens) / self.rate)
+        if max_wait is not None and wait > max_wait:
+            return tokens, None
+        return tokens - 1.0, wait
+
+    def reserve(self, max_wait=None):
+        """Take a token; return seconds to wait before using it, or None if that exceeds ``max_wait``"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            if self._conn is None:
+                now = time.monotonic()
+                self._tokens, wait = self._take(self._tokens, self._updated, now, max_wait)
+                self._updated = now
+                return wait
+            # BEGIN IMMEDIATE serializes the read-modify-write across processes
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                tokens, updated = self._conn.execute("SELECT tokens, updated FROM token_bucket WHERE id = 1").fetchone()
+                now = time.time()
+                tokens, wait = self._take(tokens, updated, now, max_wait)
+                self._conn.execute("UPDATE token_bucket SET tokens = ?, updated = ? WHERE id = 1", (tokens, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    def try_acquire(self):
+        """Take a token only if one is available right now"""
+        return self.reserve(max_wait=0.0) is not None
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``recovery_time``
+
+    While half-open a single probe call is let through; its outcome closes or
+    re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_time=30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.recovery_time:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """Whether a call may go ahead now"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self):
+        """End a probe that was neither a success nor an API failure (e.g. cancelled)"""
+        with self._lock:
+            self._probing = False
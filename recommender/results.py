@@ -0,0 +1,127 @@
+"""Compact, server-side storage of recommendation results
+
+Streamlit keeps ``st.session_state`` in memory for every connected session, so
+holding each session's parsed recommendations there grows with the number of
+recruiters. Results live once per process in a ``ResultStore`` instead.
+Recommendations that point at a catalog entry shrink to that entry's row number,
+the job description is stored zlib-compressed, and entries expire after a TTL.
+Sessions, and the page URL, keep only the short handle, so a rerun or a
+reconnect restores the result from it.
+"""
+import os
+import secrets
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from recommender.engine import RESULT_COLUMNS, normalize_recommendation
+
+RESULT_TTL = int(os.getenv("RESULT_TTL", str(4 * 3600)))
+RESULT_STORE_SIZE = int(os.getenv("RESULT_STORE_SIZE", "5000"))
+
+
+# Explicit __slots__ rather than dataclass(slots=True), which needs Python 3.10
+@dataclass(frozen=True)
+class CompactRecommendation:
+    """One recommendation: a catalog row, or its column values (catalog_id -1) when it is not in the catalog"""
+
+    __slots__ = ("catalog_id", "values")
+    catalog_id: int
+    values: tuple
+
+
+@dataclass(frozen=True)
+class StoredResult:
+    __slots__ = ("recommendations", "job_description", "created")
+    recommendations: tuple
+    job_description: bytes
+    created: float
+
+
+class CatalogRefs:
+    """URL -> catalog row lookup used to compact and expand recommendations"""
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog if catalog is not None else []
+        self.rows = {item["URL"].rstrip("/"): row for row, item in enumerate(self.catalog)}
+
+    def compact(self, rec):
+        url = rec.get("URL") if isinstance(rec, dict) else None
+        row = self.rows.get(url.rstrip("/")) if isinstance(url, str) else None
+        if row is not None:
+            return CompactRecommendation(row, ())
+        rec = normalize_recommendation(rec if isinstance(rec, dict) else {})
+        return CompactRecommendation(-1, tuple(
+            tuple(rec[col]) if col == "Test Type" else rec[col] for col in RESULT_COLUMNS
+        ))
+
+    def expand(self, compact):
+        if compact.catalog_id >= 0:
+            return dict(self.catalog[compact.catalog_id])
+        rec = dict(zip(RESULT_COLUMNS, compact.values))
+        rec["Test Type"] = list(rec["Test Type"])
+        return rec
+
+
+class ResultStore:
+    """Process-wide, TTL- and size-bounded map from short handles to compact results
+
+    Reading a result renews its TTL, so results stay available while a recruiter
+    keeps working with them; the least recently used entries go first when the
+    store is full.
+    """
+
+    def __init__(self, catalog=None, ttl=RESULT_TTL, max_items=RESULT_STORE_SIZE):
+        self.refs = CatalogRefs(catalog)
+        self.ttl = ttl
+        self.max_items = max_items
+        self._entries = OrderedDict()  # handle -> (expires, StoredResult)
+        self._lock = threading.Lock()
+
+    def put(self, recommendations, job_description=""):
+        """Store a result and return its handle"""
+        result = StoredResult(
+            tuple(self.refs.compact(rec) for rec in recommendations),
+            zlib.compress(job_description.encode("utf-8")),
+            time.time(),
+        )
+        handle = secrets.token_urlsafe(9)
+        now = time.monotonic()
+        with self._lock:
+            self._entries[handle] = (now + self.ttl, result)
+            self._evict(now)
+        return handle
+
+    def get(self, handle):
+        """``(recommendations, job_description)`` for a live handle, or None if unknown or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(handle)
+            if entry is None:
+                return None
+            if entry[0] < now:
+                del self._entries[handle]
+                return None
+            self._entries[handle] = (now + self.ttl, entry[1])
+            self._entries.move_to_end(handle)
+        result = entry[1]
+        return (
+            [self.refs.expand(rec) for rec in result.recommendations],
+            zlib.decompress(result.job_description).decode("utf-8"),
+        )
+
+    def discard(self, handle):
+        with self._lock:
+            self._entries.pop(handle, None)
+
+    def _evict(self, now):
+        while self._entries:
+            handle, (expires, _) = next(iter(self._entries.items()))
+            if expires >= now and len(self._entries) <= self.max_items:
+                break
+            del self._entries[handle]
+
+    def __len__(self):
+        return len(self._entries)
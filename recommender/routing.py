@@ -0,0 +1,117 @@
+"""Validation and bookkeeping for tiered model routing
+
+Requests go to the fast model first. Its answer is accepted only if enough items
+pass the schema check and point at catalog URLs; otherwise the request escalates
+to the primary model. ``RoutingStats`` keeps per-tier latency and the escalation
+rate, and every decision is logged on the ``recommender.routing`` logger.
+"""
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("recommender.routing")
+
+REQUIRED_FIELDS = ("Assessment Name", "URL", "Remote Testing Support", "Adaptive/IRT Support", "Duration", "Test Type")
+SHL_URL_PREFIX = "https://www.shl.com/"
+MIN_VALID = 3
+MIN_VALID_RATIO = 0.8
+
+
+def validate_recommendations(recommendations, allowed_urls=None):
+    """Split model output into valid items and rejection reasons
+
+    An item is valid if it has every required field, yes/no flags, and an SHL URL
+    that is in ``allowed_urls`` when that set is given.
+    """
+    valid = []
+    reasons = []
+    for rec in recommendations:
+        if not isinstance(rec, dict):
+            reasons.append("item is not an object")
+            continue
+        missing = [field for field in REQUIRED_FIELDS if field not in rec]
+        if missing:
+            reasons.append(f"missing {', '.join(missing)}")
+            continue
+        if rec["Remote Testing Support"] not in ("Yes", "No") or rec["Adaptive/IRT Support"] not in ("Yes", "No"):
+            reasons.append(f"bad yes/no flag on {rec['Assessment Name']!r}")
+            continue
+        url = rec["URL"]
+        if not isinstance(url, str) or not url.startswith(SHL_URL_PREFIX):
+            reasons.append(f"non-SHL URL {url!r}")
+            continue
+        if allowed_urls and url.rstrip("/") not in allowed_urls:
+            reasons.append(f"URL not in catalog {url!r}")
+            continue
+        valid.append(rec)
+    return valid, reasons
+
+
+def is_confident(valid, total, expected):
+    """Whether a fast-tier answer is good enough to skip escalation"""
+    return bool(valid) and len(valid) >= min(MIN_VALID, expected) and len(valid) >= MIN_VALID_RATIO * total
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class RoutingStats:
+    """Per-tier call latency, end-to-end latency and escalation counters"""
+
+    def __init__(self, window=500):
+        self.requests = 0
+        self.fast_accepted = 0
+        self.escalated = 0
+        self._tiers = {}
+        self._calls = {}
+        self._totals = deque(maxlen=window)
+        self._window = window
+        self._lock = threading.Lock()
+
+    def record_call(self, tier, model, seconds, accepted, reasons=()):
+        """Record one model call and log the routing decision"""
+        reasons = list(dict.fromkeys(reasons))
+        with self._lock:
+            self._tiers.setdefault(tier, deque(maxlen=self._window)).append(seconds)
+            self._calls[tier] = self._calls.get(tier, 0) + 1
+            if tier == "fast":
+                if accepted:
+                    self.fast_accepted += 1
+                else:
+                    self.escalated += 1
+        logger.info(
+            "route tier=%s model=%s latency_ms=%.0f decision=%s%s",
+            tier, model, seconds * 1000,
+            "accept" if accepted else ("escalate" if tier == "fast" else "fail"),
+            f" reasons={'; '.join(reasons[:3])}" if reasons and not accepted else "",
+        )
+
+    def record_request(self, seconds):
+        """Record the end-to-end latency of one routed request"""
+        with self._lock:
+            self.requests += 1
+            self._totals.append(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            decided = self.fast_accepted + self.escalated
+            return {
+                "requests": self.requests,
+                "fast_accepted": self.fast_accepted,
+                "escalated": self.escalated,
+                "escalation_rate": self.escalated / decided if decided else 0.0,
+                "p50_ms": round(_percentile(self._totals, 50) * 1000, 1),
+                "p95_ms": round(_percentile(self._totals, 95) * 1000, 1),
+                "tiers": {
+                    tier: {
+                        "calls": self._calls[tier],
+                        "p50_ms": round(_percentile(latencies, 50) * 1000, 1),
+                        "p95_ms": round(_percentile(latencies, 95) * 1000, 1),
+                    }
+                    for tier, latencies in self._tiers.items()
+                },
+            }
@@ -0,0 +1,175 @@
+"""Versioned, memory-mappable columnar snapshot of the assessment catalog
+
+Layout of a snapshot directory::
+
+    <root>/CURRENT             name of the active version, switched atomically
+    <root>/v0003/manifest.json counts, column names, test-type vocabulary, content hash
+    <root>/v0003/<column>.npy  fixed-width columns (duration, flags, test-type bitmask)
+    <root>/v0003/<column>.blob.npy, <column>.offsets.npy
+                               UTF-8 string columns as one byte blob plus offsets
+
+Every ``.npy`` file is opened with ``mmap_mode="r"``, so opening a snapshot reads
+only the small manifest; rows are decoded on access.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from recommender.engine import as_list, duration_minutes
+
+FORMAT_VERSION = 1
+STRING_COLUMNS = ("Assessment Name", "URL", "Description")
+_FILE_NAMES = {"Assessment Name": "name", "URL": "url", "Description": "description"}
+
+
+def _write_strings(directory, name, values):
+    encoded = [str(v or "").encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    np.save(os.path.join(directory, f"{name}.blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+def write_snapshot(records, root, keep=3):
+    """Write records (dicts in the recommendation schema) as a new snapshot version
+
+    Returns the path of the new version directory, or of the current one if the
+    records are unchanged.
+    """
+    records = list(records)
+    content = json.dumps(records, sort_keys=True).encode("utf-8")
+    content_hash = hashlib.sha1(content).hexdigest()[:16]
+    current = open_snapshot(root)
+    if current is not None and current.catalog_version == content_hash:
+        return current.directory  # Nothing changed since the last crawl
+
+    os.makedirs(root, exist_ok=True)
+    existing = sorted(d for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit())
+    version = f"v{int(existing[-1][1:]) + 1 if existing else 1:04d}"
+    directory = os.path.join(root, version)
+    tmp_dir = directory + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for column in STRING_COLUMNS:
+        _write_strings(tmp_dir, _FILE_NAMES[column], [r.get(column) for r in records])
+
+    test_types = sorted({t for r in records for t in as_list(r.get("Test Type"))})
+    bit = {t: i for i, t in enumerate(test_types)}
+    words = max(1, (len(test_types) + 63) // 64)
+    type_mask = np.zeros((len(records), words), dtype=np.uint64)
+    for row, r in enumerate(records):
+        for t in as_list(r.get("Test Type")):
+            type_mask[row, bit[t] // 64] |= np.uint64(1) << np.uint64(bit[t] % 64)
+
+    durations = [duration_minutes(r.get("Duration")) for r in records]
+    np.save(os.path.join(tmp_dir, "duration.npy"), np.array([-1 if d is None else d for d in durations], dtype=np.int32))
+    np.save(os.path.join(tmp_dir, "remote.npy"), np.array([r.get("Remote Testing Support") == "Yes" for r in records]))
+    np.save(os.path.join(tmp_dir, "adaptive.npy"), np.array([r.get("Adaptive/IRT Support") == "Yes" for r in records]))
+    np.save(os.path.join(tmp_dir, "test_type_mask.npy"), type_mask)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "version": version,
+        "created": time.time(),
+        "count": len(records),
+        "test_types": test_types,
+        "catalog_version": content_hash,
+    }
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_dir, directory)
+
+    # Switch readers over atomically, then prune old versions
+    pointer = os.path.join(root, "CURRENT")
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(pointer + ".tmp", pointer)
+    for old in existing[:max(0, len(existing) + 1 - keep)]:
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return directory
+
+
+class CatalogSnapshot:
+    """Read-only, lazily decoded view over a snapshot version
+
+    Behaves like a list of catalog dicts (``len``, indexing, iteration), so it can be
+    used anywhere the JSON catalog is.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported catalog snapshot format {self.manifest['format_version']}")
+        self.catalog_version = self.manifest["catalog_version"]
+        self.test_types = self.manifest["test_types"]
+        self._columns = {}
+
+    def _load(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            column = np.load(os.path.join(self.directory, f"{name}.npy"), mmap_mode="r")
+            self._columns[name] = column
+        return column
+
+    def _string(self, column, row):
+        name = _FILE_NAMES[column]
+        offsets = self._load(f"{name}.offsets")
+        return bytes(self._load(f"{name}.blob")[offsets[row]:offsets[row + 1]]).decode("utf-8")
+
+    @property
+    def duration(self):
+        return self._load("duration")
+
+    @property
+    def remote(self):
+        return self._load("remote")
+
+    @property
+    def adaptive(self):
+        return self._load("adaptive")
+
+    @property
+    def test_type_mask(self):
+        return self._load("test_type_mask")
+
+    def __len__(self):
+        return self.manifest["count"]
+
+    def __getitem__(self, row):
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(row)
+        mask = self.test_type_mask[row]
+        test_types = [t for i, t in enumerate(self.test_types) if int(mask[i // 64]) >> (i % 64) & 1]
+        duration = int(self.duration[row])
+        return {
+            "Assessment Name": self._string("Assessment Name", row),
+            "URL": self._string("URL", row),
+            "Remote Testing Support": "Yes" if self.remote[row] else "No",
+            "Adaptive/IRT Support": "Yes" if self.adaptive[row] else "No",
+            "Duration": f"{duration} minutes" if duration >= 0 else "N/A",
+            "Test Type": test_types,
+            "Description": self._string("Description", row),
+        }
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield self[row]
+
+
+def open_snapshot(root):
+    """Open the active snapshot version under root, or None if there is none"""
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            version = f.read().strip()
+        return CatalogSnapshot(os.path.join(root, version))
+    except (OSError, ValueError, KeyError):
+        return None
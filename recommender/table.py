@@ -0,0 +1,128 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from recommender.engine import FALLBACK_URL, RESULT_COLUMNS, as_list
+
+SORT_OPTIONS = ("Relevance", "Shortest first", "Longest first", "Name (A-Z)")
+# Descriptions are the bulk of a row; pages leave them out and load them one row at a time
+SUMMARY_COLUMNS = [col for col in RESULT_COLUMNS if col != "Description"]
+EXPORT_CHUNK_ROWS = 1000
+
+
+class RecommendationTable:
+    """Recommendations parsed once into columns the sidebar filters can use directly
+
+    Alongside the display columns, the table holds numeric duration minutes, boolean
+    remote/adaptive flags and a multi-hot test-type bitmask (one uint64 word per 64
+    test types), so each filter is a vectorized mask instead of a Python loop.
+
+    Filtering and sorting produce arrays of row numbers; only the page being shown
+    is turned into a DataFrame, and exports are written in chunks of rows.
+    """
+
+    def __init__(self, recommendations):
+        df = pd.DataFrame.from_records(list(recommendations))
+        for col in RESULT_COLUMNS:
+            if col not in df.columns:
+                df[col] = "N/A"
+        df = df[RESULT_COLUMNS].reset_index(drop=True)
+
+        # Fix and validate URLs
+        urls = df["URL"]
+        valid_url = urls.map(lambda url: isinstance(url, str)) & urls.astype(str).str.startswith("http")
+        df["URL"] = urls.where(valid_url, FALLBACK_URL)
+
+        # Format test types for better display
+        df["Test Type"] = [as_list(value) or ["General"] for value in df["Test Type"]]
+
+        self.df = df
+        self.duration = pd.to_numeric(
+            df["Duration"].astype(str).str.extract(r'(\d+)', expand=False), errors="coerce"
+        ).to_numpy(dtype=float)
+        self.remote = (df["Remote Testing Support"] == "Yes").to_numpy()
+        self.not_remote = (df["Remote Testing Support"] == "No").to_numpy()
+        self.adaptive = (df["Adaptive/IRT Support"] == "Yes").to_numpy()
+        self.not_adaptive = (df["Adaptive/IRT Support"] == "No").to_numpy()
+
+        self.test_types = sorted({t for types in df["Test Type"] for t in types})
+        self._type_bit = {t: i for i, t in enumerate(self.test_types)}
+        words = max(1, (len(self.test_types) + 63) // 64)
+        self.type_mask = np.zeros((len(df), words), dtype=np.uint64)
+        for row, types in enumerate(df["Test Type"]):
+            for t in types:
+                bit = self._type_bit[t]
+                self.type_mask[row, bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        self._orders = {}
+
+    def __len__(self):
+        return len(self.df)
+
+    def _types_query(self, selected_types):
+        query = np.zeros(self.type_mask.shape[1], dtype=np.uint64)
+        for t in selected_types:
+            bit = self._type_bit.get(t)
+            if bit is not None:
+                query[bit // 64] |= np.uint64(1) << np.uint64(bit % 64)
+        return query
+
+    def mask(self, selected_types=(), max_duration=None, remote_filter="All", adaptive_filter="All"):
+        """Boolean row mask for the sidebar filters"""
+        keep = np.ones(len(self.df), dtype=bool)
+        if selected_types:
+            keep &= (self.type_mask & self._types_query(selected_types)).any(axis=1)
+        if max_duration is not None:
+            # NaN durations compare False, matching the old behaviour of dropping them
+            keep &= self.duration <= max_duration
+        if remote_filter != "All":
+            keep &= self.remote if remote_filter == "Yes" else self.not_remote
+        if adaptive_filter != "All":
+            keep &= self.adaptive if adaptive_filter == "Yes" else self.not_adaptive
+        return keep
+
+    def order(self, sort="Relevance"):
+        """Row numbers in the order of a sort option, computed once per table"""
+        order = self._orders.get(sort)
+        if order is None:
+            if sort == "Shortest first":
+                order = np.argsort(np.nan_to_num(self.duration, nan=np.inf), kind="stable")
+            elif sort == "Longest first":
+                order = np.argsort(-np.nan_to_num(self.duration, nan=-np.inf), kind="stable")
+            elif sort == "Name (A-Z)":
+                order = np.argsort(self.df["Assessment Name"].astype(str).str.lower().to_numpy(), kind="stable")
+            else:
+                order = np.arange(len(self.df))  # The recommender's ranking
+            self._orders[sort] = order
+        return order
+
+    def rows(self, sort="Relevance", **filters):
+        """Row numbers matching the filters, in sort order"""
+        order = self.order(sort)
+        return order[self.mask(**filters)[order]]
+
+    def page(self, rows, page, page_size, columns=SUMMARY_COLUMNS):
+        """Display DataFrame for one page (1-based) of ``rows``"""
+        start = (page - 1) * page_size
+        return self.df.iloc[rows[start:start + page_size]][columns]
+
+    def record(self, row):
+        """Every column of one row, for a details view"""
+        return self.df.iloc[int(row)].to_dict()
+
+    def iter_csv(self, rows, chunk_rows=EXPORT_CHUNK_ROWS):
+        """CSV text of ``rows`` in chunks, so an export never builds one DataFrame of every row"""
+        if not len(rows):
+            yield ",".join(RESULT_COLUMNS) + "\n"
+        for start in range(0, len(rows), chunk_rows):
+            chunk = self.df.iloc[rows[start:start + chunk_rows]].copy()
+            chunk["Test Type"] = chunk["Test Type"].map(", ".join)
+            yield chunk.to_csv(index=False, header=start == 0)
+
+    def iter_json(self, rows, chunk_rows=EXPORT_CHUNK_ROWS):
+        """A JSON array of ``rows`` in chunks"""
+        yield "["
+        for start in range(0, len(rows), chunk_rows):
+            records = self.df.iloc[rows[start:start + chunk_rows]].to_dict("records")
+            yield ("," if start else "") + ",".join(json.dumps(record, ensure_ascii=False) for record in records)
+        yield "]"
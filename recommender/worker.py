@@ -0,0 +1,162 @@
+"""Recommendation workers consuming the shared job queue
+
+Run as many as the model quota and the hardware allow, on one host (SQLite
+queue) or several (Redis-compatible queue)::
+
+    JOB_QUEUE_URL=sqlite:///data/jobs.db python -m recommender.worker --processes 4 --concurrency 4
+
+Each process holds one long-lived ``Recommender``; its threads claim jobs, run
+the full pipeline (precomputed answers, cache, routing, catalog fallback) and
+store the result for the submitter to pick up.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+
+from recommender.cache import cache_key
+from recommender.engine import PROMPT_VERSION, RecommendationError
+from recommender.jobqueue import open_queue
+
+logger = logging.getLogger("recommender.worker")
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "4"))
+
+
+def submit_recommendation(queue, job_description, mode="rerank"):
+    """Queue a recommendation job; identical pending or recent jobs are shared"""
+    dedup_key = cache_key(job_description, PROMPT_VERSION, mode)
+    return queue.submit({"job_description": job_description, "mode": mode}, dedup_key=dedup_key)
+
+
+def keep_leased(queue, job_id, worker, done):
+    """Renew a job's lease every third of the lease period until ``done`` is set or the lease is lost"""
+    while not done.wait(queue.lease / 3):
+        try:
+            if not queue.renew(job_id, worker):
+                logger.warning("job %s: lease lost, another worker may run it", job_id)
+                return
+        except Exception:
+            logger.exception("job %s: renewing the lease failed", job_id)
+
+
+def process_job(recommender, queue, job, worker=None):
+    """Run one claimed job and record its outcome, renewing the lease of ``worker`` while it runs"""
+    payload = job["payload"]
+    done = threading.Event()
+    if worker is not None:
+        threading.Thread(
+            target=keep_leased, args=(queue, job["id"], worker, done), name=f"lease-{job['id'][:8]}", daemon=True
+        ).start()
+    try:
+        recommendations = recommender.recommend(payload["job_description"], payload.get("mode", "rerank"))
+    except RecommendationError as e:
+        # Already retried inside the pipeline; the message is user-facing
+        recorded = queue.fail(job["id"], e, worker=worker)
+    except Exception as e:
+        logger.exception("job %s failed", job["id"])
+        recorded = queue.fail(job["id"], f"Unexpected error: {e}", retry=True, worker=worker)
+    else:
+        recorded = queue.complete(job["id"], recommendations, worker=worker)
+    finally:
+        done.set()
+    if not recorded:
+        logger.warning("job %s: lease lost before the outcome was stored; another worker owns it now", job["id"])
+
+
+class WorkerPool:
+    """Threads claiming and processing jobs for one recommender"""
+
+    def __init__(self, queue, recommender, concurrency=WORKER_CONCURRENCY, name=None):
+        self.queue = queue
+        self.recommender = recommender
+        self.concurrency = concurrency
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._processed = 0
+        self._processed_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _run(self, worker):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.claim(worker, timeout=1.0)
+            except Exception:
+                logger.exception("claiming a job failed")
+                self._stop.wait(1.0)
+                continue
+            if job is not None:
+                process_job(self.recommender, self.queue, job, worker)
+                with self._processed_lock:
+                    self._processed += 1
+
+    @property
+    def processed(self):
+        """Jobs this pool has finished, over all its threads"""
+        with self._processed_lock:
+            return self._processed
+
+    def start(self):
+        for i in range(self.concurrency):
+            thread = threading.Thread(target=self._run, args=(f"{self.name}/{i}",), name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def join(self):
+        for thread in self._threads:
+            thread.join()
+
+
+def run_worker(queue_url, concurrency):
+    """Entry point of one worker process"""
+    from dotenv import load_dotenv
+
+    from recommender.engine import Recommender
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(processName)s %(message)s")
+    load_dotenv()
+    pool = WorkerPool(open_queue(queue_url), Recommender.from_env(), concurrency).start()
+    logger.info("worker %s consuming %s with %d threads", pool.name, queue_url, concurrency)
+    try:
+        pool.join()
+    except KeyboardInterrupt:
+        pool.stop(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run recommendation workers for the shared job queue")
+    parser.add_argument("--queue", default=os.getenv("JOB_QUEUE_URL"), help="sqlite:///path or redis:// URL")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes (one Recommender each)")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs in flight per process")
+    args = parser.parse_args(argv)
+    if not args.queue:
+        parser.error("set --queue or JOB_QUEUE_URL")
+
+    if args.processes == 1:
+        run_worker(args.queue, args.concurrency)
+        return
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(args.queue, args.concurrency), name=f"worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+if __name__ == "__main__":
+    main()
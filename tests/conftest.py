@@ -0,0 +1,75 @@
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# The repo has no package metadata; make ``recommender`` importable when pytest is run from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class Site:
+    """Local HTTP stand-in: serves ``pages`` by path, honours ETag/Last-Modified validators and logs requests"""
+
+    def __init__(self):
+        self.pages = {}  # path, with or without its query -> (body bytes, {header: value})
+        self.requests = []  # (method, path, request headers, status)
+        self._server = None
+
+    def add(self, path, body, content_type="text/html; charset=utf-8", **headers):
+        self.pages[path] = (body.encode("utf-8") if isinstance(body, str) else body,
+                            {"Content-Type": content_type, **headers})
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self._server.server_port}{path}"
+
+    def statuses(self, path):
+        return [status for _, requested, _, status in self.requests if requested == path]
+
+    def start(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                page = site.pages.get(self.path) or site.pages.get(self.path.split("?", 1)[0])
+                if page is None:
+                    status, body, headers = 404, b"not found", {"Content-Type": "text/plain"}
+                else:
+                    body, headers = page
+                    etag = headers.get("ETag")
+                    last_modified = headers.get("Last-Modified")
+                    not_modified = (
+                        (etag is not None and self.headers.get("If-None-Match") == etag)
+                        or (etag is None and last_modified is not None
+                            and self.headers.get("If-Modified-Since") == last_modified)
+                    )
+                    status = 304 if not_modified else 200
+                site.requests.append(("GET", self.path, dict(self.headers), status))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if status == 304:
+                    self.end_headers()
+                    return
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def site():
+    site = Site().start()
+    yield site
+    site.stop()
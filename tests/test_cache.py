@@ -0,0 +1,55 @@
+import json
+
+from recommender.cache import RecommendationCache
+from test_resilience import FakeModel, recommender_for
+
+ITEM = {
+    "Assessment Name": "Verify Numerical Ability", "URL": "https://www.shl.com/view/verify-numerical-ability/",
+    "Remote Testing Support": "Yes", "Adaptive/IRT Support": "Yes", "Duration": "20 minutes",
+    "Test Type": ["Ability & Aptitude"], "Description": "Numerical reasoning.",
+}
+QUERY = "Data analyst with strong SQL and numerical reasoning skills"
+
+
+class FakeIndex:
+    def __init__(self, version):
+        self.version = version
+
+
+def recommender_with(cache, model_name="fake"):
+    model = FakeModel(json.dumps([ITEM]))
+    recommender = recommender_for(model)
+    recommender.model_name = model_name
+    recommender.cache = cache
+    return recommender, model
+
+
+def test_cached_answer_is_reused_for_the_same_model():
+    cache = RecommendationCache("1")
+    recommender_with(cache)[0].recommend(QUERY)
+    recommender, model = recommender_with(cache)
+
+    assert recommender.recommend(QUERY) == [ITEM]
+    assert model.calls == 0
+
+
+def test_another_model_misses_the_cache():
+    cache = RecommendationCache("1")
+    recommender_with(cache)[0].recommend(QUERY)
+    recommender, model = recommender_with(cache, model_name="other")
+
+    assert recommender.recommend(QUERY) == [ITEM]
+    assert model.calls == 1
+
+
+def test_cache_namespace_follows_the_catalog_snapshot_and_models():
+    recommender, _ = recommender_with(RecommendationCache("1"))
+    recommender.catalog_index = FakeIndex("v1")
+    before = recommender.cache_namespace("rerank")
+
+    recommender.catalog_index = FakeIndex("v2")
+    assert recommender.cache_namespace("rerank") != before
+    recommender.catalog_index = FakeIndex("v1")
+    recommender.fast_model_name = "flash"
+    assert recommender.cache_namespace("rerank") != before
+    assert recommender.cache_namespace("open") != recommender.cache_namespace("rerank")
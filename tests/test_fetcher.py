@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+from recommender import fetcher as fetcher_module
+from recommender.fetcher import FetchError, PageFetcher, check_public_url, html_to_text
+from recommender.preprocess import clean_lines, prepare_query
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def test_html_to_text_keeps_one_block_per_line():
+    text = html_to_text(read_fixture("job_posting.html"), backend="html.parser")
+
+    lines = text.splitlines()
+    assert "Senior Data Analyst" in lines
+    assert "5+ years of experience with SQL and Python." in lines
+    # Whitespace inside a block is collapsed, but blocks stay on their own lines
+    assert "You will turn product and sales data into decisions for the commercial team." in lines
+    assert all(line == line.strip() and "  " not in line and "\t" not in line for line in lines)
+    assert "dataLayer" not in text
+
+
+def test_scraped_page_boilerplate_and_repeats_are_removed():
+    text = html_to_text(read_fixture("job_posting.html"), backend="html.parser")
+
+    lines = clean_lines(text)
+    assert lines.count("Apply now") == 0
+    for boilerplate in ("Sign in", "Privacy policy", "Skip to main content", "Similar jobs", "Back to search"):
+        assert boilerplate not in lines
+    assert not any("All rights reserved" in line or "cookies" in line for line in lines)
+    assert "Strong numerical reasoning and attention to detail." in lines
+
+    prepared, stats = prepare_query(text)
+    assert "Sign in" not in prepared
+    assert "Able to present findings to senior stakeholders." in prepared
+    assert stats["saved_tokens"] > 0
+
+
+def test_requirement_bullets_mentioning_web_terms_are_kept():
+    text = "\n".join([
+        "Log in",
+        "Frontend Engineer",
+        "Requirements",
+        "- 3+ years building UIs with JavaScript/React",
+        "- Deep knowledge of browser APIs and performance tooling",
+        "- Built sign up and log in flows for consumer products",
+        "- Able to arrange reasonable accommodation for on-call cover",
+        "Sign up",
+        "© 2024 Contoso. All rights reserved.",
+    ])
+
+    lines = clean_lines(text)
+    assert lines == [
+        "Frontend Engineer",
+        "Requirements",
+        "- 3+ years building UIs with JavaScript/React",
+        "- Deep knowledge of browser APIs and performance tooling",
+        "- Built sign up and log in flows for consumer products",
+        "- Able to arrange reasonable accommodation for on-call cover",
+    ]
+
+
+def cached_fetcher(tmp_path, max_age=0):
+    return PageFetcher(cache_dir=str(tmp_path / "pages"), max_age=max_age, timeout=5)
+
+
+def test_etag_revalidation_serves_cached_body_on_304(site, tmp_path):
+    site.add("/jobs/1", "<main><p>Data analyst</p></main>", ETag='"v1"')
+    fetcher = cached_fetcher(tmp_path)
+
+    first, _ = fetcher.fetch(site.url("/jobs/1"))
+    meta, _ = fetcher.cache.get(site.url("/jobs/1"))
+    fetched_at = meta["fetched_at"]
+    second, encoding = fetcher.fetch(site.url("/jobs/1"))
+
+    assert first == second == b"<main><p>Data analyst</p></main>"
+    assert encoding == "utf-8"
+    assert site.statuses("/jobs/1") == [200, 304]
+    assert site.requests[1][2]["If-None-Match"] == '"v1"'
+    # A 304 counts as a fresh fetch
+    assert fetcher.cache.get(site.url("/jobs/1"))[0]["fetched_at"] >= fetched_at
+
+
+def test_last_modified_revalidation(site, tmp_path):
+    stamp = "Wed, 01 May 2024 10:00:00 GMT"
+    site.add("/jobs/2", "<main><p>Engineer</p></main>", **{"Last-Modified": stamp})
+    fetcher = cached_fetcher(tmp_path)
+
+    fetcher.fetch(site.url("/jobs/2"))
+    body, _ = fetcher.fetch(site.url("/jobs/2"))
+
+    assert body == b"<main><p>Engineer</p></main>"
+    assert site.statuses("/jobs/2") == [200, 304]
+    assert site.requests[1][2]["If-Modified-Since"] == stamp
+
+
+def test_changed_page_replaces_cached_copy(site, tmp_path):
+    site.add("/jobs/3", "<main><p>Old posting</p></main>", ETag='"v1"')
+    fetcher = cached_fetcher(tmp_path)
+    fetcher.fetch(site.url("/jobs/3"))
+
+    site.add("/jobs/3", "<main><p>New posting</p></main>", ETag='"v2"')
+    body, _ = fetcher.fetch(site.url("/jobs/3"))
+
+    assert body == b"<main><p>New posting</p></main>"
+    assert site.statuses("/jobs/3") == [200, 200]
+    assert fetcher.cache.get(site.url("/jobs/3"))[0]["etag"] == '"v2"'
+
+
+def test_fresh_page_is_served_without_a_request(site, tmp_path):
+    site.add("/jobs/4", "<main><p>Analyst</p></main>", ETag='"v1"')
+    fetcher = cached_fetcher(tmp_path, max_age=3600)
+
+    fetcher.fetch(site.url("/jobs/4"))
+    body, _ = fetcher.fetch(site.url("/jobs/4"))
+
+    assert body == b"<main><p>Analyst</p></main>"
+    assert site.statuses("/jobs/4") == [200]
+
+
+def test_uncached_fetcher_sends_no_validators(site):
+    site.add("/jobs/5", "<main><p>Analyst</p></main>", ETag='"v1"')
+    fetcher = PageFetcher(timeout=5)
+
+    fetcher.fetch(site.url("/jobs/5"))
+    fetcher.fetch(site.url("/jobs/5"))
+
+    assert site.statuses("/jobs/5") == [200, 200]
+    assert "If-None-Match" not in site.requests[1][2]
+
+
+def test_http_errors_raise_fetch_error(site, tmp_path):
+    with pytest.raises(FetchError):
+        cached_fetcher(tmp_path).fetch(site.url("/missing"))
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1/admin", "http://localhost:8080/", "http://169.254.169.254/latest/meta-data/",
+    "http://10.0.0.5/", "http://[::1]/", "http://[::ffff:192.168.1.1]/", "file:///etc/passwd",
+])
+def test_non_public_urls_are_refused(url):
+    with pytest.raises(FetchError):
+        check_public_url(url)
+
+
+def test_public_only_fetcher_never_contacts_a_local_host(site):
+    site.add("/jobs/6", "<main><p>Analyst</p></main>")
+    with pytest.raises(FetchError):
+        PageFetcher(timeout=5, public_only=True).extract(site.url("/jobs/6"))
+    assert site.statuses("/jobs/6") == []
+
+
+def test_extracted_text_is_capped(site, monkeypatch):
+    monkeypatch.setattr(fetcher_module, "MAX_JOB_DESCRIPTION_CHARS", 40)
+    site.add("/jobs/7", "<main><p>" + "Data analyst with SQL. " * 50 + "</p></main>")
+
+    text = PageFetcher(timeout=5).extract(site.url("/jobs/7"))
+    assert text == ("Data analyst with SQL. " * 2)[:40]
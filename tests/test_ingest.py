@@ -0,0 +1,108 @@
+import os
+
+from recommender.ingest import CatalogCrawler, parse_detail, parse_listing
+from recommender.snapshot import open_snapshot
+
+CATALOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "catalog")
+DETAIL = "/solutions/products/product-catalog/view/{}/"
+PRODUCTS = ("account-manager-solution", "verify-numerical-ability", "python-new")
+
+
+def read_fixture(name):
+    with open(os.path.join(CATALOG, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def serve_catalog(site):
+    site.add("/catalog/", read_fixture("listing_page_1.html"), ETag='"listing-1"')
+    site.add("/catalog/?start=12&type=1", read_fixture("listing_page_2.html"), ETag='"listing-2"')
+    for slug in PRODUCTS:
+        site.add(DETAIL.format(slug), read_fixture(f"{slug}.html"), ETag=f'"{slug}-v1"')
+
+
+def crawler(tmp_path):
+    return CatalogCrawler(out_dir=str(tmp_path / "snapshot"), concurrency=3, delay=0, respect_robots=False)
+
+
+def records_by_name(path):
+    snapshot = open_snapshot(os.path.dirname(path))
+    return {record["Assessment Name"]: record for record in snapshot}
+
+
+def test_parse_listing_reads_rows_flags_and_next_page():
+    base = "https://www.shl.com/solutions/products/product-catalog/"
+    records, next_url = parse_listing(read_fixture("listing_page_1.html"), base)
+
+    assert [r["Assessment Name"] for r in records] == ["Account Manager Solution", "Verify - Numerical Ability"]
+    manager, verify = records
+    assert manager["URL"] == "https://www.shl.com/solutions/products/product-catalog/view/account-manager-solution/"
+    assert manager["Remote Testing Support"] == "Yes"
+    assert manager["Adaptive/IRT Support"] == "No"
+    assert manager["Test Type"] == ["Competencies", "Personality & Behavior", "Ability & Aptitude"]
+    assert verify["Adaptive/IRT Support"] == "Yes"
+    assert next_url == "https://www.shl.com/catalog/?start=12&type=1"
+
+
+def test_parse_listing_last_page_has_no_next():
+    _, next_url = parse_listing(read_fixture("listing_page_2.html"), "https://www.shl.com/catalog/?start=12&type=1")
+    assert next_url is None
+
+
+def test_parse_detail_reads_description_and_duration():
+    detail = parse_detail(read_fixture("account-manager-solution.html"))
+    assert detail["Duration"] == "49 minutes"
+    assert detail["Description"].startswith("The Account Manager solution is an assessment")
+
+
+def test_parse_detail_falls_back_to_meta_description_and_unknown_duration():
+    assert parse_detail(read_fixture("verify-numerical-ability.html")) == {
+        "Duration": "18 minutes",
+        "Description": "Verify Numerical Ability measures numerical reasoning.",
+    }
+    assert parse_detail(read_fixture("python-new.html"))["Duration"] == "N/A"
+
+
+def test_crawl_follows_pagination_and_writes_snapshot(site, tmp_path):
+    serve_catalog(site)
+    catalog_crawler = crawler(tmp_path)
+
+    records = records_by_name(catalog_crawler.crawl(site.url("/catalog/")))
+
+    assert sorted(records) == ["Account Manager Solution", "Python (New)", "Verify - Numerical Ability"]
+    assert records["Python (New)"]["Test Type"] == ["Knowledge & Skills"]
+    assert records["Verify - Numerical Ability"]["Duration"] == "18 minutes"
+    assert catalog_crawler.stats == {
+        "listing_pages": 2, "detail_fetched": 3, "detail_changed": 3, "detail_reused": 0, "errors": 0,
+    }
+
+
+def test_recrawl_revalidates_and_reparses_only_changed_pages(site, tmp_path):
+    serve_catalog(site)
+    first = crawler(tmp_path).crawl(site.url("/catalog/"))
+
+    unchanged = crawler(tmp_path)
+    assert unchanged.crawl(site.url("/catalog/")) == first  # Same content, no new snapshot version
+    assert unchanged.stats["detail_reused"] == 3 and unchanged.stats["detail_changed"] == 0
+    for slug in PRODUCTS:
+        assert site.statuses(DETAIL.format(slug)) == [200, 304]
+
+    page = read_fixture("python-new.html").replace("Multi-choice test", "Adaptive test")
+    site.add(DETAIL.format("python-new"), page, ETag='"python-new-v2"')
+    changed = crawler(tmp_path)
+    path = changed.crawl(site.url("/catalog/"))
+
+    assert path != first
+    assert changed.stats["detail_changed"] == 1 and changed.stats["detail_reused"] == 2
+    assert records_by_name(path)["Python (New)"]["Description"].startswith("Adaptive test")
+
+
+def test_recrawl_keeps_last_good_record_when_a_page_fails(site, tmp_path):
+    serve_catalog(site)
+    crawler(tmp_path).crawl(site.url("/catalog/"))
+
+    del site.pages[DETAIL.format("python-new")]
+    failing = crawler(tmp_path)
+    records = records_by_name(failing.crawl(site.url("/catalog/")))
+
+    assert failing.stats["errors"] == 1
+    assert records["Python (New)"]["Description"].startswith("Multi-choice test")
@@ -0,0 +1,93 @@
+import time
+
+from recommender.jobqueue import DONE, FAILED, QUEUED, RUNNING, SQLiteJobQueue
+from recommender.worker import process_job, submit_recommendation
+
+
+def open_queue(tmp_path, lease=60.0, max_attempts=3):
+    return SQLiteJobQueue(str(tmp_path / "jobs.db"), lease=lease, max_attempts=max_attempts)
+
+
+def test_claim_takes_the_oldest_queued_job(tmp_path):
+    queue = open_queue(tmp_path)
+    first = queue.submit({"n": 1})
+    second = queue.submit({"n": 2})
+
+    job = queue.claim("w1", timeout=0)
+    assert job["id"] == first and job["status"] == RUNNING and job["attempts"] == 1
+    assert queue.claim("w2", timeout=0)["id"] == second
+    assert queue.claim("w3", timeout=0) is None
+
+
+def test_identical_jobs_are_shared_while_live(tmp_path):
+    queue = open_queue(tmp_path)
+    job_id = queue.submit({"n": 1}, dedup_key="same")
+    assert queue.submit({"n": 1}, dedup_key="same") == job_id
+    assert queue.submit({"n": 1}, dedup_key="other") != job_id
+
+
+def test_expired_lease_lets_another_worker_reclaim_the_job(tmp_path):
+    queue = open_queue(tmp_path, lease=0.05)
+    job_id = queue.submit({"n": 1})
+    queue.claim("w1", timeout=0)
+    assert queue.claim("w2", timeout=0) is None  # Still leased to w1
+
+    time.sleep(0.1)
+    job = queue.claim("w2", timeout=0)
+    assert job["id"] == job_id and job["attempts"] == 2
+    assert not queue.renew(job_id, "w1")
+    assert queue.renew(job_id, "w2")
+
+
+def test_only_the_lease_holder_can_complete_a_job(tmp_path):
+    queue = open_queue(tmp_path, lease=0.05)
+    job_id = queue.submit({"n": 1})
+    queue.claim("w1", timeout=0)
+    time.sleep(0.1)
+    queue.claim("w2", timeout=0)
+
+    assert not queue.complete(job_id, ["stale"], worker="w1")
+    assert not queue.fail(job_id, "stale", worker="w1")
+    assert queue.get(job_id)["status"] == RUNNING
+    assert queue.complete(job_id, ["fresh"], worker="w2")
+    assert queue.get(job_id)["result"] == ["fresh"]
+    # A finished job can't be completed again by its former holder either
+    assert not queue.complete(job_id, ["again"], worker="w2")
+
+
+def test_failed_job_is_retried_until_attempts_run_out(tmp_path):
+    queue = open_queue(tmp_path, max_attempts=2)
+    job_id = queue.submit({"n": 1})
+
+    queue.claim("w1", timeout=0)
+    assert queue.fail(job_id, "boom", retry=True, worker="w1")
+    assert queue.get(job_id)["status"] == QUEUED
+    queue.claim("w1", timeout=0)
+    assert queue.fail(job_id, "boom again", retry=True, worker="w1")
+    job = queue.get(job_id)
+    assert job["status"] == FAILED and job["error"] == "boom again" and job["attempts"] == 2
+
+
+def test_job_abandoned_too_often_fails(tmp_path):
+    queue = open_queue(tmp_path, lease=0.01, max_attempts=1)
+    job_id = queue.submit({"n": 1})
+    queue.claim("w1", timeout=0)
+    time.sleep(0.05)
+
+    assert queue.claim("w2", timeout=0) is None
+    assert queue.get(job_id)["status"] == FAILED
+
+
+class FakeRecommender:
+    def recommend(self, job_description, mode="rerank"):
+        return [{"Assessment Name": job_description, "mode": mode}]
+
+
+def test_worker_stores_the_result_for_the_submitter(tmp_path):
+    queue = open_queue(tmp_path)
+    job_id = submit_recommendation(queue, "Data analyst", mode="catalog")
+    process_job(FakeRecommender(), queue, queue.claim("w1", timeout=0), worker="w1")
+
+    job = queue.wait(job_id, timeout=1)
+    assert job["status"] == DONE
+    assert job["result"] == [{"Assessment Name": "Data analyst", "mode": "catalog"}]
@@ -0,0 +1,60 @@
+import asyncio
+
+from recommender import metrics
+from recommender.async_client import AsyncGeminiClient
+from recommender.resilience import CircuitBreaker, TokenBucket
+
+
+class FakeResponse:
+    text = "[]"
+    usage_metadata = None
+
+
+class FakeModel:
+    async def generate_content_async(self, prompt, **kwargs):
+        await asyncio.sleep(0.01)
+        return FakeResponse()
+
+
+def make_client():
+    return AsyncGeminiClient(FakeModel, limiter=TokenBucket(0), breaker=CircuitBreaker(), hedge_after="0", name="fake")
+
+
+def test_model_call_span_joins_the_callers_trace(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    client = make_client()
+
+    with metrics.trace() as spans:
+        with metrics.span("request"):
+            client.generate_sync("prompt")
+
+    assert [span["stage"] for span in spans] == ["model_call", "request"]
+    assert spans[0]["model"] == "fake"
+
+
+def test_spans_outside_a_trace_are_not_collected(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    client = make_client()
+    client.generate_sync("warm up")  # The loop thread exists before the trace starts
+
+    with metrics.trace() as spans:
+        pass
+    client.generate_sync("prompt")
+
+    assert spans == []
+
+
+def test_worker_threads_started_with_to_thread_join_the_trace(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+
+    def prepare():
+        with metrics.span("prepare_query"):
+            pass
+
+    async def request():
+        with metrics.trace() as spans:
+            await asyncio.to_thread(prepare)
+            await make_client().generate("prompt")
+        return spans
+
+    assert [span["stage"] for span in asyncio.run(request())] == ["prepare_query", "model_call"]
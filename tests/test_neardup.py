@@ -0,0 +1,51 @@
+import sqlite3
+
+from recommender.neardup import NearDuplicateCache
+
+POSTING = (
+    "Data Analyst. Requirements: 5+ years of experience with SQL and Python, strong numerical reasoning, "
+    "attention to detail and the ability to present findings to senior stakeholders. Salary: 50,000 GBP."
+)
+OTHER = (
+    "Sales Representative. Manage a pipeline of enterprise customers, negotiate renewals and hit quarterly "
+    "targets. Excellent verbal communication, resilience and a customer focus are essential."
+)
+
+
+def test_repost_with_a_new_salary_is_a_near_duplicate():
+    cache = NearDuplicateCache("1")
+    cache.put(POSTING, [{"URL": "a"}])
+
+    assert cache.get(POSTING.replace("50,000", "55,000")) == [{"URL": "a"}]
+    assert cache.get(OTHER) is None
+
+
+def test_processes_sharing_a_file_never_overwrite_each_others_entries(tmp_path):
+    path = str(tmp_path / "near.db")
+    first = NearDuplicateCache("1", path=path)
+    second = NearDuplicateCache("1", path=path)
+
+    first.put(POSTING, [{"URL": "a"}])
+    second.put(OTHER, [{"URL": "b"}])
+
+    rows = sqlite3.connect(path).execute("SELECT key, value FROM near_duplicates ORDER BY key").fetchall()
+    assert [value for _, value in rows] == ['[{"URL": "a"}]', '[{"URL": "b"}]']
+    # A process started later loads both, under the keys SQLite assigned
+    third = NearDuplicateCache("1", path=path)
+    assert sorted(third._entries) == [key for key, _ in rows]
+    assert third.get(POSTING) == [{"URL": "a"}] and third.get(OTHER) == [{"URL": "b"}]
+
+
+def test_tables_with_process_assigned_keys_are_rebuilt(tmp_path):
+    path = str(tmp_path / "near.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE near_duplicates (key INTEGER PRIMARY KEY, prompt_version TEXT NOT NULL, namespace TEXT NOT NULL, "
+        "signature BLOB NOT NULL, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+    )
+    conn.commit()
+
+    cache = NearDuplicateCache("1", path=path)
+    cache.put(POSTING, [{"URL": "a"}])
+    schema = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'near_duplicates'").fetchone()[0]
+    assert "AUTOINCREMENT" in schema
@@ -0,0 +1,65 @@
+from recommender.precompute import PrecomputedRefresher, PrecomputedStore, RefreshLease
+
+QUERIES = [("Sample 1", "Data analyst with SQL"), ("Sample 2", "Java developer with Spring")]
+
+
+class FakeRecommender:
+    precompute_version = "v1"
+
+    def __init__(self):
+        self.calls = 0
+
+    def prepare_query(self, text):
+        return text, {}
+
+    def retrieve_candidates(self, query):
+        return []
+
+    def build_prompt(self, query, candidates=None):
+        return query
+
+    def generate_routed(self, prompt, candidates=None, query=None):
+        self.calls += 1
+        return [{"Assessment Name": prompt, "URL": "https://example.com/"}]
+
+
+def refresher(path, recommender):
+    return PrecomputedRefresher(recommender, PrecomputedStore(path), QUERIES, interval=60)
+
+
+def test_only_the_lease_holder_calls_the_model(tmp_path):
+    path = str(tmp_path / "precomputed.json")
+    first, second = FakeRecommender(), FakeRecommender()
+    owner, follower = refresher(path, first), refresher(path, second)
+
+    assert owner.run_once() == (2, 0)
+    assert follower.run_once() == (0, 0)
+    assert first.calls == 2 and second.calls == 0
+    # The follower serves what the owner wrote
+    assert follower.store.get("Data analyst with SQL", "v1") == [{"Assessment Name": "Data analyst with SQL",
+                                                                   "URL": "https://example.com/"}]
+
+
+def test_stopping_the_owner_hands_the_lease_over(tmp_path):
+    path = str(tmp_path / "precomputed.json")
+    owner, follower = refresher(path, FakeRecommender()), refresher(path, FakeRecommender())
+    assert owner.lease.acquire() and not follower.lease.acquire()
+
+    owner.stop()
+    assert follower.lease.acquire()
+
+
+def test_expired_lease_can_be_taken(tmp_path):
+    path = str(tmp_path / "lease.db")
+    first, second = RefreshLease(path, ttl=-1), RefreshLease(path, ttl=60)
+    assert first.acquire()
+    assert second.acquire() and not first.acquire()
+
+
+def test_entries_accessor_returns_a_copy_under_the_current_version(tmp_path):
+    store = PrecomputedStore(str(tmp_path / "precomputed.json"))
+    store.save("v1", {"k": {"recommendations": []}})
+
+    entries = store.entries("v1")
+    entries["other"] = {}
+    assert store.entries("v2") == {} and len(store) == 1
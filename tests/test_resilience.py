@@ -0,0 +1,243 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from recommender.async_client import AsyncGeminiClient, GenerationTimeout
+from recommender.engine import RecommendationError, Recommender
+from recommender.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RateLimitExceeded,
+    RetryPolicy,
+    TokenBucket,
+    is_retryable,
+    retry_after,
+)
+
+
+class ApiError(Exception):
+    """Looks like a google.api_core error: the HTTP status is in ``code``"""
+
+    def __init__(self, code, message="", retry_after=None):
+        super().__init__(message or f"HTTP {code}")
+        self.code = code
+        if retry_after is not None:
+            self.retry_after = retry_after
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class FakeModel:
+    """Scripted stand-in for a Gemini model: each call takes the next outcome, then repeats the last one"""
+
+    def __init__(self, *outcomes, delay=0.0):
+        self.outcomes = list(outcomes) or ["[]"]
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    async def generate_content_async(self, prompt, **kwargs):
+        with self._lock:
+            outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+            self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return FakeResponse(outcome)
+
+
+def client_for(model, limiter=None, breaker=None, timeout=5.0):
+    return AsyncGeminiClient(
+        lambda: model, timeout=timeout, limiter=limiter or TokenBucket(0),
+        breaker=breaker or CircuitBreaker(3, 60.0), hedge_after="0", name="fake",
+    )
+
+
+def recommender_for(model, breaker=None):
+    recommender = Recommender("fake")
+    recommender.async_client = client_for(model, breaker=breaker)
+    recommender.retry_policy = RetryPolicy(base=0.01, cap=0.05)
+    return recommender
+
+
+# Circuit breaker
+
+def test_breaker_opens_after_threshold_and_probes_once_when_half_open():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_time=0.05)
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    time.sleep(0.06)
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_failed_probe_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def test_client_fails_fast_once_the_circuit_is_open():
+    model = FakeModel(ApiError(503))
+    client = client_for(model, breaker=CircuitBreaker(3, 60.0))
+    for _ in range(3):
+        with pytest.raises(ApiError):
+            client.generate_sync("prompt")
+
+    with pytest.raises(CircuitOpenError):
+        client.generate_sync("prompt")
+    assert model.calls == 3
+
+
+def test_bad_requests_do_not_trip_the_breaker():
+    model = FakeModel(ApiError(400))
+    breaker = CircuitBreaker(2, 60.0)
+    client = client_for(model, breaker=breaker)
+    for _ in range(3):
+        with pytest.raises(ApiError):
+            client.generate_sync("prompt")
+    assert breaker.state == "closed" and model.calls == 3
+
+
+def test_cancelling_a_rate_limited_call_leaves_the_half_open_probe_free():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_time=0.05)
+    breaker.record_failure()
+    limiter = TokenBucket(rate_per_minute=60, burst=1)
+    limiter.reserve()  # The next token is a second away
+    model = FakeModel("[]")
+    client = client_for(model, limiter=limiter, breaker=breaker)
+    time.sleep(0.06)
+
+    future = client.submit("prompt")
+    time.sleep(0.1)
+    future.cancel()
+    time.sleep(0.05)
+    assert model.calls == 0
+    assert breaker.allow()  # The probe was never claimed by the cancelled call
+
+
+def test_hedge_waits_for_a_free_rate_limit_token():
+    model = FakeModel("[]", delay=0.3)
+    limiter = TokenBucket(rate_per_minute=60, burst=1)
+    client = client_for(model, limiter=limiter)
+    client.hedge_after = 0.05
+
+    assert client.generate_sync("prompt") == "[]"
+    assert client.hedged == 0 and model.calls == 1
+
+
+# Rate limiter
+
+def test_token_bucket_allows_a_burst_then_asks_callers_to_wait():
+    bucket = TokenBucket(rate_per_minute=60, burst=2)
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == pytest.approx(1.0, abs=0.05)
+    # A wait beyond max_wait is refused and takes no token
+    assert bucket.reserve(max_wait=0.5) is None
+    assert not bucket.try_acquire()
+
+
+def test_token_bucket_is_shared_through_sqlite(tmp_path):
+    path = str(tmp_path / "bucket.db")
+    first = TokenBucket(rate_per_minute=1, burst=1, path=path)
+    second = TokenBucket(rate_per_minute=1, burst=1, path=path)
+    assert first.try_acquire()
+    assert not second.try_acquire()
+
+
+def test_rate_limited_call_is_rejected_without_reaching_the_model():
+    model = FakeModel("[]")
+    client = client_for(model, limiter=TokenBucket(rate_per_minute=60, burst=1), timeout=1.0)
+    client.generate_sync("prompt")
+
+    # The next token is a second away, more than half of the 1 s deadline
+    with pytest.raises(RateLimitExceeded):
+        client.generate_sync("prompt")
+    assert model.calls == 1
+
+
+def test_rate_limit_wait_counts_against_the_deadline():
+    model = FakeModel("[]", delay=0.9)
+    limiter = TokenBucket(rate_per_minute=120, burst=1)
+    client = client_for(model, limiter=limiter, timeout=1.2)
+    limiter.reserve()  # The next token is 0.5 s away
+
+    # 0.5 s waiting for a token leaves 0.7 s of the 1.2 s deadline for a 0.9 s call
+    started = time.monotonic()
+    with pytest.raises(GenerationTimeout):
+        client.generate_sync("prompt")
+    assert 1.1 < time.monotonic() - started < 1.2 + 0.3
+    assert model.calls == 1
+
+
+# Retries
+
+def test_retry_policy_prefers_server_hints_and_caps_them():
+    policy = RetryPolicy(base=0.5, cap=5.0, max_attempts=3)
+    assert policy.delay(0, ApiError(429, retry_after=2)) == 2.0
+    assert policy.delay(0, ApiError(429, "Quota exceeded, retry in 30s")) == 5.0
+    assert 0.0 <= policy.delay(3) <= 4.0
+    assert retry_after(ApiError(503)) is None
+
+
+def test_only_transient_errors_are_retried():
+    policy = RetryPolicy(max_attempts=3)
+    assert is_retryable(ApiError(503)) and is_retryable(ApiError(429))
+    assert not is_retryable(ApiError(400))
+    assert is_retryable(GenerationTimeout())
+    assert policy.should_retry(0, ApiError(503))
+    assert not policy.should_retry(2, ApiError(503))
+    assert not policy.should_retry(0, ApiError(400))
+
+
+def test_transient_failure_is_retried_until_success():
+    model = FakeModel(ApiError(503), '[{"a": 1}]')
+    assert recommender_for(model).generate_with_retries("prompt", max_retries=3) == '[{"a": 1}]'
+    assert model.calls == 2
+
+
+def test_bad_request_is_not_retried():
+    model = FakeModel(ApiError(400), "[]")
+    with pytest.raises(RecommendationError):
+        recommender_for(model).generate_with_retries("prompt", max_retries=3)
+    assert model.calls == 1
+
+
+def test_retries_stop_after_the_last_attempt():
+    model = FakeModel(ApiError(503))
+    with pytest.raises(RecommendationError):
+        recommender_for(model, breaker=CircuitBreaker(10, 60.0)).generate_with_retries("prompt", max_retries=3)
+    assert model.calls == 3
+
+
+def test_open_circuit_is_raised_without_retrying():
+    breaker = CircuitBreaker(1, 60.0)
+    breaker.record_failure()
+    model = FakeModel("[]")
+    with pytest.raises(CircuitOpenError):
+        recommender_for(model, breaker=breaker).generate_with_retries("prompt", max_retries=3)
+    assert model.calls == 0
+
+
+def test_async_retries_match_the_sync_path():
+    model = FakeModel(ApiError(503), '[{"a": 1}]')
+    recommender = recommender_for(model)
+    assert asyncio.run(recommender.generate_with_retries_async("prompt", max_retries=3)) == '[{"a": 1}]'
+    assert model.calls == 2